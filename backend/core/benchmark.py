@@ -0,0 +1,521 @@
+"""
+Endpoint benchmark and regression harness.
+
+Seeds a synthetic dataset (products, carts, orders, support rooms, messages
+and notifications), calls every URL in ``storeapp.urls``, ``support.urls``
+and ``core.urls`` and records the query count, p50/p95 latency and response
+size of each one. Results are compared against the checked-in
+``benchmark_baseline.json`` so a run fails when an endpoint regresses.
+
+Everything runs offline: Paystack is answered by ``storeapp.fake_paystack``
+through an in-process transport, Gemini by the stub LLM backend, and the
+cache and channel layer are in-process. The harness expects to run inside a
+throwaway test database (``manage.py benchmark_endpoints`` and the test
+suite both take care of that).
+"""
+import contextlib
+import hashlib
+import hmac
+import importlib
+import json
+import statistics
+import time
+from dataclasses import dataclass, field
+from datetime import timedelta
+from decimal import Decimal
+from pathlib import Path
+from types import SimpleNamespace
+from typing import Any
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from storeapp import identifiers, llm
+from storeapp.checkout import amount_in_kobo
+from storeapp.fake_paystack import FakePaystack
+from storeapp.models import Cart, CartItem, Order, Orderitem, Product, ShippingInfo
+from storeapp.payments import PaystackClient
+from support.models import ChatMessage, SupportNotification, SupportRoom, recount_rooms
+
+
+BASELINE_PATH = Path(__file__).resolve().parent / "benchmark_baseline.json"
+URL_MODULES = ("storeapp.urls", "support.urls", "core.urls")
+
+LOCMEM_CACHES = {"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}}
+IN_MEMORY_CHANNEL_LAYERS = {"default": {"BACKEND": "channels.layers.InMemoryChannelLayer"}}
+
+# Allowed slack before a measurement counts as a regression
+LATENCY_TOLERANCE = 3.0
+LATENCY_FLOOR_MS = 20.0
+SIZE_TOLERANCE = 1.10
+
+WEBHOOK_SECRET = "sk_test_benchmark"
+
+User = get_user_model()
+
+
+# ---- Offline fakes ----
+
+@contextlib.contextmanager
+def offline():
+    """Route Paystack and Gemini calls to local fakes and use a local cache."""
+    paystack = FakePaystack(auto_settle=True)
+    paystack_client = PaystackClient(transport=paystack.transport(), secret_key=WEBHOOK_SECRET)
+    with contextlib.ExitStack() as stack:
+        stack.callback(paystack_client.close)
+        stack.enter_context(override_settings(
+            CACHES=LOCMEM_CACHES, PAYSTACK_SECRET_KEY=WEBHOOK_SECRET, BACKGROUND_TASKS_EAGER=True,
+            LLM_BACKEND="stub", CHANNEL_LAYERS=IN_MEMORY_CHANNEL_LAYERS,
+        ))
+        stack.enter_context(mock.patch("storeapp.payments.get_client", return_value=paystack_client))
+        yield SimpleNamespace(gemini=llm.get_backend(), paystack=paystack)
+
+
+# ---- Synthetic dataset ----
+
+class Dataset:
+    """Seeded rows plus factories for endpoints that consume what they touch."""
+
+    def __init__(self, scale=1, paystack=None):
+        self.scale = scale
+        self.paystack = paystack
+        self.counter = 0
+
+    def next_id(self):
+        self.counter += 1
+        return self.counter
+
+    def seed(self):
+        scale = self.scale
+        password = make_password("benchmark-password")
+
+        self.staff = User.objects.create(
+            email="staff@bench.test", username="staff", password=password, is_staff=True
+        )
+        self.customer = User.objects.create(
+            email="customer@bench.test", username="customer", password=password
+        )
+        User.objects.bulk_create(
+            User(email=f"agent{i}@bench.test", username=f"agent{i}", password=password, is_staff=True)
+            for i in range(5 * scale)
+        )
+        customers = User.objects.bulk_create(
+            User(email=f"shopper{i}@bench.test", username=f"shopper{i}", password=password)
+            for i in range(20 * scale)
+        )
+
+        categories = [code for code, _ in Product.CATEGORIES]
+        Product.objects.bulk_create(
+            Product(
+                name=f"Bench Product {i}",
+                slug=f"bench-product-{i}",
+                sku=f"BEN-{i:06d}",
+                category=categories[i % len(categories)],
+                description=f"Synthetic product number {i} for endpoint benchmarks.",
+                price=Decimal("5.00") + i % 50,
+                quantity=1000,
+                featured=i % 10 == 0,
+            )
+            for i in range(200 * scale)
+        )
+        self.products = list(Product.objects.order_by("id"))
+
+        ShippingInfo.objects.create(
+            user=self.customer, first_name="Bench", last_name="Customer", email=self.customer.email,
+            address="1 Test Street", city="Lagos", state="Lagos", zip_code="100001",
+        )
+        self.cart = self.make_cart(items=5)
+
+        owners = [self.customer] + customers
+        orders = Order.objects.bulk_create(
+            Order(
+                user=owners[i % len(owners)],
+                sku=f"ORD-B{i:05d}",
+                reference=f"bench-ref-{i}",
+                total_amount=Decimal("42.00"),
+                status=("success", "pending", "shipped")[i % 3],
+            )
+            for i in range(100 * scale)
+        )
+        Orderitem.objects.bulk_create(
+            Orderitem(order=order, product=self.products[(order.id + j) % len(self.products)], quantity=1)
+            for order in orders
+            for j in range(3)
+        )
+
+        rooms = SupportRoom.objects.bulk_create(
+            SupportRoom(
+                room_id=f"room_bench{i:05d}",
+                customer=self.customer if i % 2 == 0 else owners[i % len(owners)],
+                support_agent=self.staff if i % 3 == 0 else None,
+                status="active" if i % 3 == 0 else "pending",
+                subject=f"Benchmark room {i}",
+            )
+            for i in range(20 * scale)
+        )
+        ChatMessage.objects.bulk_create(
+            ChatMessage(
+                room=room,
+                sender=room.customer if j % 2 == 0 else room.support_agent,
+                sender_type="customer" if j % 2 == 0 else ("agent" if room.support_agent else "bot"),
+                message=f"Benchmark message {j} in {room.room_id}",
+            )
+            for room in rooms
+            for j in range(25)
+        )
+        recount_rooms()
+        SupportNotification.objects.bulk_create(
+            SupportNotification(
+                support_agent=self.staff,
+                room=room,
+                notification_type="new_request",
+                message=f"New support request in {room.room_id}",
+            )
+            for room in rooms
+        )
+        self.room = SupportRoom.objects.filter(customer=self.customer, support_agent=self.staff).first()
+
+        # Reserve the first identifier blocks up front so endpoint query
+        # counts show the steady state rather than the first reservation
+        identifiers.product_skus.next()
+        identifiers.order_skus.next()
+        return self
+
+    # Factories for endpoints that delete or consume rows
+
+    def product(self):
+        return self.products[len(self.products) // 2]
+
+    def make_product(self):
+        n = self.next_id()
+        return Product.objects.create(name=f"Disposable {n}", sku=f"TMP-{n:06d}", price="9.99", quantity=5)
+
+    def product_csv(self, rows=50):
+        """An import file updating ``rows`` seeded products and adding as many new ones."""
+        lines = ["sku,name,category,price,quantity"]
+        for product in self.products[:rows]:
+            lines.append(f"{product.sku},{product.name},{product.category},{product.price},{product.quantity + 1}")
+        n = self.next_id()
+        lines += [f"IMP-{n:06d}-{i},Imported {n} {i},books,4.99,40" for i in range(rows)]
+        return SimpleUploadedFile("products.csv", "\n".join(lines).encode(), content_type="text/csv")
+
+    def make_cart(self, items=3):
+        cart = Cart.objects.create(cart_code=f"bench-cart-{self.next_id()}", user=self.customer)
+        CartItem.objects.bulk_create(
+            CartItem(cart=cart, product=product, quantity=2) for product in self.products[:items]
+        )
+        return cart
+
+    def make_order(self, reference=None, age_days=0):
+        cart = self.make_cart()
+        order = Order.objects.create(
+            user=self.customer, cart_code=cart.cart_code, reference=reference,
+            total_amount=Decimal("30.00"),
+        )
+        Orderitem.objects.bulk_create(
+            Orderitem(order=order, product=item.product, quantity=item.quantity)
+            for item in cart.cartitems.all()
+        )
+        if age_days:
+            Order.objects.filter(pk=order.pk).update(created_at=timezone.now() - timedelta(days=age_days))
+        return order
+
+    def make_paid_order(self):
+        """An order the offline Paystack fake holds a matching charge for."""
+        order = self.make_order(reference=f"verify-{self.next_id()}")
+        self.paystack.initialize({"email": self.customer.email, "amount": amount_in_kobo(order.total_amount),
+                                  "reference": order.reference})
+        return order
+
+    def make_room(self, status="pending", agent=None):
+        return SupportRoom.objects.create(customer=self.customer, support_agent=agent, status=status)
+
+    def make_notification(self):
+        return SupportNotification.objects.create(
+            support_agent=self.staff, room=self.room, notification_type="message", message="Ping"
+        )
+
+
+# ---- Scenarios ----
+
+def value(spec, dataset):
+    return spec(dataset) if callable(spec) else spec
+
+
+@dataclass
+class Scenario:
+    """How to call one URL; callables receive the Dataset and run per call."""
+    method: str = "get"
+    args: Any = ()
+    data: Any = None
+    user: str | None = "staff"
+    format: str = "json"
+    expected_status: tuple = (200,)
+
+    def client(self, dataset):
+        client = APIClient()
+        if self.user:
+            client.force_authenticate(getattr(dataset, self.user))
+        return client
+
+    def prepare(self, url_name, dataset):
+        """Build the URL and payload; factories run here, outside the measurement."""
+        return reverse(url_name, args=value(self.args, dataset)), value(self.data, dataset)
+
+    def send(self, client, url, data):
+        handler = getattr(client, self.method)
+        if self.method == "get":
+            return handler(url, data)
+        return handler(url, data, format=self.format)
+
+
+class WebhookScenario(Scenario):
+    """Posts the payload as a raw body signed the way Paystack signs webhooks."""
+
+    def send(self, client, url, data):
+        body = json.dumps(data).encode()
+        signature = hmac.new(WEBHOOK_SECRET.encode(), body, hashlib.sha512).hexdigest()
+        return client.post(url, body, content_type="application/json", HTTP_X_PAYSTACK_SIGNATURE=signature)
+
+
+def charge_success(dataset):
+    order = dataset.make_order(reference=f"hook-{dataset.next_id()}")
+    return {
+        "event": "charge.success",
+        "data": {"id": order.id, "reference": order.reference, "status": "success",
+                 "amount": amount_in_kobo(order.total_amount), "currency": "NGN"},
+    }
+
+
+SCENARIOS: dict[str, Scenario] = {
+    # storeapp: catalog
+    "add_product": Scenario(
+        "post",
+        data=lambda d: {"name": f"New Product {d.next_id()}", "category": "books", "price": "19.99",
+                        "quantity": "10", "minimumStock": "2", "description": "Benchmark"},
+        format="multipart",
+    ),
+    "generate_product_description": Scenario("post", data={"name": "Trail Running Shoe"}),
+    "import_products": Scenario("post", data=lambda d: {"file": d.product_csv()}, format="multipart"),
+    "export_products": Scenario(data={"file_format": "csv"}),
+    "get_products": Scenario(data={"page": 3}, user=None),
+    "get_product": Scenario(args=lambda d: [d.product().id], user=None),
+    "update_product": Scenario("patch", args=lambda d: [d.product().id], data={"price": "12.50"}),
+    "delete_product": Scenario("delete", args=lambda d: [d.make_product().id], expected_status=(204,)),
+    "get_featured_products": Scenario(user=None),
+    "get_all_products": Scenario(data={"search": "product 1", "category": "all", "page": 2}, user=None),
+    "get_product_by_slug": Scenario(args=lambda d: [d.product().slug], user=None),
+    # storeapp: cart
+    "get_cart": Scenario(args=lambda d: [d.cart.cart_code], user=None),
+    "add_to_cart": Scenario(
+        "post", data=lambda d: {"cart_code": d.cart.cart_code, "product_id": d.products[7].id}, user=None
+    ),
+    "check_product_in_cart": Scenario(
+        data=lambda d: {"cart_code": d.cart.cart_code, "product_id": d.products[0].id}, user=None
+    ),
+    "increase_cartitem_quantity": Scenario(
+        "put", data=lambda d: {"item_id": d.cart.cartitems.first().id}, user=None
+    ),
+    "decrease_cartitem_quantity": Scenario(
+        "put", data=lambda d: {"item_id": d.cart.cartitems.last().id}, user=None
+    ),
+    "delete_cartitem": Scenario(
+        "delete", args=lambda d: [d.make_cart(items=1).cartitems.get().id], user=None,
+        expected_status=(204,),
+    ),
+    # storeapp: checkout
+    "create_or_update_shipping_info": Scenario(
+        "post",
+        data={"firstName": "Bench", "lastName": "Customer", "email": "customer@bench.test",
+              "address": "2 Test Street", "city": "Lagos", "state": "Lagos", "zipCode": "100001"},
+        user="customer",
+    ),
+    "initialize_payment": Scenario("post", data=lambda d: {"cart_code": d.make_cart().cart_code}, user="customer"),
+    "verify-payment": Scenario(
+        args=lambda d: [d.make_paid_order().reference], user="customer"
+    ),
+    "paystack_webhook": WebhookScenario("post", data=charge_success, user=None),
+    "get_shipping_address": Scenario(user="customer"),
+    # storeapp: admin and orders
+    "analytics-data": Scenario(),
+    "admin-dashboard-stats": Scenario(),
+    "cache_stats": Scenario(),
+    "payment_gateway_stats": Scenario(),
+    "get_user_orders": Scenario(user="customer"),
+    "get_all_orders": Scenario(data={"status": "all", "page": 2}),
+    "update_order_status": Scenario("put", args=lambda d: [d.make_order().id], data={"status": "shipped"}),
+    "delete_order": Scenario("delete", args=lambda d: [d.make_order(age_days=8).id], expected_status=(204,)),
+    "user_is_admin": Scenario(),
+    "user_is_logged_in": Scenario(user="customer"),
+    # support
+    "create-support-room": Scenario("post", data={"subject": "Where is my order?"}, user="customer",
+                                    expected_status=(200, 201)),
+    "get-user-rooms": Scenario(user="customer"),
+    "get-pending-rooms": Scenario(),
+    "accept-support-room": Scenario("post", args=lambda d: [d.make_room().room_id]),
+    "close-support-room": Scenario("post", args=lambda d: [d.make_room("active", d.staff).room_id]),
+    "get-room-messages": Scenario(args=lambda d: [d.room.room_id], data={"limit": 20}, user="customer"),
+    "send-message": Scenario(
+        "post", args=lambda d: [d.room.room_id], data={"message": "Any update on my order?"},
+        user="customer", expected_status=(201,),
+    ),
+    "mark-room-read": Scenario("post", args=lambda d: [d.room.room_id], user="customer"),
+    "get-notifications": Scenario(),
+    "mark-notification-read": Scenario("post", args=lambda d: [d.make_notification().id]),
+    "register-device": Scenario(
+        "post", data=lambda d: {"token": f"bench-device-{d.next_id()}", "platform": "android"},
+        user="customer", expected_status=(201,),
+    ),
+    "bot-stats": Scenario(),
+    # core
+    "signup": Scenario(
+        "post", data=lambda d: {"email": f"new{d.next_id()}@bench.test", "username": "new", "password": "pw-12345"},
+        user=None, expected_status=(201,),
+    ),
+    "signin": Scenario("post", data={"email": "customer@bench.test", "password": "benchmark-password"}, user=None),
+}
+
+
+def url_names():
+    names = []
+    for module in URL_MODULES:
+        names += [pattern.name for pattern in importlib.import_module(module).urlpatterns]
+    return names
+
+
+def missing_scenarios():
+    return [name for name in url_names() if name not in SCENARIOS]
+
+
+# ---- Running and comparing ----
+
+def percentile(samples, fraction):
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, max(0, round(fraction * (len(ordered) - 1))))
+    return ordered[index]
+
+
+@dataclass
+class Measurement:
+    queries: int
+    status: int
+    bytes: int
+    latencies_ms: list = field(default_factory=list)
+
+    def as_dict(self):
+        return {
+            "queries": self.queries,
+            "bytes": self.bytes,
+            "p50_ms": round(statistics.median(self.latencies_ms), 2),
+            "p95_ms": round(percentile(self.latencies_ms, 0.95), 2),
+        }
+
+
+class EndpointError(AssertionError):
+    pass
+
+
+def read_body(response):
+    """The full body; streaming responses only run their queries as they are consumed."""
+    if response.streaming:
+        return b"".join(response.streaming_content)
+    return response.content
+
+
+def measure_cold(url_name, scenario, dataset):
+    """One call on an empty cache; counts every query it makes."""
+    cache.clear()
+    url, data = scenario.prepare(url_name, dataset)
+    with CaptureQueriesContext(connection) as queries:
+        response = scenario.send(scenario.client(dataset), url, data)
+        body = read_body(response)
+    if response.status_code not in scenario.expected_status:
+        raise EndpointError(f"{url_name} returned {response.status_code}: {body[:300]!r}")
+    return Measurement(len(queries), response.status_code, len(body))
+
+
+def measure_latency(url_name, scenario, dataset, iterations):
+    client = scenario.client(dataset)
+    latencies = []
+    for _ in range(iterations):
+        url, data = scenario.prepare(url_name, dataset)
+        start = time.perf_counter()
+        read_body(scenario.send(client, url, data))
+        latencies.append((time.perf_counter() - start) * 1000)
+    return latencies
+
+
+def run(scale=1, iterations=10, only=None, stdout=None):
+    """
+    Seed the dataset and measure every endpoint. Returns
+    ``{"scale": ..., "endpoints": {url_name: {...}}}``.
+
+    Every endpoint gets its cold, counted call before any timed iterations
+    run, so query counts and sizes do not depend on ``iterations``.
+    """
+    missing = missing_scenarios()
+    if missing:
+        raise EndpointError(f"No benchmark scenario for: {', '.join(missing)}")
+
+    names = [name for name in url_names() if not only or name in only]
+    endpoints = {}
+    with offline() as fakes:
+        dataset = Dataset(scale, paystack=fakes.paystack).seed()
+        measurements = {name: measure_cold(name, SCENARIOS[name], dataset) for name in names}
+        for name in names:
+            measurement = measurements[name]
+            measurement.latencies_ms = measure_latency(name, SCENARIOS[name], dataset, iterations)
+            endpoints[name] = measurement.as_dict()
+            if stdout:
+                stdout.write(format_row(name, endpoints[name]))
+    return {"scale": scale, "iterations": iterations, "endpoints": endpoints}
+
+
+def format_row(url_name, row):
+    return (
+        f"{url_name:<34} queries={row['queries']:<4} p50={row['p50_ms']:>8.2f}ms "
+        f"p95={row['p95_ms']:>8.2f}ms bytes={row['bytes']}"
+    )
+
+
+def compare(results, baseline, latency_tolerance=LATENCY_TOLERANCE, check_latency=True):
+    """Return a list of human-readable budget violations (empty when all pass)."""
+    problems = []
+    if results["scale"] != baseline["scale"]:
+        problems.append(f"scale {results['scale']} does not match baseline scale {baseline['scale']}")
+        return problems
+
+    budgets = baseline["endpoints"]
+    for url_name, row in results["endpoints"].items():
+        budget = budgets.get(url_name)
+        if budget is None:
+            problems.append(f"{url_name}: no baseline entry")
+            continue
+        if row["queries"] > budget["queries"]:
+            problems.append(f"{url_name}: {row['queries']} queries > budget {budget['queries']}")
+        if row["bytes"] > budget["bytes"] * SIZE_TOLERANCE:
+            problems.append(f"{url_name}: {row['bytes']} bytes > budget {budget['bytes']}")
+        if check_latency:
+            allowed = max(budget["p95_ms"] * latency_tolerance, LATENCY_FLOOR_MS)
+            if row["p95_ms"] > allowed:
+                problems.append(f"{url_name}: p95 {row['p95_ms']}ms > allowed {allowed:.2f}ms")
+    return problems
+
+
+def load_baseline(path=BASELINE_PATH):
+    with open(path) as handle:
+        return json.load(handle)
+
+
+def save_baseline(results, path=BASELINE_PATH):
+    with open(path, "w") as handle:
+        json.dump(results, handle, indent=2, sort_keys=True)
+        handle.write("\n")
@@ -0,0 +1,66 @@
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import setup_test_environment, teardown_test_environment
+
+from core import benchmark
+
+
+class Command(BaseCommand):
+    help = (
+        "Seed a throwaway database, call every storeapp/support/core endpoint and "
+        "compare query counts, p50/p95 latency and response size with the baseline."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--scale", type=int, default=1, help="Dataset size multiplier.")
+        parser.add_argument("--iterations", type=int, default=20, help="Timed calls per endpoint.")
+        parser.add_argument("--only", nargs="*", help="Restrict the run to these URL names.")
+        parser.add_argument("--baseline", default=str(benchmark.BASELINE_PATH), help="Baseline JSON file.")
+        parser.add_argument(
+            "--update-baseline", action="store_true",
+            help="Write the results to the baseline file instead of comparing.",
+        )
+        parser.add_argument(
+            "--latency-tolerance", type=float, default=benchmark.LATENCY_TOLERANCE,
+            help="Allowed p95 slowdown factor before a run fails.",
+        )
+        parser.add_argument("--skip-latency", action="store_true", help="Only check queries and sizes.")
+
+    def handle(self, *args, **options):
+        setup_test_environment()
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            results = benchmark.run(
+                scale=options["scale"],
+                iterations=options["iterations"],
+                only=options["only"],
+                stdout=self.stdout,
+            )
+        except benchmark.EndpointError as e:
+            raise CommandError(str(e))
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+
+        path = Path(options["baseline"])
+        if options["update_baseline"]:
+            if options["only"] and path.exists():
+                # Refresh just the selected endpoints, keep the other budgets
+                merged = benchmark.load_baseline(path)
+                merged["endpoints"].update(results["endpoints"])
+                results = merged
+            benchmark.save_baseline(results, path)
+            self.stdout.write(self.style.SUCCESS(f"Baseline written to {path}"))
+            return
+
+        problems = benchmark.compare(
+            results,
+            benchmark.load_baseline(path),
+            latency_tolerance=options["latency_tolerance"],
+            check_latency=not options["skip_latency"],
+        )
+        if problems:
+            raise CommandError("Endpoint budgets exceeded:\n  " + "\n  ".join(problems))
+        self.stdout.write(self.style.SUCCESS("All endpoints within budget."))
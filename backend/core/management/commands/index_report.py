@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import setup_test_environment, teardown_test_environment
+
+from core import benchmark, query_plans
+
+
+class Command(BaseCommand):
+    help = (
+        "Seed a throwaway database, print the query plan of each hot view queryset "
+        "and fail when one of them scans a whole table."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--scale", type=int, default=1, help="Dataset size multiplier.")
+        parser.add_argument("--only", nargs="*", help="Restrict the report to these query names.")
+
+    def handle(self, *args, **options):
+        setup_test_environment()
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            dataset = benchmark.Dataset(scale=options["scale"]).seed()
+            plans = query_plans.run(dataset, only=options["only"])
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+
+        for plan in plans:
+            self.stdout.write(query_plans.format_plan(plan))
+
+        scanning = [plan.name for plan in plans if plan.scans]
+        if scanning:
+            raise CommandError("Full table scans in: " + ", ".join(scanning))
+        self.stdout.write(self.style.SUCCESS(f"{len(plans)} queries, none scan a whole table."))
@@ -0,0 +1,105 @@
+"""
+Query plans of the hot view querysets.
+
+Each entry in ``QUERIES`` rebuilds a queryset a view runs
+against the synthetic ``benchmark.Dataset``, keyed by the view's URL name
+(with the variant in brackets). ``run`` asks the database for each plan
+(``QuerySet.explain``, which is ``EXPLAIN QUERY PLAN`` on SQLite) and lists
+the steps that read a whole table instead of going through an index.
+Sorts done outside an index are reported as well but are not failures: a
+handful of rows per user or room is cheap to sort.
+"""
+import re
+from dataclasses import dataclass, field
+
+from django.db.models import Count, Sum
+from django.db.models.functions import TruncMonth
+
+from storeapp.models import Order, Product
+from storeapp.pagination import KeysetPagination
+from support.models import ChatMessage, SupportNotification, SupportRoom
+
+
+ROOM_RELATED = ("customer", "support_agent", "last_message")
+LISTING_ORDER = ("-created_at", "-id")
+
+# A full table read: SQLite "SCAN <table>" without an index, PostgreSQL "Seq Scan"
+FULL_SCAN = re.compile(r"\bSCAN (?!.*\bUSING\b)|\bSeq Scan\b")
+SORT = re.compile(r"USE TEMP B-TREE|\bSort\b")
+
+
+def after_cursor(queryset, row, page_size):
+    """The next cursor page after ``row``, as ``?paginate=cursor`` pages the listings."""
+    paginator = KeysetPagination(LISTING_ORDER, page_size=page_size)
+    return queryset.order_by(*LISTING_ORDER).filter(paginator.seek(paginator.key_for(row), False))[:page_size]
+
+
+QUERIES = {
+    # storeapp
+    "get_featured_products": lambda d: Product.objects.filter(featured=True),
+    "get_all_products": lambda d: Product.objects.filter(category="books").order_by("-id")[:8],
+    "admin-dashboard-stats": lambda d: Product.objects.filter(quantity__lt=10).values(
+        "id", "name", "category", "quantity"
+    ),
+    "analytics-data": lambda d: (
+        Order.objects.filter(status="success")
+        .annotate(month=TruncMonth("created_at"))
+        .values("month")
+        .annotate(sales=Sum("total_amount"), orders=Count("id"))
+        .order_by("month")
+    ),
+    "get_products": lambda d: Product.objects.order_by(*LISTING_ORDER)[:8],
+    "get_products (cursor)": lambda d: after_cursor(Product.objects.all(), d.product(), 8),
+    "get_user_orders": lambda d: Order.objects.filter(user=d.customer).order_by(*LISTING_ORDER)[:5],
+    "get_all_orders": lambda d: Order.objects.order_by(*LISTING_ORDER)[:10],
+    "get_all_orders (cursor)": lambda d: after_cursor(Order.objects.all(), Order.objects.order_by("pk")[50], 10),
+    "get_all_orders (status)": lambda d: Order.objects.filter(status="pending").order_by(*LISTING_ORDER)[:10],
+    # support
+    "create-support-room": lambda d: SupportRoom.objects.filter(
+        customer=d.customer, status__in=["active", "pending"]
+    )[:1],
+    "get-user-rooms (agent)": lambda d: SupportRoom.objects.filter(support_agent=d.staff).select_related(*ROOM_RELATED),
+    "get-user-rooms (customer)": lambda d: SupportRoom.objects.filter(customer=d.customer).select_related(*ROOM_RELATED),
+    "get-pending-rooms": lambda d: SupportRoom.objects.filter(status="pending").select_related(*ROOM_RELATED),
+    "get-notifications": lambda d: SupportNotification.objects.filter(
+        support_agent=d.staff, is_read=False
+    ).select_related("room__customer", "room__support_agent", "room__last_message"),
+    "get-room-messages": lambda d: ChatMessage.objects.filter(room_id=d.room.pk).order_by("-pk")[:51],
+    "get-room-messages (full)": lambda d: ChatMessage.objects.filter(room=d.room).select_related("sender"),
+    "mark-room-read": lambda d: ChatMessage.objects.filter(
+        room_id=d.room.pk, sender_type="customer", pk__gt=d.room.agent_read_upto
+    ).order_by().values("pk"),
+    "send-message": lambda d: ChatMessage.objects.filter(room=d.room).order_by("-created_at")[:5],
+}
+
+
+@dataclass
+class Plan:
+    name: str
+    steps: list = field(default_factory=list)
+
+    @property
+    def scans(self):
+        return [step for step in self.steps if FULL_SCAN.search(step)]
+
+    @property
+    def sorts(self):
+        return [step for step in self.steps if SORT.search(step)]
+
+
+def explain(queryset):
+    """The plan steps of ``queryset``, one per line."""
+    return [line.strip() for line in queryset.explain().splitlines() if line.strip()]
+
+
+def run(dataset, only=None):
+    return [
+        Plan(name, explain(build(dataset)))
+        for name, build in QUERIES.items()
+        if not only or name in only
+    ]
+
+
+def format_plan(plan):
+    verdict = "SCAN" if plan.scans else ("sort" if plan.sorts else "ok")
+    return "\n".join([f"{plan.name}: {verdict}", *(f"    {step}" for step in plan.steps)])
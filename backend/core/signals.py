@@ -0,0 +1,24 @@
+"""
+Keep ``core.user_cache`` in step with the users table.
+"""
+from django.contrib.auth import get_user_model
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from . import user_cache
+
+
+User = get_user_model()
+
+
+@receiver(post_save, sender=User)
+def user_saved(sender, instance, update_fields=None, **kwargs):
+    # Logins only touch last_login, which the cache does not hold
+    if update_fields is not None and not set(update_fields) & set(user_cache.PROJECTED_FIELDS):
+        return
+    user_cache.invalidate(instance.pk)
+
+
+@receiver(post_delete, sender=User)
+def user_deleted(sender, instance, **kwargs):
+    user_cache.invalidate(instance.pk)
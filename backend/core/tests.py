@@ -1,3 +1,159 @@
-from django.test import TestCase
+import tempfile
 
-# Create your tests here.
+from asgiref.sync import async_to_sync
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from rest_framework_simplejwt.tokens import AccessToken
+
+from ecommerce.media import IMMUTABLE
+from ecommerce.middleware import TokenAuthMiddleware
+from . import benchmark, query_plans, user_cache
+
+
+@override_settings(PASSWORD_HASHERS=["django.contrib.auth.hashers.MD5PasswordHasher"])
+class EndpointBudgetTests(TestCase):
+    """Runs the benchmark harness at baseline scale and fails on regressions."""
+
+    def test_every_url_has_a_scenario(self):
+        self.assertEqual(benchmark.missing_scenarios(), [])
+
+    def test_endpoints_stay_within_budget(self):
+        baseline = benchmark.load_baseline()
+        results = benchmark.run(scale=baseline["scale"], iterations=3)
+
+        # Latency is noisy on shared CI machines, so only catch blowups here;
+        # `manage.py benchmark_endpoints` applies the tighter default tolerance.
+        problems = benchmark.compare(results, baseline, latency_tolerance=10)
+        self.assertEqual(problems, [], "\n".join(problems))
+
+
+@override_settings(PASSWORD_HASHERS=["django.contrib.auth.hashers.MD5PasswordHasher"])
+class QueryPlanTests(TestCase):
+    def test_hot_queries_use_indexes(self):
+        plans = query_plans.run(benchmark.Dataset().seed())
+        self.assertEqual(len(plans), len(query_plans.QUERIES))
+        scanning = {plan.name: plan.scans for plan in plans if plan.scans}
+        self.assertEqual(scanning, {})
+
+    def test_full_scans_are_told_apart_from_index_scans(self):
+        plan = query_plans.Plan("x", [
+            "2 0 0 SCAN storeapp_product",
+            "3 0 0 SCAN storeapp_product USING INDEX product_featured_idx",
+            "4 0 0 USE TEMP B-TREE FOR ORDER BY",
+        ])
+        self.assertEqual(plan.scans, ["2 0 0 SCAN storeapp_product"])
+        self.assertEqual(plan.sorts, ["4 0 0 USE TEMP B-TREE FOR ORDER BY"])
+
+
+@override_settings(CACHES=benchmark.LOCMEM_CACHES)
+class WebsocketAuthTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        user_cache.tokens.clear()
+        user_cache.users.clear()
+        self.user = get_user_model().objects.create_user(
+            email="ws@example.com", username="ws", password="secret", is_staff=True
+        )
+        self.token = str(AccessToken.for_user(self.user))
+
+    def resolve(self, token=None):
+        return async_to_sync(user_cache.user_for_token)(token or self.token)
+
+    def test_reconnects_do_not_read_the_database(self):
+        with self.assertNumQueries(1):
+            user = self.resolve()
+        with self.assertNumQueries(0):
+            for _ in range(50):
+                self.assertEqual(self.resolve().pk, user.pk)
+        self.assertEqual((user.email, user.is_staff), ("ws@example.com", True))
+        self.assertEqual(user.get_deferred_fields(), {
+            f.attname for f in user._meta.concrete_fields if f.attname not in user_cache.PROJECTED_FIELDS
+        })
+
+        # A new worker process starts with empty local tiers and reads the shared cache
+        user_cache.tokens.clear()
+        user_cache.users.clear()
+        with self.assertNumQueries(0):
+            self.assertEqual(self.resolve().pk, user.pk)
+
+    def test_user_changes_invalidate_the_cache(self):
+        self.resolve()
+        self.user.last_login = timezone.now()
+        self.user.save(update_fields=["last_login"])
+        with self.assertNumQueries(0):
+            self.resolve()
+
+        self.user.is_active = False
+        self.user.save()
+        self.assertFalse(self.resolve().is_authenticated)
+
+        self.user.is_active = True
+        self.user.save()
+        self.assertTrue(self.resolve().is_authenticated)
+        self.user.delete()
+        self.assertFalse(self.resolve().is_authenticated)
+
+    def test_middleware_sets_scope_user(self):
+        from ecommerce import asgi  # noqa: F401  (the websocket stack imports cleanly)
+
+        scopes = []
+
+        async def app(scope, receive, send):
+            scopes.append(scope)
+
+        middleware = TokenAuthMiddleware(app)
+        for query_string in (f"token={self.token}".encode(), b"token=not-a-jwt", b""):
+            async_to_sync(middleware)({"type": "websocket", "query_string": query_string}, None, None)
+
+        self.assertEqual(scopes[0]["user"].pk, self.user.pk)
+        self.assertFalse(scopes[1]["user"].is_authenticated)
+        self.assertFalse(scopes[2]["user"].is_authenticated)
+
+
+class MediaTests(TestCase):
+    def setUp(self):
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        self.settings_override = override_settings(MEDIA_ROOT=media.name)
+        self.settings_override.enable()
+        self.addCleanup(self.settings_override.disable)
+        self.name = default_storage.save("product_images/photo.png", ContentFile(b"0123456789" * 10))
+
+    def test_same_content_is_stored_once_under_its_hash(self):
+        again = default_storage.save("product_images/other-name.PNG", ContentFile(b"0123456789" * 10))
+        self.assertEqual(again, self.name)
+        self.assertRegex(self.name, r"^product_images/[0-9a-f]{64}\.png$")
+        self.assertEqual(default_storage.listdir("product_images")[1], [self.name.split("/")[1]])
+
+    def test_hashed_files_are_immutable_and_revalidate_by_etag(self):
+        response = self.client.get(f"/img/{self.name}")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["Cache-Control"], IMMUTABLE)
+        self.assertEqual(b"".join(response.streaming_content), b"0123456789" * 10)
+
+        cached = self.client.get(f"/img/{self.name}", HTTP_IF_NONE_MATCH=response["ETag"])
+        self.assertEqual(cached.status_code, 304)
+
+    def test_range_requests(self):
+        response = self.client.get(f"/img/{self.name}", HTTP_RANGE="bytes=10-14")
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response["Content-Range"], "bytes 10-14/100")
+        self.assertEqual(b"".join(response.streaming_content), b"01234")
+
+        suffix = self.client.get(f"/img/{self.name}", HTTP_RANGE="bytes=-3")
+        self.assertEqual(b"".join(suffix.streaming_content), b"789")
+
+        outside = self.client.get(f"/img/{self.name}", HTTP_RANGE="bytes=500-")
+        self.assertEqual(outside.status_code, 416)
+
+    def test_accel_redirect_and_path_traversal(self):
+        with override_settings(MEDIA_ACCEL_REDIRECT="/protected-media/"):
+            response = self.client.get(f"/img/{self.name}")
+        self.assertEqual(response["X-Accel-Redirect"], f"/protected-media/{self.name}")
+        self.assertEqual(response.content, b"")
+
+        self.assertEqual(self.client.get("/img/..%2F..%2Fmanage.py").status_code, 400)
@@ -0,0 +1,157 @@
+"""
+Cached user lookups for websocket authentication.
+
+A websocket connect only needs to know who the token belongs to, so
+``user_for_token`` validates a JWT once and keeps a small projection of the
+user (``PROJECTED_FIELDS``) in two tiers:
+
+* an in-process dict with a short TTL (``USER_CACHE_LOCAL_TTL``), so a
+  reconnect storm is answered without leaving the event loop;
+* the shared cache (Redis) with a longer TTL (``USER_CACHE_TIMEOUT``), so a
+  freshly deployed worker does not send every reconnect to the database.
+
+The user comes back as a ``User`` with every other field deferred, the same
+as ``User.objects.only(*PROJECTED_FIELDS)`` would give: it can be used as a
+foreign key value, and touching any other field loads it from the database.
+
+Saving or deleting a user calls ``invalidate`` (``core.signals``), which
+drops both tiers in this process; other processes drop their local copy
+when its TTL runs out.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+from channels.db import database_sync_to_async
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import AccessToken
+
+
+User = get_user_model()
+
+PROJECTED_FIELDS = ("id", "email", "is_staff", "is_active")
+DEFAULT_TIMEOUT = 60 * 15
+DEFAULT_LOCAL_TTL = 30
+# Entries kept per process in each local tier before the oldest are evicted
+LOCAL_MAX_ENTRIES = 10_000
+
+
+class LocalCache:
+    """A bounded, thread-safe dict whose entries expire at a given time."""
+
+    def __init__(self, max_entries=LOCAL_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            value, expires_at = entry
+            if expires_at <= time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl):
+        with self._lock:
+            self._entries[key] = (value, time.monotonic() + ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+tokens = LocalCache()
+users = LocalCache()
+
+
+def user_key(user_id):
+    return f"ws-user:{user_id}"
+
+
+def local_ttl():
+    return getattr(settings, "USER_CACHE_LOCAL_TTL", DEFAULT_LOCAL_TTL)
+
+
+def timeout():
+    return getattr(settings, "USER_CACHE_TIMEOUT", DEFAULT_TIMEOUT)
+
+
+def user_id_for_token(token):
+    """The user id in a valid access token, or None. Each token is verified once."""
+    user_id = tokens.get(token)
+    if user_id is not None:
+        return user_id
+    try:
+        access_token = AccessToken(token)
+    except TokenError:
+        return None
+    user_id = access_token.get(api_settings.USER_ID_CLAIM)
+    if user_id is None:
+        return None
+    # Kept until it expires: nothing about a signed token changes before then
+    ttl = access_token["exp"] - time.time()
+    if ttl > 0:
+        tokens.set(token, user_id, ttl)
+    return user_id
+
+
+def from_projection(projection):
+    # from_db() takes a subset of fields in model field order
+    names = [field.attname for field in User._meta.concrete_fields if field.attname in projection]
+    return User.from_db(User.objects.db, names, [projection[name] for name in names])
+
+
+def load_projection(user_id):
+    """The projection of ``user_id`` from the shared cache or, failing that, the database."""
+    key = user_key(user_id)
+    projection = cache.get(key)
+    if projection is None:
+        projection = User.objects.filter(pk=user_id).values(*PROJECTED_FIELDS).first()
+        if projection is None:
+            return None
+        cache.set(key, projection, timeout=timeout())
+    return projection
+
+
+async def user_for_token(token):
+    """
+    The active user a JWT access token belongs to, or ``AnonymousUser``.
+    Local hits never leave the event loop.
+    """
+    user_id = user_id_for_token(token) if token else None
+    if user_id is None:
+        return AnonymousUser()
+
+    projection = users.get(user_key(user_id))
+    if projection is None:
+        projection = await database_sync_to_async(load_projection)(user_id)
+        if projection is None:
+            return AnonymousUser()
+        users.set(user_key(user_id), projection, local_ttl())
+
+    if not projection["is_active"]:
+        return AnonymousUser()
+    return from_projection(projection)
+
+
+def invalidate(user_id):
+    """Forget the cached projection of ``user_id``."""
+    users.delete(user_key(user_id))
+    cache.delete(user_key(user_id))
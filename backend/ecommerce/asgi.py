@@ -10,18 +10,24 @@ https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
 import os
 
 from django.core.asgi import get_asgi_application
-from middleware import TokenAuthMiddleware
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'ecommerce.settings')
+
+# Set up Django before importing anything that touches models
+django_asgi_app = get_asgi_application()
+
+from channels.routing import ProtocolTypeRouter, URLRouter  # noqa: E402
+from channels.security.websocket import AllowedHostsOriginValidator  # noqa: E402
+
+from ecommerce.middleware import TokenAuthMiddleware  # noqa: E402
+from support.routing import websocket_urlpatterns  # noqa: E402
 
 
 application = ProtocolTypeRouter({
-    "http": django_asgi_app;
+    "http": django_asgi_app,
     "websocket": AllowedHostsOriginValidator(
         TokenAuthMiddleware(
             URLRouter(websocket_urlpatterns)
         )
     ),
 })
-
-os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'ecommerce.settings')
-
-application = get_asgi_application()
@@ -0,0 +1,170 @@
+"""
+Content-addressed media storage and serving.
+
+``ContentAddressedStorage`` ignores the file name it is given apart from the
+directory and extension, and stores every file as ``<dir>/<sha256><ext>``.
+Saving content that is already there writes nothing and returns the
+existing name, so the same image is never stored twice. Because a name can
+only ever refer to one content, media URLs never go stale.
+
+``serve`` hands those files out with ``Cache-Control: immutable`` and a year
+of max-age. Browsers and CDNs therefore only ask Python once per file. It
+also answers ``If-None-Match`` with 304 and single ``Range`` requests with
+206. Files from before this storage (not named by hash) get an ETag and a
+short max-age instead.
+
+In production, set ``MEDIA_ACCEL_REDIRECT`` to the prefix of an nginx
+``internal`` location aliased to ``MEDIA_ROOT``. The view then only
+sets the headers and lets nginx send the bytes (``X-Accel-Redirect``),
+including ranges.
+"""
+import hashlib
+import mimetypes
+import os
+import posixpath
+import re
+
+from django.conf import settings
+from django.core.files.base import File
+from django.core.files.storage import FileSystemStorage
+from django.http import FileResponse, Http404, HttpResponse, HttpResponseNotModified, StreamingHttpResponse
+from django.utils._os import safe_join
+from django.utils.http import http_date
+from django.views.decorators.http import require_safe
+
+
+HASH_CHUNK = 64 * 1024
+HASHED_NAME = re.compile(r"^[0-9a-f]{64}$")
+IMMUTABLE = "public, max-age=31536000, immutable"
+REVALIDATE = "public, max-age=3600"
+RANGE = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+
+def file_digest(content):
+    """SHA-256 of a file object, read in chunks; the position is reset."""
+    digest = hashlib.sha256()
+    content.seek(0)
+    for chunk in iter(lambda: content.read(HASH_CHUNK), b""):
+        digest.update(chunk)
+    content.seek(0)
+    return digest.hexdigest()
+
+
+def is_hashed(name):
+    return bool(HASHED_NAME.match(posixpath.splitext(posixpath.basename(name))[0]))
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    """``FileSystemStorage`` that names files by the SHA-256 of their content."""
+
+    def __init__(self, *args, **kwargs):
+        # Two concurrent saves of the same content write the same bytes
+        kwargs.setdefault("allow_overwrite", True)
+        super().__init__(*args, **kwargs)
+
+    def content_name(self, name, content):
+        directory, filename = posixpath.split(name.replace("\\", "/"))
+        extension = posixpath.splitext(filename)[1].lower()
+        # Uploads that were already hashed on the way in carry their digest
+        digest = getattr(content, "sha256", None) or file_digest(content)
+        return posixpath.join(directory, digest + extension)
+
+    def save(self, name, content, max_length=None):
+        if name is None:
+            name = content.name
+        if not hasattr(content, "chunks"):
+            content = File(content, name)
+        name = self.content_name(name, content)
+        if self.exists(name):
+            return name
+        return super().save(name, content, max_length=max_length)
+
+
+def parse_range(header, size):
+    """``(start, end)`` inclusive for a single satisfiable byte range, None to send it all, or ValueError."""
+    match = RANGE.match(header.strip())
+    if not match or not any(match.groups()):
+        # Malformed or multiple ranges: ignoring the header is allowed
+        return None
+    first, last = match.groups()
+    if first:
+        start = int(first)
+        end = min(int(last), size - 1) if last else size - 1
+    else:
+        start, end = max(0, size - int(last)), size - 1
+    if start > end or start >= size:
+        raise ValueError("unsatisfiable range")
+    return start, end
+
+
+def read_range(path, start, length):
+    with open(path, "rb") as file:
+        file.seek(start)
+        while length > 0:
+            chunk = file.read(min(HASH_CHUNK, length))
+            if not chunk:
+                break
+            length -= len(chunk)
+            yield chunk
+
+
+@require_safe
+def serve(request, path):
+    try:
+        full_path = safe_join(settings.MEDIA_ROOT, path)
+        stat = os.stat(full_path)
+    except (OSError, ValueError):
+        raise Http404("Media file not found")
+    if not os.path.isfile(full_path):
+        raise Http404("Media file not found")
+
+    hashed = is_hashed(path)
+    if hashed:
+        etag = f'"{posixpath.splitext(posixpath.basename(path))[0]}"'
+    else:
+        etag = f'"{int(stat.st_mtime):x}-{stat.st_size:x}"'
+    headers = {
+        "ETag": etag,
+        "Cache-Control": IMMUTABLE if hashed else REVALIDATE,
+        "Last-Modified": http_date(stat.st_mtime),
+        "Accept-Ranges": "bytes",
+    }
+
+    if_none_match = request.headers.get("If-None-Match", "")
+    if etag in [tag.strip() for tag in if_none_match.split(",")] or if_none_match.strip() == "*":
+        response = HttpResponseNotModified()
+        for header, value in headers.items():
+            response.headers[header] = value
+        return response
+
+    content_type = mimetypes.guess_type(full_path)[0] or "application/octet-stream"
+    accel_prefix = getattr(settings, "MEDIA_ACCEL_REDIRECT", None)
+    if accel_prefix:
+        # nginx sends the file, handling Range itself
+        response = HttpResponse(content_type=content_type, headers=headers)
+        response.headers["X-Accel-Redirect"] = accel_prefix.rstrip("/") + "/" + path.lstrip("/")
+        return response
+
+    byte_range = None
+    range_header = request.headers.get("Range")
+    if_range = request.headers.get("If-Range")
+    if range_header and (not if_range or if_range == etag):
+        try:
+            byte_range = parse_range(range_header, stat.st_size)
+        except ValueError:
+            response = HttpResponse(status=416, headers=headers)
+            response.headers["Content-Range"] = f"bytes */{stat.st_size}"
+            return response
+
+    if byte_range is None:
+        response = FileResponse(open(full_path, "rb"), content_type=content_type)
+    else:
+        start, end = byte_range
+        length = end - start + 1
+        body = [] if request.method == "HEAD" else read_range(full_path, start, length)
+        response = StreamingHttpResponse(body, status=206, content_type=content_type)
+        response.headers["Content-Range"] = f"bytes {start}-{end}/{stat.st_size}"
+        response.headers["Content-Length"] = str(length)
+    for header, value in headers.items():
+        response.headers[header] = value
+    return response
@@ -1,29 +1,21 @@
-from channels.db import database_sync_to_async
-from django.contrib.auth.models import AnonymousUser
-from rest_framework_simplejwt.tokens import untypedToken
-from django.contrib.auth import get_user_model
+from urllib.parse import parse_qs
 
-User = get_user_model()
+from core.user_cache import user_for_token
 
-@database_sync_to_async
-def get_user_from_token(token):
-    try:
-        UntypedToken(token)
-        from rest_framework_simplejwt.tokens import AccessToken
-        access_token = AccessToken(token)
-        user_id = access_token['user_id']
-        return User.objects.get(id=user_id)
-    except:
-        return AnonymousUser()
 
 class TokenAuthMiddleware:
+    """
+    Sets ``scope['user']`` from the ``?token=`` JWT access token of a
+    websocket connection. Users are resolved through ``core.user_cache``, so
+    reconnects do not read the database.
+    """
+
     def __init__(self, app):
         self.app = app
 
     async def __call__(self, scope, receive, send):
-        query_string = scope.get('query_string', b'').decode()
-        params = dict(x.split('=') for x in query_string.split('&') if '=' in x)
-        token = params.get('token')
-        
-        scope['user'] = await get_user_from_token(token) if token else AnonymousUser()
-        return await self.app(scope, receive, send)
\ No newline at end of file
+        params = parse_qs(scope.get('query_string', b'').decode())
+        token = params.get('token', [None])[0]
+
+        scope['user'] = await user_for_token(token)
+        return await self.app(scope, receive, send)
@@ -79,7 +79,7 @@ TEMPLATES = [
     },
 ]
 
-ASGI_APPLICATION = 'ecommerce.wsgi.application'
+ASGI_APPLICATION = 'ecommerce.asgi.application'
 # Redis Channel Layers
 CHANNEL_LAYERS = {
     'default': {
@@ -97,13 +97,25 @@ CACHES = {
         'LOCATION': 'redis://127.0.0.1:6379/1',
         'OPTIONS': {
             'CLIENT_CLASS': 'django_redis.client.DefaultClient',
+            # A Redis outage degrades to cache misses instead of 500s
+            'IGNORE_EXCEPTIONS': True,
         }
     }
 }
 
+# Seconds a cached catalog payload (product list/detail/featured) is kept
+CATALOG_CACHE_TIMEOUT = 60 * 15
+
+# Websocket connects resolve users from these caches (core/user_cache.py):
+# seconds a user is kept in the shared cache, and in each worker process
+USER_CACHE_TIMEOUT = 60 * 15
+USER_CACHE_LOCAL_TTL = 30
+
 
 # Push Notifications Configuration (Firebase Cloud Messaging)
 FCM_SERVER_KEY = os.getenv('FCM_SERVER_KEY', '')  # Add to .env
+# Point at a local fake (manage.py fake_fcm) to exercise delivery offline
+FCM_URL = os.getenv('FCM_URL', 'https://fcm.googleapis.com/fcm/send')
 FCM_DJANGO_SETTINGS = {
     "FCM_SERVER_KEY": FCM_SERVER_KEY,
     "ONE_DEVICE_PER_USER": False,
@@ -169,6 +181,15 @@ STATIC_URL = 'static/'
 MEDIA_URL = 'img/'
 MEDIA_ROOT = BASE_DIR/'media'
 
+# Uploads are stored under their content hash and served with immutable
+# cache headers (ecommerce/media.py). Behind nginx, set MEDIA_ACCEL_REDIRECT
+# to an internal location aliased to MEDIA_ROOT so nginx sends the files.
+STORAGES = {
+    "default": {"BACKEND": "ecommerce.media.ContentAddressedStorage"},
+    "staticfiles": {"BACKEND": "django.contrib.staticfiles.storage.StaticFilesStorage"},
+}
+MEDIA_ACCEL_REDIRECT = os.getenv("MEDIA_ACCEL_REDIRECT")
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
@@ -176,6 +197,18 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 GEMINI_API_KEY=os.getenv("GEMINI_API_KEY")
 PAYSTACK_SECRET_KEY=os.getenv("PAYSTACK_SECRET_KEY")
 
+# Text generation goes through storeapp/llm.py; "stub" answers locally
+LLM_BACKEND = os.getenv("LLM_BACKEND", "gemini")
+LLM_TIMEOUT = float(os.getenv("LLM_TIMEOUT", 20))
+# Support bot replies generating at once per worker, and allowed to wait
+SUPPORT_BOT_CONCURRENCY = int(os.getenv("SUPPORT_BOT_CONCURRENCY", 4))
+SUPPORT_BOT_QUEUE = int(os.getenv("SUPPORT_BOT_QUEUE", 16))
+
+# Background work (webhook processing, ...) runs on an in-process thread
+# pool; set BACKGROUND_TASKS_EAGER to run it inline instead
+BACKGROUND_TASK_WORKERS = int(os.getenv("BACKGROUND_TASK_WORKERS", 4))
+BACKGROUND_TASKS_EAGER = os.getenv("BACKGROUND_TASKS_EAGER") == "1"
+
 AUTH_USER_MODEL = 'core.CustomUser'
 
 SIMPLE_JWT = {
@@ -0,0 +1,64 @@
+"""
+Small in-process background task runner.
+
+Work that should not hold up an HTTP response is handed to a shared thread
+pool with ``submit`` (or ``submit_on_commit`` when it depends on rows the
+current transaction is writing). Tasks must be safe to re-run: anything that
+matters is also persisted so a management-command worker can pick it up if
+the process dies first.
+
+Set ``BACKGROUND_TASKS_EAGER = True`` to run tasks inline, as the tests do.
+"""
+import logging
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import close_old_connections, connection, transaction
+
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_executor():
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(
+                    max_workers=getattr(settings, "BACKGROUND_TASK_WORKERS", 4),
+                    thread_name_prefix="background-task",
+                )
+    return _executor
+
+
+def run_task(func, *args, **kwargs):
+    close_old_connections()
+    try:
+        return func(*args, **kwargs)
+    except Exception:
+        logger.exception("Background task %s failed", getattr(func, "__name__", func))
+        raise
+    finally:
+        connection.close()
+
+
+def submit(func, *args, **kwargs):
+    """Run ``func`` in the background and return its ``Future``."""
+    if getattr(settings, "BACKGROUND_TASKS_EAGER", False):
+        future = Future()
+        try:
+            future.set_result(func(*args, **kwargs))
+        except Exception as error:
+            logger.exception("Background task %s failed", getattr(func, "__name__", func))
+            future.set_exception(error)
+        return future
+    return get_executor().submit(run_task, func, *args, **kwargs)
+
+
+def submit_on_commit(func, *args, **kwargs):
+    """Run ``func`` in the background once the current transaction commits."""
+    transaction.on_commit(lambda: submit(func, *args, **kwargs))
@@ -15,11 +15,12 @@ Including another URLconf
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
 from django.contrib import admin
-from django.urls import path, include
+from django.urls import path, include, re_path
 from django.conf import settings 
-from django.conf.urls.static import static
 from rest_framework_simplejwt.views import TokenRefreshView
 
+from ecommerce import media
+
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('', include("storeapp.urls")),
@@ -28,4 +29,6 @@ urlpatterns = [
     path('support/', include('support.urls')),
 ]
 
-urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
+urlpatterns += [
+    re_path(rf"^{settings.MEDIA_URL.lstrip('/')}(?P<path>.+)$", media.serve, name="media"),
+]
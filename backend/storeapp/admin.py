@@ -1,5 +1,9 @@
 from django.contrib import admin
-from .models import Order, Orderitem, Product, Cart, CartItem, ShippingInfo
+from django.core.files.uploadedfile import UploadedFile
+from .models import GeneratedText, Order, Orderitem, PaymentEvent, Product, Cart, CartItem, ShippingInfo
+from .cache import bump_catalog_version
+from .images import schedule_renditions
+from .uploads import store_image
 
 
 class ProductAdmin(admin.ModelAdmin):
@@ -10,6 +14,22 @@ class ProductAdmin(admin.ModelAdmin):
     ordering = ('-created_at',)
     list_editable = ('featured', 'price', 'quantity')
 
+    def save_model(self, request, obj, form, change):
+        if isinstance(form.cleaned_data.get("image"), UploadedFile):
+            obj.image = store_image(form.cleaned_data["image"])
+        super().save_model(request, obj, form, change)
+        bump_catalog_version()
+        if "image" in form.changed_data:
+            schedule_renditions(obj)
+
+    def delete_model(self, request, obj):
+        super().delete_model(request, obj)
+        bump_catalog_version()
+
+    def delete_queryset(self, request, queryset):
+        super().delete_queryset(request, queryset)
+        bump_catalog_version()
+
 
 class CartItemInline(admin.TabularInline):
     model = CartItem
@@ -55,4 +75,20 @@ class OrderItemAdmin(admin.ModelAdmin):
 class ShippingInfoAdmin(admin.ModelAdmin):
     list_display = ("user", "first_name", "last_name", "email", "city", "state", "zip_code")
     search_fields = ("user__email", "first_name", "last_name", "city", "state")
-    list_filter = ("city", "state")
\ No newline at end of file
+    list_filter = ("city", "state")
+
+@admin.register(PaymentEvent)
+class PaymentEventAdmin(admin.ModelAdmin):
+    list_display = ("event_id", "event", "reference", "status", "attempts", "received_at")
+    list_filter = ("status", "event")
+    search_fields = ("event_id", "reference")
+    readonly_fields = ("event_id", "event", "reference", "payload", "received_at", "updated_at")
+    ordering = ("-received_at",)
+
+
+@admin.register(GeneratedText)
+class GeneratedTextAdmin(admin.ModelAdmin):
+    list_display = ("model", "prompt", "created_at")
+    search_fields = ("prompt", "text")
+    readonly_fields = ("key", "model", "prompt", "created_at")
+    ordering = ("-created_at",)
@@ -0,0 +1,278 @@
+"""
+Bulk product import and export.
+
+Imports read CSV or JSON Lines as a stream and work in chunks. Each chunk
+is validated row by row, matched against existing products by SKU in one
+query, given SKUs and slugs in a batch, and written with one
+``bulk_create(update_conflicts=True)`` upsert on SKU inside a transaction. Bad rows
+are reported with their line number and skipped; the rest of the file
+still goes in. Uploads are decoded line by line, so a line that is not
+UTF-8 ends the import there with an error on that line, keeping every row
+read before it.
+
+Exports stream rows straight from a database cursor, so memory stays flat
+whatever the catalog size.
+"""
+import csv
+import json
+from dataclasses import dataclass, field
+from decimal import Decimal, InvalidOperation
+
+from django.db import IntegrityError, transaction
+
+from .cache import bump_catalog_version
+from .identifiers import product_sku
+from .models import Product
+from .slugs import allocate_slugs, base_slug, has_base
+
+
+FORMATS = ("csv", "jsonl")
+FIELDS = ["sku", "name", "category", "description", "price", "quantity", "minimumStock", "featured"]
+UPDATE_FIELDS = ["name", "slug", "category", "description", "price", "quantity", "minimumStock", "featured"]
+CATEGORIES = {value for value, _ in Product.CATEGORIES}
+TRUE_VALUES = {"true", "1", "yes", "y"}
+FALSE_VALUES = {"false", "0", "no", "n", ""}
+
+CHUNK_SIZE = 1000
+# Errors kept in a report; the total count is always exact
+MAX_REPORTED_ERRORS = 1000
+# Stands in for the row that could not be decoded; nothing after it is read
+UNREADABLE = object()
+
+
+class RowError(ValueError):
+    pass
+
+
+@dataclass
+class ImportReport:
+    created: int = 0
+    updated: int = 0
+    error_count: int = 0
+    errors: list = field(default_factory=list)
+
+    def add_error(self, line, messages):
+        self.error_count += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({"line": line, "errors": messages})
+
+    def as_dict(self):
+        return {
+            "created": self.created,
+            "updated": self.updated,
+            "error_count": self.error_count,
+            "errors": self.errors,
+        }
+
+
+def format_for(filename, default="csv"):
+    if filename and filename.lower().endswith((".jsonl", ".ndjson")):
+        return "jsonl"
+    if filename and filename.lower().endswith(".csv"):
+        return "csv"
+    return default
+
+
+def decode_lines(binary_lines):
+    """Decode an uploaded file one line at a time, skipping a leading BOM."""
+    for index, line in enumerate(binary_lines):
+        yield line.decode("utf-8-sig" if index == 0 else "utf-8")
+
+
+def read_rows(lines, file_format):
+    """
+    Yield ``(line_number, row)`` from an iterable of text lines. A line that
+    fails to decode is yielded as ``UNREADABLE`` and ends the rows.
+    """
+    if file_format == "csv":
+        reader = csv.DictReader(lines)
+        try:
+            for row in reader:
+                yield reader.line_num, row
+        except UnicodeDecodeError:
+            yield reader.line_num + 1, UNREADABLE
+        return
+
+    line_number = 0
+    try:
+        for line_number, line in enumerate(lines, start=1):
+            if not line.strip():
+                continue
+            try:
+                row = json.loads(line)
+            except ValueError:
+                row = None
+            yield line_number, row if isinstance(row, dict) else None
+    except UnicodeDecodeError:
+        yield line_number + 1, UNREADABLE
+
+
+def clean_text(row, name, max_length=None, required=False):
+    value = row.get(name)
+    value = "" if value is None else str(value).strip()
+    if required and not value:
+        raise RowError(f"{name}: this field is required")
+    if max_length and len(value) > max_length:
+        raise RowError(f"{name}: at most {max_length} characters")
+    return value
+
+
+def clean_number(row, name, default=None):
+    value = row.get(name)
+    if value in (None, ""):
+        if default is None:
+            raise RowError(f"{name}: this field is required")
+        return default
+    try:
+        number = int(str(value).strip())
+    except ValueError:
+        raise RowError(f"{name}: must be a whole number")
+    if number < 0:
+        raise RowError(f"{name}: must not be negative")
+    return number
+
+
+def clean_row(row):
+    """Validate one input row; returns the model values or raises ``RowError`` with every problem."""
+    if row is UNREADABLE:
+        raise RowError(["not valid UTF-8; the rest of the file was not read"])
+    if row is None:
+        raise RowError(["not a valid JSON object"])
+
+    values, messages = {}, []
+    checks = {
+        "sku": lambda: clean_text(row, "sku", max_length=50),
+        "name": lambda: clean_text(row, "name", max_length=200, required=True),
+        "description": lambda: clean_text(row, "description"),
+        "quantity": lambda: clean_number(row, "quantity", default=0),
+        "minimumStock": lambda: clean_number(row, "minimumStock", default=10),
+    }
+    for name, check in checks.items():
+        try:
+            values[name] = check()
+        except RowError as error:
+            messages.append(str(error))
+
+    category = clean_text(row, "category") or None
+    if category is not None and category not in CATEGORIES:
+        messages.append(f"category: unknown category {category!r}")
+    values["category"] = category
+
+    try:
+        price = Decimal(str(row.get("price", "")).strip())
+        if not price.is_finite() or price < 0 or price.as_tuple().exponent < -2 or price >= Decimal("1e8"):
+            raise InvalidOperation
+        values["price"] = price
+    except InvalidOperation:
+        messages.append("price: must be a non-negative amount with at most 2 decimal places")
+
+    featured = str(row.get("featured", "") or "").strip().lower()
+    if featured in TRUE_VALUES | FALSE_VALUES:
+        values["featured"] = featured in TRUE_VALUES
+    else:
+        messages.append("featured: must be true or false")
+
+    if messages:
+        raise RowError(messages)
+    return values
+
+
+def chunked(rows, size):
+    chunk = []
+    for item in rows:
+        chunk.append(item)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def import_products(lines, file_format="csv", chunk_size=CHUNK_SIZE):
+    """Upsert products by SKU from CSV/JSONL ``lines``; returns an ``ImportReport``."""
+    report = ImportReport()
+    for chunk in chunked(read_rows(lines, file_format), chunk_size):
+        import_chunk(chunk, report)
+    if report.created or report.updated:
+        bump_catalog_version()
+    return report
+
+
+def import_chunk(chunk, report):
+    valid = {}
+    for line_number, row in chunk:
+        try:
+            values = clean_row(row)
+        except RowError as error:
+            report.add_error(line_number, error.args[0])
+            continue
+        if values["sku"] and values["sku"] in valid:
+            report.add_error(line_number, [f"sku: duplicate of line {valid[values['sku']][0]}"])
+            continue
+        valid[values["sku"] or f"new:{line_number}"] = (line_number, values)
+    if not valid:
+        return
+
+    existing = Product.objects.in_bulk(
+        [values["sku"] for _, values in valid.values() if values["sku"]], field_name="sku"
+    )
+    products, needs_slug, updated = [], [], 0
+    for _, values in valid.values():
+        current = existing.get(values["sku"])
+        product = Product(**values)
+        if current is None:
+            product.sku = values["sku"] or product_sku(values["category"])
+            needs_slug.append(product)
+        else:
+            updated += 1
+            product.slug = current.slug
+            if current.name != values["name"] and not has_base(current.slug, base_slug(values["name"])):
+                needs_slug.append(product)
+        products.append(product)
+
+    # Renamed rows still hold their old slugs while the upsert runs, so every
+    # existing slug counts as taken; none can be handed to another row.
+    for product, slug in zip(needs_slug, allocate_slugs(Product.objects.all(), [p.name for p in needs_slug])):
+        product.slug = slug
+
+    try:
+        with transaction.atomic():
+            Product.objects.bulk_create(
+                products,
+                batch_size=500,
+                update_conflicts=True,
+                unique_fields=["sku"],
+                update_fields=UPDATE_FIELDS,
+            )
+    except IntegrityError as error:
+        # Typically a concurrent write took one of the SKUs or slugs
+        for line_number, _ in valid.values():
+            report.add_error(line_number, [f"could not be saved: {error}"])
+        return
+    report.created += len(products) - updated
+    report.updated += updated
+
+
+class Echo:
+    """File-like object whose ``write`` hands the value back, for streaming ``csv.writer``."""
+
+    def write(self, value):
+        return value
+
+
+def export_products(queryset=None, file_format="csv", chunk_size=2000):
+    """Yield the catalog as CSV or JSONL text, one chunk of rows per item."""
+    queryset = Product.objects.order_by("pk") if queryset is None else queryset
+    rows = queryset.values_list(*FIELDS).iterator(chunk_size=chunk_size)
+
+    if file_format == "csv":
+        writer = csv.writer(Echo())
+        yield writer.writerow(FIELDS)
+        for chunk in chunked(rows, chunk_size):
+            yield "".join(writer.writerow(row) for row in chunk)
+        return
+
+    for chunk in chunked(rows, chunk_size):
+        yield "".join(
+            json.dumps(dict(zip(FIELDS, row)), default=str, ensure_ascii=False) + "\n" for row in chunk
+        )
@@ -0,0 +1,109 @@
+"""
+Read-through cache for catalog (product) payloads.
+
+Entries are keyed by endpoint, query params and a catalog version number,
+plus the site origin for payloads holding absolute URLs (pagination links).
+Anything that changes products or stock calls ``bump_catalog_version()``,
+which makes every older entry unreachable at once; stale entries simply
+expire instead of being deleted one by one.
+"""
+import hashlib
+import pickle
+import threading
+
+from django.conf import settings
+from django.core.cache import cache
+
+
+VERSION_KEY = "catalog:version"
+DEFAULT_TIMEOUT = 60 * 15
+
+
+class CacheStats:
+    """Hit/miss and byte counters for this worker process."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.hits = 0
+            self.misses = 0
+            self.bytes_served = 0
+            self.bytes_stored = 0
+
+    def record(self, hit, size):
+        with self._lock:
+            if hit:
+                self.hits += 1
+                self.bytes_served += size
+            else:
+                self.misses += 1
+                self.bytes_stored += size
+
+    def as_dict(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "bytes_served": self.bytes_served,
+                "bytes_stored": self.bytes_stored,
+            }
+
+
+stats = CacheStats()
+
+
+def get_catalog_version():
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        cache.add(VERSION_KEY, 1, timeout=None)
+        version = cache.get(VERSION_KEY) or 1
+    return version
+
+
+def bump_catalog_version():
+    """Invalidate every cached catalog payload."""
+    try:
+        return cache.incr(VERSION_KEY)
+    except ValueError:
+        # No version yet (fresh cache): anything cached was keyed on version 1
+        cache.add(VERSION_KEY, 2, timeout=None)
+        return cache.get(VERSION_KEY)
+
+
+def make_key(endpoint, params=None, version=None, vary=None):
+    items = sorted((key, tuple(values)) for key, values in (params or {}).items())
+    digest = hashlib.md5(repr((items, vary)).encode()).hexdigest()
+    if version is None:
+        version = get_catalog_version()
+    return f"catalog:v{version}:{endpoint}:{digest}"
+
+
+def get_or_build(endpoint, params, build, vary=None):
+    """
+    Return the cached payload for ``endpoint`` + ``params``, calling
+    ``build()`` and storing its result on a miss.
+
+    ``params`` is a QueryDict (or dict of lists) so that the page number and
+    filters become part of the key. ``vary`` is anything else the payload
+    depends on, such as the origin its links were built from.
+    """
+    lists = dict(params.lists()) if hasattr(params, "lists") else params
+    key = make_key(endpoint, lists, vary=vary)
+
+    entry = cache.get(key)
+    if entry is not None:
+        payload, size = entry
+        stats.record(hit=True, size=size)
+        return payload
+
+    payload = build()
+    size = len(pickle.dumps(payload, pickle.HIGHEST_PROTOCOL))
+    timeout = getattr(settings, "CATALOG_CACHE_TIMEOUT", DEFAULT_TIMEOUT)
+    cache.set(key, (payload, size), timeout=timeout)
+    stats.record(hit=False, size=size)
+    return payload
@@ -0,0 +1,209 @@
+"""
+Checkout: turning a cart into an order, and finalizing it once paid.
+
+``prepare_order`` runs at payment initialization. It reads the cart lines
+with their prices in one query and upserts all order lines with a single
+``bulk_create(update_conflicts=True)``. It also prunes lines that have left
+the cart since the last attempt.
+
+``finalize_order`` runs once a payment is confirmed. It claims the order with
+a conditional status UPDATE, so concurrent verifications of the same
+reference cannot both finalize it. In the same transaction it decrements
+stock for every line with a single conditional UPDATE and deletes the cart;
+if that UPDATE misses a line, the transaction is rolled back and retried.
+The statement count does not depend on the number of order lines.
+"""
+from dataclasses import dataclass, field
+from decimal import ROUND_HALF_UP, Decimal
+
+from django.db import transaction
+from django.db.models import Case, F, IntegerField, Sum, Value, When
+from django.utils import timezone
+
+from .cache import bump_catalog_version
+from .models import Cart, CartItem, Order, Orderitem, Product
+
+
+TAX_RATE = Decimal("0.08")
+SHIPPING_FEE = Decimal("9.99")
+FREE_SHIPPING_THRESHOLD = Decimal("50")
+CENT = Decimal("0.01")
+# Initialization names no currency, so Paystack charges in the account's own
+CURRENCY = "NGN"
+
+# Order statuses that mean the payment has been taken
+PAID_STATUSES = ("success", "shipped", "delivered")
+
+
+def order_total(cart_total):
+    """
+    Cart total plus tax, plus shipping for small carts, rounded to the cent
+    like ``Order.total_amount`` so the order, the charge and the stored row
+    all see the same amount.
+    """
+    total_amount = cart_total + cart_total * TAX_RATE
+    if cart_total <= FREE_SHIPPING_THRESHOLD:
+        total_amount += SHIPPING_FEE
+    return total_amount.quantize(CENT, ROUND_HALF_UP)
+
+
+def amount_in_kobo(total_amount):
+    """The amount charged to Paystack, in kobo, for an order total."""
+    return int((total_amount * 100).to_integral_value(ROUND_HALF_UP))
+
+
+def charge_mismatch(order, charge):
+    """
+    Why a successful Paystack charge does not pay for ``order``, or "" when
+    it does. The webhook and the verify fallback both check it before
+    finalizing.
+    """
+    expected = amount_in_kobo(order.total_amount)
+    paid = int(Decimal(str(charge.get("amount") or 0)))
+    if paid != expected:
+        return f"Amount mismatch: paid {paid}, order total {expected}"
+    if charge.get("currency") != CURRENCY:
+        return f"Currency mismatch: paid in {charge.get('currency')}, expected {CURRENCY}"
+    return ""
+
+
+def prepare_order(user, cart):
+    """
+    Create or refresh the pending order for ``cart`` so that its lines and
+    total match the cart. Runs a fixed number of queries for any cart size.
+    """
+    lines = list(
+        CartItem.objects.filter(cart=cart).values_list("product_id", "quantity", "product__price")
+    )
+    cart_total = sum((price * quantity for _, quantity, price in lines), Decimal("0"))
+
+    total_amount = order_total(cart_total)
+    with transaction.atomic():
+        order, created = Order.objects.get_or_create(
+            user=user, cart_code=cart.cart_code, defaults={"total_amount": total_amount}
+        )
+        if not created:
+            order.total_amount = total_amount
+            order.save(update_fields=["total_amount", "updated_at"])
+
+        if lines:
+            Orderitem.objects.bulk_create(
+                [Orderitem(order=order, product_id=product_id, quantity=quantity)
+                 for product_id, quantity, _ in lines],
+                update_conflicts=True,
+                unique_fields=["order", "product"],
+                update_fields=["quantity"],
+            )
+        Orderitem.objects.filter(order=order).exclude(
+            product_id__in=[product_id for product_id, _, _ in lines]
+        ).delete()
+
+    return order
+
+
+@dataclass
+class Shortfall:
+    product_id: int
+    name: str
+    requested: int
+    available: int
+
+    def as_dict(self):
+        return {
+            "product_id": self.product_id,
+            "name": self.name,
+            "requested": self.requested,
+            "available": self.available,
+        }
+
+
+@dataclass
+class FinalizeResult:
+    order: Order
+    finalized: bool
+    shortfalls: list = field(default_factory=list)
+
+
+class StockConflict(Exception):
+    """Another checkout took stock between reading it and decrementing it."""
+
+
+# Times finalize_order re-runs its transaction after a StockConflict
+FINALIZE_ATTEMPTS = 3
+
+
+def read_stock(product_ids):
+    """``(pk, name, quantity)`` of the products, locked where the backend supports it."""
+    products = Product.objects.select_for_update().filter(pk__in=product_ids).order_by("pk")
+    return list(products.values_list("pk", "name", "quantity"))
+
+
+def finalize_order(order):
+    """
+    Mark ``order`` as paid, delete its cart and take its lines out of stock.
+
+    Lines whose product no longer has enough stock are left untouched and
+    reported as shortfalls. Returns ``finalized=False`` when the order had
+    already been finalized by this or another process.
+
+    If a concurrent checkout takes stock after it was read, the whole
+    transaction is rolled back (the order stays unpaid) and run again from
+    fresh stock levels. ``StockConflict`` is raised when that keeps
+    happening.
+    """
+    for attempt in range(FINALIZE_ATTEMPTS):
+        try:
+            return finalize_once(order)
+        except StockConflict:
+            if attempt == FINALIZE_ATTEMPTS - 1:
+                raise
+
+
+def finalize_once(order):
+    now = timezone.now()
+    with transaction.atomic():
+        claimed = (
+            Order.objects.filter(pk=order.pk)
+            .exclude(status__in=PAID_STATUSES)
+            .update(status="success", updated_at=now)
+        )
+        if not claimed:
+            order.refresh_from_db(fields=["status", "updated_at"])
+            return FinalizeResult(order=order, finalized=False)
+
+        requested = dict(
+            Orderitem.objects.filter(order=order)
+            .values("product_id")
+            .annotate(total=Sum("quantity"))
+            .values_list("product_id", "total")
+        )
+
+        shortfalls, decrements = [], {}
+        for product_id, name, quantity in read_stock(requested):
+            if quantity >= requested[product_id]:
+                decrements[product_id] = requested[product_id]
+            else:
+                shortfalls.append(Shortfall(product_id, name, requested[product_id], quantity))
+
+        if decrements:
+            needed = Case(
+                *[When(pk=product_id, then=Value(count)) for product_id, count in decrements.items()],
+                output_field=IntegerField(),
+            )
+            # The quantity guard is kept in SQL as well, so stock can never go
+            # negative even on backends where select_for_update is a no-op.
+            taken = Product.objects.filter(pk__in=decrements, quantity__gte=needed).update(
+                quantity=F("quantity") - needed
+            )
+            if taken < len(decrements):
+                # Raising rolls back the claim, so the order is not left paid without its stock
+                raise StockConflict(f"Stock changed during checkout of order {order.pk}")
+
+        if order.cart_code:
+            Cart.objects.filter(cart_code=order.cart_code).delete()
+
+        transaction.on_commit(bump_catalog_version)
+
+    order.status = "success"
+    order.updated_at = now
+    return FinalizeResult(order=order, finalized=True, shortfalls=shortfalls)
@@ -0,0 +1,161 @@
+"""
+In-process fake of the Paystack transaction API.
+
+``FakePaystack`` keeps transactions in memory and answers
+``POST /transaction/initialize`` and ``GET /transaction/verify/<reference>``
+like Paystack would, with optional latency and failure injection. Use it as
+an ``httpx`` transport (no sockets) or serve it over HTTP with
+``FakePaystackServer`` / ``manage.py fake_paystack`` and point
+``PAYSTACK_BASE_URL`` at it to load-test checkout offline.
+"""
+import asyncio
+import json
+import random
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import httpx
+from django.utils import timezone
+
+
+class FakePaystack:
+    def __init__(self, latency=0.0, failure_rate=0.0, auto_settle=False, seed=None):
+        """
+        ``latency`` is seconds added to every call, ``failure_rate`` the share
+        of calls answered with a 503, and ``auto_settle`` makes unknown
+        references verify as paid (handy when orders are seeded directly).
+        """
+        self.latency = latency
+        self.failure_rate = failure_rate
+        self.auto_settle = auto_settle
+        self.random = random.Random(seed)
+        self.transactions = {}
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def handle(self, method, path, body=None):
+        """Return ``(status_code, payload)`` for one API call."""
+        with self._lock:
+            self.calls += 1
+            failing = self.random.random() < self.failure_rate
+        if failing:
+            return 503, {"status": False, "message": "Service temporarily unavailable"}
+
+        if method == "POST" and path == "/transaction/initialize":
+            return self.initialize(body or {})
+        if method == "GET" and path.startswith("/transaction/verify/"):
+            return self.verify(path.rsplit("/", 1)[-1])
+        return 404, {"status": False, "message": "Not found"}
+
+    def initialize(self, body):
+        if not body.get("email") or not body.get("amount"):
+            return 400, {"status": False, "message": "Email and amount are required"}
+        reference = body.get("reference") or uuid.uuid4().hex[:12]
+        with self._lock:
+            if reference in self.transactions:
+                return 400, {"status": False, "message": "Duplicate Transaction Reference"}
+            self.transactions[reference] = {
+                "reference": reference,
+                "amount": int(body["amount"]),
+                "currency": body.get("currency", "NGN"),
+                "email": body["email"],
+                "status": "success",
+            }
+        return 200, {
+            "status": True,
+            "message": "Authorization URL created",
+            "data": {
+                "authorization_url": f"https://checkout.paystack.test/{reference}",
+                "access_code": uuid.uuid4().hex[:12],
+                "reference": reference,
+            },
+        }
+
+    def verify(self, reference):
+        with self._lock:
+            transaction = self.transactions.get(reference)
+        if transaction is None:
+            if not self.auto_settle:
+                return 400, {"status": False, "message": "Transaction reference not found"}
+            transaction = {"reference": reference, "amount": 100000, "currency": "NGN", "status": "success"}
+        return 200, {
+            "status": True,
+            "message": "Verification successful",
+            "data": {**transaction, "paid_at": timezone.now().isoformat()},
+        }
+
+    def transport(self):
+        """An ``httpx`` transport for sync clients."""
+        def handler(request):
+            if self.latency:
+                time.sleep(self.latency)
+            return self.respond(request)
+        return httpx.MockTransport(handler)
+
+    def async_transport(self):
+        """An ``httpx`` transport for async clients; latency does not block the loop."""
+        async def handler(request):
+            if self.latency:
+                await asyncio.sleep(self.latency)
+            return self.respond(request)
+        return httpx.MockTransport(handler)
+
+    def respond(self, request):
+        body = json.loads(request.content) if request.content else None
+        status_code, payload = self.handle(request.method, request.url.path, body)
+        return httpx.Response(status_code, json=payload)
+
+
+class FakePaystackServer:
+    """Serves a ``FakePaystack`` over HTTP from a background thread."""
+
+    def __init__(self, fake=None, host="127.0.0.1", port=0):
+        self.fake = fake or FakePaystack()
+        fake = self.fake
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def reply(self):
+                length = int(self.headers.get("Content-Length") or 0)
+                body = json.loads(self.rfile.read(length)) if length else None
+                if fake.latency:
+                    time.sleep(fake.latency)
+                status_code, payload = fake.handle(self.command, self.path, body)
+                content = json.dumps(payload).encode()
+                self.send_response(status_code)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(content)))
+                self.end_headers()
+                self.wfile.write(content)
+
+            do_GET = do_POST = reply
+
+            def log_message(self, format, *args):
+                pass
+
+        self.httpd = ThreadingHTTPServer((host, port), Handler)
+        self.httpd.daemon_threads = True
+        self.thread = None
+
+    @property
+    def base_url(self):
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
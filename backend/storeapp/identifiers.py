@@ -0,0 +1,121 @@
+"""
+Short unique identifiers (product SKUs, order numbers) without lookups.
+
+Each process reserves a block of numbers from an ``IdentifierSequence`` row
+with one ``UPDATE ... SET next_value = next_value + n`` and hands them out
+from memory, so generating an identifier normally costs no query at all and
+two processes can never hold the same number. Numbers are then scrambled
+with a fixed bijection and written as 7 Crockford base32 characters. That
+keeps codes short and hard to enumerate, and they can never collide with the
+6 hex digit codes generated before.
+
+A block reserved inside a transaction that later rolls back goes back to the
+sequence, so the allocator drops it as well.
+"""
+import os
+import threading
+
+from django.apps import apps
+from django.db import transaction
+from django.db.models import F
+
+
+ALPHABET = "0123456789ABCDEFGHJKMNPQRSTVWXYZ"  # Crockford base32
+CODE_LENGTH = 7
+CODE_BITS = 5 * CODE_LENGTH
+CODE_MASK = (1 << CODE_BITS) - 1
+
+# Odd multipliers make both steps invertible modulo 2 ** CODE_BITS
+MULTIPLIER_1 = 0x5DEECE66D & CODE_MASK
+MULTIPLIER_2 = 0x2545F4915 & CODE_MASK
+XOR_SHIFT = 17
+
+
+def scramble(number):
+    """A bijection on ``CODE_BITS``-bit integers that spreads consecutive values out."""
+    number = (number * MULTIPLIER_1 + 0x9E3779B) & CODE_MASK
+    number ^= number >> XOR_SHIFT
+    return (number * MULTIPLIER_2) & CODE_MASK
+
+
+def encode(number):
+    """Fixed-width base32 code for ``number``; distinct numbers give distinct codes."""
+    high, low = divmod(number, 1 << CODE_BITS)
+    value, chars = scramble(low), []
+    for _ in range(CODE_LENGTH):
+        value, digit = divmod(value, 32)
+        chars.append(ALPHABET[digit])
+    code = "".join(reversed(chars))
+    while high:
+        high, digit = divmod(high, 32)
+        code = ALPHABET[digit] + code
+    return code
+
+
+class Block:
+    def __init__(self, start, end, pid, atomic):
+        self.next, self.end, self.pid = start, end, pid
+        self.confirmed = not atomic
+
+    def confirm(self):
+        self.confirmed = True
+
+
+class SequenceAllocator:
+    """Hands out numbers from blocks reserved on the named sequence."""
+
+    def __init__(self, name, block_size=100):
+        self.name = name
+        self.block_size = block_size
+        self.block = None
+        self._lock = threading.Lock()
+
+    def next(self):
+        with self._lock:
+            if not self.usable(self.block):
+                self.block = self.reserve()
+            number = self.block.next
+            self.block.next += 1
+            return number
+
+    def usable(self, block):
+        if block is None or block.next >= block.end:
+            return False
+        if block.pid != os.getpid():
+            # A forked child must not keep drawing from its parent's block
+            return False
+        if block.confirmed:
+            return True
+        # Reserved inside a transaction that has not committed yet: only
+        # usable while that transaction (and its on_commit hook) is alive.
+        connection = transaction.get_connection()
+        return any(callback == block.confirm for _, callback, _ in connection.run_on_commit)
+
+    def reserve(self):
+        sequence_model = apps.get_model("storeapp", "IdentifierSequence")
+        connection = transaction.get_connection()
+        with transaction.atomic():
+            rows = sequence_model.objects.filter(name=self.name)
+            if not rows.update(next_value=F("next_value") + self.block_size):
+                sequence_model.objects.bulk_create(
+                    [sequence_model(name=self.name, next_value=1)], ignore_conflicts=True
+                )
+                rows.update(next_value=F("next_value") + self.block_size)
+            end = rows.values_list("next_value", flat=True).get()
+        block = Block(end - self.block_size, end, os.getpid(), connection.in_atomic_block)
+        if not block.confirmed:
+            transaction.on_commit(block.confirm)
+        return block
+
+
+product_skus = SequenceAllocator("product_sku")
+order_skus = SequenceAllocator("order_sku")
+
+
+def product_sku(category=None):
+    prefix = category[:3].upper() if category else "GEN"
+    return f"{prefix}-{encode(product_skus.next())}"
+
+
+def order_sku():
+    return f"ORD-{encode(order_skus.next())}"
@@ -0,0 +1,146 @@
+"""
+Product image renditions.
+
+Originals are stored under their SHA-256 name by
+``ecommerce.media.ContentAddressedStorage`` (see ``uploads.store_image``);
+renditions are derived from them. After the product is saved, a background
+task reads the original once and writes resized copies
+(``RENDITION_WIDTHS``) as WebP, plus AVIF when this Pillow build supports
+it and it comes out smaller. EXIF orientation is applied first and all
+metadata (EXIF, GPS, ICC profiles, comments) is dropped. The result is
+recorded in ``Product.image_renditions``; serializers turn it into
+``srcset`` strings. Listing cards then fetch a 320px WebP/AVIF of a few KB
+instead of the multi-megabyte original.
+
+``manage.py generate_renditions`` backfills products uploaded before this
+existed.
+"""
+import logging
+from io import BytesIO
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db.models import Q
+from PIL import Image, ImageOps, features
+
+from ecommerce import tasks
+from .cache import bump_catalog_version
+from .models import Product
+
+
+logger = logging.getLogger(__name__)
+
+RENDITION_WIDTHS = (320, 640, 1024)
+RENDITION_DIR = "product_images/renditions"
+ENCODERS = {
+    "avif": {"quality": 55, "speed": 8},
+    "webp": {"quality": 78, "method": 4},
+}
+
+
+def available_formats():
+    """Preferred first; browsers take the first ``<source>`` they support."""
+    return [name for name in ("avif", "webp") if features.check(name)]
+
+
+def load_image(file):
+    with Image.open(file) as image:
+        image = ImageOps.exif_transpose(image)
+        image.load()
+    # Keep transparency for PNGs, everything else becomes plain RGB
+    has_alpha = image.mode in ("RGBA", "LA") or (image.mode == "P" and "transparency" in image.info)
+    return image.convert("RGBA" if has_alpha else "RGB")
+
+
+def encode(image, width, image_format):
+    """``image`` scaled to ``width`` (never up) and encoded without metadata."""
+    if image.width > width:
+        height = max(1, round(image.height * width / image.width))
+        image = image.resize((width, height), Image.Resampling.LANCZOS)
+    else:
+        image = image.copy()
+    image.info = {}
+    buffer = BytesIO()
+    image.save(buffer, format=image_format.upper(), **ENCODERS[image_format])
+    return image.width, buffer.getvalue()
+
+
+def render(source_name, product_id, storage=default_storage):
+    """Write every rendition of ``source_name``; returns the ``image_renditions`` value."""
+    with storage.open(source_name, "rb") as file:
+        image = load_image(file)
+
+    widths = sorted({min(width, image.width) for width in RENDITION_WIDTHS})
+    encoded = {
+        image_format: [encode(image, width, image_format) for width in widths]
+        for image_format in available_formats()
+    }
+    # AVIF is usually smaller, but not for every photo; keep it only when it
+    # actually beats WebP for this image
+    if "avif" in encoded and "webp" in encoded:
+        if sum(len(content) for _, content in encoded["avif"]) >= sum(len(content) for _, content in encoded["webp"]):
+            del encoded["avif"]
+
+    renditions = []
+    for image_format, outputs in encoded.items():
+        for width, content in outputs:
+            # Stored as <sha256>.<format> in the product's directory
+            name = storage.save(f"{RENDITION_DIR}/{product_id}/{width}.{image_format}", ContentFile(content))
+            renditions.append({"format": image_format, "width": width, "name": name, "bytes": len(content)})
+    return {"source": source_name, "renditions": renditions}
+
+
+def delete_renditions(value, storage=default_storage):
+    for rendition in (value or {}).get("renditions", []):
+        try:
+            storage.delete(rendition["name"])
+        except OSError:
+            logger.warning("Could not delete rendition %s", rendition["name"])
+
+
+def generate_renditions(product_id):
+    """
+    Build renditions for the product's current image. Does nothing when they
+    are already up to date, and never overwrites the result for a newer upload.
+    """
+    product = Product.objects.filter(pk=product_id).only("image", "image_renditions").first()
+    if product is None:
+        return None
+    source = product.image.name or None
+    current = product.image_renditions or {}
+    if current.get("source") == source or not (source or current):
+        return current or None
+
+    value = None
+    if source:
+        try:
+            value = render(source, product_id)
+        except (OSError, ValueError, Image.DecompressionBombError):
+            logger.exception("Could not render product image %s", source)
+            return None
+
+    # Conditional on the image, so a slow job cannot clobber a newer upload
+    same_image = Q(image=source) if source else Q(image="") | Q(image__isnull=True)
+    if not Product.objects.filter(same_image, pk=product_id).update(image_renditions=value):
+        delete_renditions(value)
+        return None
+
+    kept = {rendition["name"] for rendition in (value or {}).get("renditions", [])}
+    delete_renditions({"renditions": [r for r in current.get("renditions", []) if r["name"] not in kept]})
+    bump_catalog_version()
+    return value
+
+
+def schedule_renditions(product):
+    """Queue rendition generation once the product's transaction commits."""
+    tasks.submit_on_commit(generate_renditions, product.pk)
+
+
+def srcsets(value, url_for):
+    """``{"avif": "url 320w, url 640w", "webp": ...}`` from an ``image_renditions`` value."""
+    if not value or not value.get("renditions"):
+        return None
+    entries = {}
+    for rendition in value["renditions"]:
+        entries.setdefault(rendition["format"], []).append(f"{url_for(rendition['name'])} {rendition['width']}w")
+    return {image_format: ", ".join(items) for image_format, items in entries.items()}
@@ -0,0 +1,300 @@
+"""
+Gateway for text generation (Gemini).
+
+All LLM calls go through ``generate`` (sync views) or ``agenerate``
+(consumers and other async code):
+
+* The Gemini client is created on first use, not at import, so starting a
+  worker neither pays for it nor needs credentials.
+* Every call has a timeout (``LLM_TIMEOUT`` seconds by default) and failures
+  surface as ``LLMError``.
+* Concurrent calls for the same prompt share one upstream request.
+* ``astream`` yields a reply piece by piece as the model produces it, for
+  chat where the first words matter more than the whole answer.
+* With ``cache=True`` results are stored in ``GeneratedText`` under a key of
+  the model and the normalized prompt, so e.g. a product description is
+  generated once per product name, across restarts and workers.
+
+``LLM_BACKEND = "stub"`` swaps Gemini for ``StubBackend``, which answers
+locally with canned text (benchmarks, offline development).
+"""
+import asyncio
+import hashlib
+import re
+import threading
+import time
+import weakref
+from concurrent.futures import Future
+from dataclasses import dataclass
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+
+from .models import GeneratedText
+
+
+DEFAULT_MODEL = "gemini-2.5-flash"
+DEFAULT_TIMEOUT = 20.0
+
+
+class LLMError(Exception):
+    """The model could not be reached, timed out or returned nothing."""
+
+
+@dataclass
+class GatewayStats:
+    upstream_calls: int = 0
+    cache_hits: int = 0
+    coalesced: int = 0
+    errors: int = 0
+
+    def as_dict(self):
+        return dict(self.__dict__)
+
+
+stats = GatewayStats()
+_stats_lock = threading.Lock()
+
+
+def count(name):
+    with _stats_lock:
+        setattr(stats, name, getattr(stats, name) + 1)
+
+
+# ---- Backends ----
+
+class GeminiBackend:
+    def __init__(self, api_key=None):
+        self.api_key = api_key
+        self._client = None
+        self._lock = threading.Lock()
+
+    @property
+    def client(self):
+        if self._client is None:
+            with self._lock:
+                if self._client is None:
+                    from google import genai
+
+                    self._client = genai.Client(api_key=self.api_key or settings.GEMINI_API_KEY)
+        return self._client
+
+    def config(self, timeout):
+        from google.genai import types
+
+        return types.GenerateContentConfig(http_options=types.HttpOptions(timeout=int(timeout * 1000)))
+
+    def generate(self, model, prompt, timeout):
+        response = self.client.models.generate_content(model=model, contents=prompt, config=self.config(timeout))
+        return response.text
+
+    async def agenerate(self, model, prompt, timeout):
+        response = await self.client.aio.models.generate_content(
+            model=model, contents=prompt, config=self.config(timeout)
+        )
+        return response.text
+
+    async def astream(self, model, prompt, timeout):
+        stream = await self.client.aio.models.generate_content_stream(
+            model=model, contents=prompt, config=self.config(timeout)
+        )
+        async for chunk in stream:
+            yield chunk.text or ""
+
+
+class StubBackend:
+    """Answers instantly (or after ``latency`` seconds) with canned text."""
+
+    TEXT = "A sleek, durable product that fits right into your day."
+
+    def __init__(self, text=TEXT, latency=0.0):
+        self.text = text
+        self.latency = latency
+        self.calls = 0
+
+    def generate(self, model, prompt, timeout):
+        self.calls += 1
+        if self.latency:
+            time.sleep(self.latency)
+        return self.text
+
+    async def agenerate(self, model, prompt, timeout):
+        self.calls += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        return self.text
+
+    async def astream(self, model, prompt, timeout):
+        """The canned text word by word, ``latency`` spread over the words."""
+        self.calls += 1
+        words = self.text.split(" ")
+        for index, word in enumerate(words):
+            if self.latency:
+                await asyncio.sleep(self.latency / len(words))
+            yield word if index == len(words) - 1 else f"{word} "
+
+
+BACKENDS = {"gemini": GeminiBackend, "stub": StubBackend}
+_backends = {}
+_backends_lock = threading.Lock()
+
+
+def get_backend():
+    """The shared instance of the ``LLM_BACKEND`` backend."""
+    name = getattr(settings, "LLM_BACKEND", "gemini")
+    with _backends_lock:
+        if name not in _backends:
+            _backends[name] = BACKENDS[name]()
+        return _backends[name]
+
+
+# ---- Result cache ----
+
+def normalize(prompt):
+    return re.sub(r"\s+", " ", prompt).strip().casefold()
+
+
+def cache_key(model, prompt):
+    return hashlib.sha256(f"{model}\n{normalize(prompt)}".encode()).hexdigest()
+
+
+def cached_text(key):
+    return GeneratedText.objects.filter(key=key).values_list("text", flat=True).first()
+
+
+def store_text(key, model, prompt, text):
+    GeneratedText.objects.bulk_create(
+        [GeneratedText(key=key, model=model, prompt=prompt, text=text)], ignore_conflicts=True
+    )
+
+
+def clean(text):
+    text = (text or "").strip()
+    if not text:
+        raise LLMError("The model returned an empty response")
+    return text
+
+
+# ---- Sync path ----
+
+_in_flight = {}
+_in_flight_lock = threading.Lock()
+
+
+def generate(prompt, model=DEFAULT_MODEL, timeout=None, cache=False):
+    """Generate text for ``prompt``; raises ``LLMError`` on failure or timeout."""
+    timeout = timeout or getattr(settings, "LLM_TIMEOUT", DEFAULT_TIMEOUT)
+    key = cache_key(model, prompt)
+    if cache:
+        text = cached_text(key)
+        if text is not None:
+            count("cache_hits")
+            return text
+
+    with _in_flight_lock:
+        future = _in_flight.get(key)
+        leader = future is None
+        if leader:
+            future = _in_flight[key] = Future()
+    if not leader:
+        count("coalesced")
+        try:
+            return future.result(timeout=timeout)
+        except TimeoutError:
+            raise LLMError("Timed out waiting for the model")
+
+    try:
+        count("upstream_calls")
+        text = clean(get_backend().generate(model, prompt, timeout))
+        if cache:
+            store_text(key, model, prompt, text)
+    except Exception as error:
+        count("errors")
+        failure = error if isinstance(error, LLMError) else LLMError(str(error))
+        # Callers waiting on this call get the same error
+        future.set_exception(failure)
+        if failure is error:
+            raise
+        raise failure from error
+    else:
+        future.set_result(text)
+        return text
+    finally:
+        with _in_flight_lock:
+            _in_flight.pop(key, None)
+
+
+# ---- Async path ----
+
+# Tasks are bound to their event loop, so each loop has its own table
+_async_in_flight = weakref.WeakKeyDictionary()
+
+
+async def _call(key, model, prompt, timeout, cache):
+    count("upstream_calls")
+    try:
+        text = clean(await asyncio.wait_for(get_backend().agenerate(model, prompt, timeout), timeout))
+    except LLMError:
+        count("errors")
+        raise
+    except asyncio.TimeoutError as error:
+        count("errors")
+        raise LLMError("Timed out waiting for the model") from error
+    except Exception as error:
+        count("errors")
+        raise LLMError(str(error)) from error
+    if cache:
+        await sync_to_async(store_text)(key, model, prompt, text)
+    return text
+
+
+async def agenerate(prompt, model=DEFAULT_MODEL, timeout=None, cache=False):
+    """Async ``generate``; cancelling one caller does not cancel a shared call."""
+    timeout = timeout or getattr(settings, "LLM_TIMEOUT", DEFAULT_TIMEOUT)
+    key = cache_key(model, prompt)
+    if cache:
+        text = await sync_to_async(cached_text)(key)
+        if text is not None:
+            count("cache_hits")
+            return text
+
+    loop = asyncio.get_running_loop()
+    calls = _async_in_flight.setdefault(loop, {})
+    task = calls.get(key)
+    if task is None:
+        task = calls[key] = loop.create_task(_call(key, model, prompt, timeout, cache))
+        task.add_done_callback(lambda _: calls.pop(key, None))
+    else:
+        count("coalesced")
+    return await asyncio.shield(task)
+
+
+async def astream(prompt, model=DEFAULT_MODEL, timeout=None):
+    """
+    Yield the reply in pieces as they arrive. Not cached or coalesced;
+    ``timeout`` applies to the first piece and to every gap after it.
+    """
+    timeout = timeout or getattr(settings, "LLM_TIMEOUT", DEFAULT_TIMEOUT)
+    count("upstream_calls")
+    stream = get_backend().astream(model, prompt, timeout)
+    received = False
+    try:
+        while True:
+            try:
+                piece = await asyncio.wait_for(anext(stream), timeout)
+            except StopAsyncIteration:
+                break
+            except asyncio.TimeoutError as error:
+                raise LLMError("Timed out waiting for the model") from error
+            except Exception as error:
+                raise LLMError(str(error)) from error
+            if piece:
+                received = True
+                yield piece
+        if not received:
+            raise LLMError("The model returned an empty response")
+    except LLMError:
+        count("errors")
+        raise
+    finally:
+        await stream.aclose()
@@ -0,0 +1,70 @@
+import time
+import tracemalloc
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test.utils import override_settings, setup_test_environment, teardown_test_environment
+
+from storeapp import bulk
+from storeapp.models import Product
+
+
+LOCMEM_CACHES = {"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}}
+
+
+def synthetic_csv(rows, price="19.99"):
+    yield ",".join(bulk.FIELDS) + "\n"
+    categories = sorted(bulk.CATEGORIES)
+    for i in range(rows):
+        # Every tenth name repeats so slug suffixes get exercised too
+        name = f"Bulk Product {i // 10 if i % 10 == 0 else i}"
+        yield f"BULK-{i:07d},{name},{categories[i % len(categories)]},Imported row {i},{price},{i % 50},5,{i % 7 == 0}\n"
+
+
+class Command(BaseCommand):
+    help = (
+        "Time a bulk import (create, then update) and a streaming export of "
+        "synthetic products in a throwaway database."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rows", type=int, default=100_000)
+        parser.add_argument("--chunk-size", type=int, default=bulk.CHUNK_SIZE)
+        parser.add_argument("--memory", action="store_true", help="Also report peak Python heap (slower).")
+
+    def handle(self, *args, **options):
+        setup_test_environment()
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            # DEBUG off: the query log would otherwise grow with every chunk
+            with override_settings(CACHES=LOCMEM_CACHES, DEBUG=False):
+                self.run(options["rows"], options["chunk_size"], options["memory"])
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+
+    def run(self, rows, chunk_size, memory):
+        def create():
+            return bulk.import_products(synthetic_csv(rows), "csv", chunk_size=chunk_size)
+
+        def update():
+            return bulk.import_products(synthetic_csv(rows, price="24.99"), "csv", chunk_size=chunk_size)
+
+        def export():
+            return sum(len(chunk) for chunk in bulk.export_products(file_format="csv"))
+
+        for label, step in (("import (create)", create), ("import (update)", update), ("export", export)):
+            if memory:
+                tracemalloc.start()
+            started = time.perf_counter()
+            result = step()
+            elapsed = time.perf_counter() - started
+            line = f"{label:<16} {rows:>8} rows  {elapsed:8.2f}s  {rows / elapsed:10.0f} rows/s"
+            if memory:
+                line += f"  peak {tracemalloc.get_traced_memory()[1] / 1024 / 1024:7.1f} MiB"
+                tracemalloc.stop()
+            if isinstance(result, bulk.ImportReport) and result.error_count:
+                line += f"  ({result.error_count} errors)"
+            self.stdout.write(line)
+
+        self.stdout.write(self.style.SUCCESS(f"{Product.objects.count()} products in the catalog."))
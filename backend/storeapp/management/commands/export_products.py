@@ -0,0 +1,24 @@
+import sys
+
+from django.core.management.base import BaseCommand
+
+from storeapp import bulk
+
+
+class Command(BaseCommand):
+    help = "Write every product as CSV or JSON Lines."
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", nargs="?", default="-", help="Output file, or - for stdout.")
+        parser.add_argument("--format", choices=bulk.FORMATS, help="Defaults to the file extension, else csv.")
+
+    def handle(self, *args, **options):
+        path = options["path"]
+        file_format = options["format"] or bulk.format_for(path)
+        stream = sys.stdout if path == "-" else open(path, "w", encoding="utf-8", newline="")
+        try:
+            for chunk in bulk.export_products(file_format=file_format):
+                stream.write(chunk)
+        finally:
+            if stream is not sys.stdout:
+                stream.close()
@@ -0,0 +1,29 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from storeapp.fake_paystack import FakePaystack, FakePaystackServer
+
+
+class Command(BaseCommand):
+    help = "Serve a local fake of the Paystack transaction API (set PAYSTACK_BASE_URL to its address)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--port", type=int, default=8765)
+        parser.add_argument("--latency-ms", type=float, default=0.0, help="Delay added to every call.")
+        parser.add_argument("--failure-rate", type=float, default=0.0, help="Share of calls answered with a 503.")
+        parser.add_argument("--auto-settle", action="store_true", help="Verify unknown references as paid.")
+
+    def handle(self, *args, **options):
+        fake = FakePaystack(
+            latency=options["latency_ms"] / 1000,
+            failure_rate=options["failure_rate"],
+            auto_settle=options["auto_settle"],
+        )
+        with FakePaystackServer(fake, port=options["port"]) as server:
+            self.stdout.write(self.style.SUCCESS(f"Fake Paystack listening on {server.base_url}"))
+            try:
+                while True:
+                    time.sleep(3600)
+            except KeyboardInterrupt:
+                self.stdout.write(f"Stopped after {fake.calls} calls.")
@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+
+from storeapp.images import generate_renditions
+from storeapp.models import Product
+
+
+class Command(BaseCommand):
+    help = "Create the resized WebP/AVIF copies of product images that are missing or out of date."
+
+    def add_arguments(self, parser):
+        parser.add_argument("product_ids", nargs="*", type=int, help="Only these products.")
+
+    def handle(self, *args, **options):
+        products = Product.objects.exclude(image="").exclude(image__isnull=True).order_by("pk")
+        if options["product_ids"]:
+            products = products.filter(pk__in=options["product_ids"])
+
+        done = failed = 0
+        for product_id in products.values_list("pk", flat=True).iterator():
+            if generate_renditions(product_id) is None:
+                failed += 1
+            else:
+                done += 1
+        self.stdout.write(self.style.SUCCESS(f"{done} products have renditions, {failed} failed."))
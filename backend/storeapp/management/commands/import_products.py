@@ -0,0 +1,32 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from storeapp import bulk
+
+
+class Command(BaseCommand):
+    help = "Create or update products from a CSV or JSON Lines file, matching on SKU."
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="File to import, or - for stdin.")
+        parser.add_argument("--format", choices=bulk.FORMATS, help="Defaults to the file extension, else csv.")
+        parser.add_argument("--chunk-size", type=int, default=bulk.CHUNK_SIZE)
+
+    def handle(self, *args, **options):
+        path = options["path"]
+        file_format = options["format"] or bulk.format_for(path)
+        try:
+            stream = sys.stdin if path == "-" else open(path, encoding="utf-8-sig", newline="")
+        except OSError as e:
+            raise CommandError(str(e))
+
+        with stream:
+            report = bulk.import_products(stream, file_format, chunk_size=options["chunk_size"])
+
+        for error in report.errors:
+            self.stderr.write(f"line {error['line']}: {'; '.join(error['errors'])}")
+        style = self.style.SUCCESS if not report.error_count else self.style.WARNING
+        self.stdout.write(style(
+            f"{report.created} created, {report.updated} updated, {report.error_count} rows rejected."
+        ))
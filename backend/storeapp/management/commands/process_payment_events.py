@@ -0,0 +1,24 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from storeapp.webhooks import process_pending
+
+
+class Command(BaseCommand):
+    help = "Apply queued Paystack webhook events (run with --loop as a worker)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--limit", type=int, default=100, help="Events to handle per batch.")
+        parser.add_argument("--loop", action="store_true", help="Keep polling for new events.")
+        parser.add_argument("--interval", type=float, default=2.0, help="Seconds between polls with --loop.")
+
+    def handle(self, *args, **options):
+        while True:
+            handled = process_pending(limit=options["limit"])
+            if handled:
+                self.stdout.write(f"Processed {handled} payment events.")
+            if not options["loop"]:
+                break
+            if handled < options["limit"]:
+                time.sleep(options["interval"])
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from storeapp.search import get_backend
+
+
+class Command(BaseCommand):
+    help = "(Re)create the product search index and re-index every product."
+
+    def handle(self, *args, **options):
+        backend = get_backend()
+        with connection.schema_editor() as schema_editor:
+            backend.install(schema_editor)
+        backend.rebuild()
+        self.stdout.write(self.style.SUCCESS(
+            f"Product search index rebuilt with {backend.__class__.__name__}."
+        ))
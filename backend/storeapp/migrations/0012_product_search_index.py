@@ -0,0 +1,14 @@
+from django.db import migrations
+
+from storeapp.search import install_search_index, uninstall_search_index
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('storeapp', '0011_alter_cart_cart_code_alter_order_cart_code'),
+    ]
+
+    operations = [
+        migrations.RunPython(install_search_index, uninstall_search_index),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 5.2.6 on 2026-10-16 22:55
+
+from django.db import migrations, models
+from django.db.models import Count, Min, Sum
+
+
+def merge_duplicate_orderitems(apps, schema_editor):
+    # Fold duplicate lines of an (order, product) pair into the oldest one
+    Orderitem = apps.get_model('storeapp', 'Orderitem')
+    duplicates = (
+        Orderitem.objects.values('order', 'product')
+        .annotate(lines=Count('id'), keep_id=Min('id'), total=Sum('quantity'))
+        .filter(lines__gt=1)
+    )
+    for group in duplicates:
+        Orderitem.objects.filter(id=group['keep_id']).update(quantity=group['total'])
+        Orderitem.objects.filter(order=group['order'], product=group['product']).exclude(
+            id=group['keep_id']
+        ).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('storeapp', '0012_product_search_index'),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_duplicate_orderitems, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='orderitem',
+            constraint=models.UniqueConstraint(fields=('order', 'product'), name='unique_orderitem_order_product'),
+        ),
+    ]
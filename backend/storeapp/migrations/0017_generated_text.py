@@ -0,0 +1,23 @@
+# Generated by Django 5.2.6 on 2026-10-16 23:35
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('storeapp', '0016_product_image_renditions'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='GeneratedText',
+            fields=[
+                ('key', models.CharField(max_length=64, primary_key=True, serialize=False)),
+                ('model', models.CharField(max_length=100)),
+                ('prompt', models.TextField()),
+                ('text', models.TextField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+    ]
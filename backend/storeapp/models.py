@@ -1,7 +1,9 @@
-import uuid
 from django.db import models
 from django.conf import settings
-from django.utils.text import slugify
+from django.db.models import DecimalField, F, Prefetch, Q, Sum
+
+from .identifiers import order_sku
+from .slugs import allocate_slug
 
 # Create your models here.
 class Product(models.Model):
@@ -26,30 +28,70 @@ class Product(models.Model):
     featured = models.BooleanField(default=False)
     minimumStock = models.PositiveIntegerField(default=10)
     image = models.ImageField(upload_to='product_images/', blank=True, null=True)
+    # Resized WebP/AVIF copies of ``image``, filled in by storeapp.images
+    image_renditions = models.JSONField(blank=True, null=True, editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
 
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember the stored name so save() only re-slugs on a rename
+        if "name" in field_names:
+            instance._saved_name = values[field_names.index("name")]
+        return instance
+
     def save(self, *args, **kwargs):
-        # Always regenerate slug when name changes
-        base_slug = slugify(self.name)
-        slug = base_slug
-        counter = 1
-        while Product.objects.filter(slug=slug).exclude(pk=self.pk).exists():
-            slug = f"{base_slug}-{counter}"
-            counter += 1
-        self.slug = slug
+        # Regenerate the slug only when the name changes
+        if not self.slug or self.name != getattr(self, "_saved_name", None):
+            self.slug = allocate_slug(Product.objects.all(), self.name, exclude_pk=self.pk)
+            update_fields = kwargs.get("update_fields")
+            if update_fields is not None and "slug" not in update_fields:
+                kwargs["update_fields"] = [*update_fields, "slug"]
         super().save(*args, **kwargs)
+        self._saved_name = self.name
 
     def __str__(self):
         return self.name
+
+    class Meta:
+        indexes = [
+            # The storefront listing and its cursor pages, newest first
+            models.Index(fields=["-created_at", "-id"]),
+            # Category pages, newest first
+            models.Index(fields=["category", "-id"]),
+            # Low-stock report on the admin dashboard
+            models.Index(fields=["quantity"]),
+            # Only a few products are featured, so index just those
+            models.Index(fields=["featured"], condition=Q(featured=True), name="product_featured_idx"),
+        ]
     
 
+class CartQuerySet(models.QuerySet):
+    def with_items(self):
+        """
+        Load cart items with their products in one extra query and compute
+        ``cart_total`` in the database, so serializing a cart costs a fixed
+        number of queries however many items it holds.
+        """
+        return self.prefetch_related(
+            Prefetch("cartitems", queryset=CartItem.objects.select_related("product").order_by("id"))
+        ).annotate(
+            cart_total=Sum(
+                F("cartitems__quantity") * F("cartitems__product__price"),
+                output_field=DecimalField(max_digits=12, decimal_places=2),
+            )
+        )
+
+
 class Cart(models.Model):
     cart_code = models.CharField(max_length=100, unique=True)
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, blank=True, null=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = CartQuerySet.as_manager()
+
     def __str__(self):
         return self.cart_code
 
@@ -64,6 +106,14 @@ class CartItem(models.Model):
     
 
 
+class OrderQuerySet(models.QuerySet):
+    def with_items(self):
+        """Prefetch order items and their products for ``OrderSerializer``."""
+        return self.prefetch_related(
+            Prefetch("orderitems", queryset=Orderitem.objects.select_related("product").order_by("id"))
+        )
+
+
 class Order(models.Model):
     STATUS = (
         ("success", "Success"),
@@ -81,13 +131,10 @@ class Order(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = OrderQuerySet.as_manager()
+
     def generate_unique_sku(self):
-        prefix = "ORD"
-        while True:
-            uid = uuid.uuid4().hex[:6].upper()
-            new_ref = f"{prefix}-{uid}"
-            if not Order.objects.filter(sku=new_ref).exists():
-                return new_ref
+        return order_sku()
 
     def save(self, *args, **kwargs):
         if not self.sku:
@@ -97,6 +144,15 @@ class Order(models.Model):
     def __str__(self):
         return f"An order with reference {self.reference}"
 
+    class Meta:
+        indexes = [
+            # The admin list and its cursor pages, newest first
+            models.Index(fields=["-created_at", "-id"]),
+            # A user's orders and the admin list by status, both newest first
+            models.Index(fields=["user", "-created_at", "-id"]),
+            models.Index(fields=["status", "created_at"]),
+        ]
+
 
 class Orderitem(models.Model):
     order = models.ForeignKey(Order, on_delete=models.CASCADE, related_name="orderitems")
@@ -106,6 +162,12 @@ class Orderitem(models.Model):
     def __str__(self):
         return f"{self.quantity} x {self.product.name} in order {self.order.reference}"
 
+    class Meta:
+        constraints = [
+            # Lets checkout upsert lines with bulk_create(update_conflicts=True)
+            models.UniqueConstraint(fields=["order", "product"], name="unique_orderitem_order_product"),
+        ]
+
 
 
 class ShippingInfo(models.Model):
@@ -123,3 +185,59 @@ class ShippingInfo(models.Model):
 
 
 
+
+
+class IdentifierSequence(models.Model):
+    """
+    Counter behind SKUs and order numbers. Processes reserve blocks of
+    values from it (see ``storeapp.identifiers``) rather than single values.
+    """
+    name = models.CharField(max_length=50, primary_key=True)
+    next_value = models.BigIntegerField(default=1)
+
+    def __str__(self):
+        return f"{self.name} at {self.next_value}"
+
+
+class PaymentEvent(models.Model):
+    """
+    A Paystack webhook event. The unique ``event_id`` drops redelivered
+    events, and the rows double as the queue the payment worker drains.
+    """
+    STATUS = (
+        ("pending", "Pending"),
+        ("processing", "Processing"),
+        ("processed", "Processed"),
+        ("ignored", "Ignored"),
+        ("failed", "Failed"),
+    )
+    event_id = models.CharField(max_length=100, unique=True)
+    event = models.CharField(max_length=50)
+    reference = models.CharField(max_length=64, blank=True, db_index=True)
+    payload = models.JSONField()
+    status = models.CharField(max_length=20, choices=STATUS, default="pending")
+    attempts = models.PositiveIntegerField(default=0)
+    error = models.TextField(blank=True)
+    received_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [models.Index(fields=["status", "received_at"])]
+
+    def __str__(self):
+        return f"{self.event} for {self.reference or self.event_id}"
+
+
+class GeneratedText(models.Model):
+    """
+    Cached LLM output, keyed by a hash of the model and normalized prompt
+    (see ``storeapp.llm``). Deleting a row makes the next request regenerate it.
+    """
+    key = models.CharField(max_length=64, primary_key=True)
+    model = models.CharField(max_length=100)
+    prompt = models.TextField()
+    text = models.TextField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.model}: {self.prompt[:50]}"
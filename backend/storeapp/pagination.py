@@ -0,0 +1,156 @@
+"""
+Pagination for the product and order listings.
+
+Page-number pagination stays the default because the frontend relies on
+``count`` and ``?page=``. Clients that opt in with ``?paginate=cursor`` get
+keyset pagination instead: pages are found with a ``WHERE (created_at, id) <
+(...)`` seek on the listing's ordering, so there is no COUNT(*) and no OFFSET
+scan no matter how deep the page is. The listings' ``(created_at, id)``
+indexes serve both the seek and the ordering.
+
+Searches are ordered by relevance rather than by the listing's key, so
+they always use page numbers, even when cursors were asked for.
+"""
+import base64
+import json
+
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+MODE_QUERY_PARAM = "paginate"
+CURSOR_QUERY_PARAM = "cursor"
+
+
+class KeysetPagination(BasePagination):
+    """
+    Cursor pagination over a unique, fully ordered key such as
+    ``("-created_at", "-id")``. Cursors are opaque base64 tokens holding the
+    key of the boundary row and the paging direction.
+    """
+    cursor_query_param = CURSOR_QUERY_PARAM
+    invalid_cursor_message = "Invalid cursor"
+
+    def __init__(self, ordering, page_size=10):
+        self.ordering = tuple(ordering)
+        self.fields = [field.lstrip("-") for field in self.ordering]
+        self.page_size = page_size
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        cursor = self.decode_cursor(request, queryset.model)
+
+        reverse = cursor is not None and cursor["reverse"]
+        ordering = self.ordering
+        if reverse:
+            ordering = tuple(self.flip(field) for field in ordering)
+        queryset = queryset.order_by(*ordering)
+        if cursor is not None:
+            queryset = queryset.filter(self.seek(cursor["key"], reverse))
+
+        rows = list(queryset[:self.page_size + 1])
+        has_more = len(rows) > self.page_size
+        rows = rows[:self.page_size]
+        if reverse:
+            rows.reverse()
+
+        if reverse:
+            self.has_next, self.has_previous = True, has_more
+        else:
+            self.has_next, self.has_previous = has_more, cursor is not None
+        self.first_key = self.key_for(rows[0]) if rows else None
+        self.last_key = self.key_for(rows[-1]) if rows else None
+        return rows
+
+    def get_paginated_response(self, data):
+        return Response({
+            "next": self.get_next_link(),
+            "previous": self.get_previous_link(),
+            "results": data,
+        })
+
+    def get_next_link(self):
+        if not self.has_next or self.last_key is None:
+            return None
+        return self.link(self.last_key, reverse=False)
+
+    def get_previous_link(self):
+        if not self.has_previous or self.first_key is None:
+            return None
+        return self.link(self.first_key, reverse=True)
+
+    @staticmethod
+    def flip(field):
+        return field[1:] if field.startswith("-") else f"-{field}"
+
+    def seek(self, key, reverse):
+        """Rows strictly after ``key`` in the (possibly reversed) ordering."""
+        condition = Q()
+        for index, field in enumerate(self.ordering):
+            descending = field.startswith("-") != reverse
+            lookup = "lt" if descending else "gt"
+            step = Q(**{f"{self.fields[index]}__{lookup}": key[index]})
+            for previous in range(index):
+                step &= Q(**{self.fields[previous]: key[previous]})
+            condition |= step
+        # The OR alone makes the database walk the index from the first row;
+        # a plain range on the leading column lets it seek to the boundary.
+        descending = self.ordering[0].startswith("-") != reverse
+        bound = Q(**{f"{self.fields[0]}__{'lte' if descending else 'gte'}": key[0]})
+        return bound & condition
+
+    def key_for(self, row):
+        values = []
+        for field in self.fields:
+            value = getattr(row, field)
+            values.append(value.isoformat() if hasattr(value, "isoformat") else value)
+        return values
+
+    def link(self, key, reverse):
+        payload = json.dumps({"k": key, "r": int(reverse)}, separators=(",", ":"))
+        token = base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+        url = remove_query_param(self.base_url, "page")
+        url = replace_query_param(url, MODE_QUERY_PARAM, "cursor")
+        return replace_query_param(url, self.cursor_query_param, token)
+
+    def decode_cursor(self, request, model):
+        token = request.query_params.get(self.cursor_query_param)
+        if not token:
+            return None
+        try:
+            padded = token + "=" * (-len(token) % 4)
+            payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+            raw_key = payload["k"]
+            if len(raw_key) != len(self.fields):
+                raise ValueError
+            key = [
+                model._meta.get_field(field).to_python(value)
+                for field, value in zip(self.fields, raw_key)
+            ]
+            return {"key": key, "reverse": bool(payload.get("r"))}
+        except Exception:
+            raise NotFound(self.invalid_cursor_message)
+
+
+def wants_cursor(request):
+    return (
+        request.query_params.get(MODE_QUERY_PARAM) == "cursor"
+        or CURSOR_QUERY_PARAM in request.query_params
+    )
+
+
+def get_paginator(request, page_size, ordering, ranked=False):
+    """
+    Keyset paginator over ``ordering`` when the client asked for cursors,
+    the page-number paginator the frontend uses otherwise. ``ranked``
+    (search results) keeps page numbers so the relevance order survives.
+    """
+    if wants_cursor(request) and not ranked:
+        return KeysetPagination(ordering, page_size=page_size)
+    paginator = PageNumberPagination()
+    paginator.page_size = page_size
+    return paginator
@@ -0,0 +1,298 @@
+"""
+Paystack API client.
+
+Every worker process shares one pooled ``httpx.Client`` (and ASGI code one
+``httpx.AsyncClient`` per event loop). Calls have strict connect/read
+timeouts and bounded retries with full jitter, and they go through a
+circuit breaker so a slow or failing Paystack cannot pin worker threads.
+Per-call latency is recorded in ``metrics``.
+
+Point ``PAYSTACK_BASE_URL`` at ``storeapp.fake_paystack`` to exercise the
+payment flows offline.
+"""
+import asyncio
+import random
+import threading
+import time
+import weakref
+from collections import deque
+from dataclasses import dataclass
+
+import httpx
+from django.conf import settings
+
+
+DEFAULT_BASE_URL = "https://api.paystack.co"
+
+# Answers worth retrying: rate limiting and transient upstream failures
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+# Errors raised before the request reached Paystack, so even a POST can be
+# retried without risking a duplicate transaction
+UNSENT_ERRORS = (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout)
+
+
+class PaystackError(Exception):
+    """Paystack could not be reached or kept failing after retries."""
+
+
+class CircuitOpenError(PaystackError):
+    """Calls are short-circuited while Paystack is considered down."""
+
+
+@dataclass
+class PaystackResponse:
+    status_code: int
+    data: dict
+
+    @property
+    def ok(self):
+        return self.status_code == 200 and bool(self.data.get("status"))
+
+
+class CircuitBreaker:
+    """
+    Opens after ``failure_threshold`` consecutive failed calls, rejects calls
+    for ``reset_timeout`` seconds, then lets a single probe through.
+    """
+
+    def __init__(self, failure_threshold=5, reset_timeout=30.0, clock=time.monotonic):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.clock = clock
+        self._lock = threading.Lock()
+        self.state = "closed"
+        self.failures = 0
+        self.opened_at = None
+
+    def allow(self):
+        with self._lock:
+            if self.state == "closed":
+                return True
+            if self.state == "open" and self.clock() - self.opened_at >= self.reset_timeout:
+                self.state = "half_open"
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.state = "closed"
+            self.failures = 0
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == "half_open" or self.failures >= self.failure_threshold:
+                self.state = "open"
+                self.opened_at = self.clock()
+
+
+class CallMetrics:
+    """Call, error and retry counts plus a latency window per operation."""
+
+    def __init__(self, window=1000):
+        self.window = window
+        self._lock = threading.Lock()
+        self._operations = {}
+
+    def record(self, operation, elapsed_ms, ok, retries):
+        with self._lock:
+            entry = self._operations.setdefault(operation, {
+                "calls": 0, "errors": 0, "retries": 0, "latencies": deque(maxlen=self.window),
+            })
+            entry["calls"] += 1
+            entry["retries"] += retries
+            entry["errors"] += 0 if ok else 1
+            entry["latencies"].append(elapsed_ms)
+
+    @staticmethod
+    def percentile(ordered, fraction):
+        if not ordered:
+            return None
+        return round(ordered[min(len(ordered) - 1, int(fraction * len(ordered)))], 2)
+
+    def as_dict(self):
+        with self._lock:
+            result = {}
+            for operation, entry in self._operations.items():
+                latencies = sorted(entry["latencies"])
+                result[operation] = {
+                    "calls": entry["calls"],
+                    "errors": entry["errors"],
+                    "retries": entry["retries"],
+                    "p50_ms": self.percentile(latencies, 0.50),
+                    "p95_ms": self.percentile(latencies, 0.95),
+                }
+            return result
+
+    def reset(self):
+        with self._lock:
+            self._operations.clear()
+
+
+breaker = CircuitBreaker(
+    failure_threshold=getattr(settings, "PAYSTACK_BREAKER_THRESHOLD", 5),
+    reset_timeout=getattr(settings, "PAYSTACK_BREAKER_RESET", 30.0),
+)
+metrics = CallMetrics()
+
+
+class BasePaystackClient:
+    def __init__(self, secret_key=None, base_url=None, timeout=None, max_retries=None,
+                 backoff_base=0.2, backoff_cap=2.0, breaker=breaker, metrics=metrics):
+        self.secret_key = secret_key if secret_key is not None else settings.PAYSTACK_SECRET_KEY
+        self.base_url = base_url or getattr(settings, "PAYSTACK_BASE_URL", DEFAULT_BASE_URL)
+        self.timeout = timeout or httpx.Timeout(
+            getattr(settings, "PAYSTACK_READ_TIMEOUT", 10.0),
+            connect=getattr(settings, "PAYSTACK_CONNECT_TIMEOUT", 3.0),
+        )
+        self.max_retries = max_retries if max_retries is not None else getattr(settings, "PAYSTACK_MAX_RETRIES", 2)
+        self.backoff_base = backoff_base
+        self.backoff_cap = backoff_cap
+        self.breaker = breaker
+        self.metrics = metrics
+
+    def client_options(self):
+        return {
+            "base_url": self.base_url,
+            "timeout": self.timeout,
+            "headers": {"Authorization": f"Bearer {self.secret_key}"},
+            "limits": httpx.Limits(max_connections=20, max_keepalive_connections=10),
+        }
+
+    def backoff(self, attempt):
+        # "Full jitter": spread retries out so workers do not retry in lockstep
+        return random.uniform(0, min(self.backoff_cap, self.backoff_base * 2 ** attempt))
+
+    def should_retry(self, method, attempt, error=None, response=None):
+        if attempt >= self.max_retries:
+            return False
+        if error is not None:
+            return method == "GET" or isinstance(error, UNSENT_ERRORS)
+        if response.status_code == 429:
+            return True
+        return method == "GET" and response.status_code in RETRY_STATUSES
+
+    def check_breaker(self):
+        if not self.breaker.allow():
+            raise CircuitOpenError("Payment provider is temporarily unavailable, please retry shortly.")
+
+    def finish(self, operation, started, attempt, error=None, response=None):
+        failed = error is not None or response.status_code >= 500
+        if failed:
+            self.breaker.record_failure()
+        else:
+            self.breaker.record_success()
+        self.metrics.record(operation, (time.perf_counter() - started) * 1000, not failed, attempt)
+        if error is not None:
+            raise PaystackError(f"Payment provider request failed: {error}") from error
+        try:
+            data = response.json()
+        except ValueError:
+            data = {"status": False, "message": response.text[:200]}
+        return PaystackResponse(response.status_code, data)
+
+    @staticmethod
+    def initialize_payload(email, amount, callback_url=None, reference=None):
+        payload = {"email": email, "amount": amount}
+        if callback_url:
+            payload["callback_url"] = callback_url
+        if reference:
+            payload["reference"] = reference
+        return payload
+
+
+class PaystackClient(BasePaystackClient):
+    """Blocking client for the WSGI views."""
+
+    def __init__(self, transport=None, **kwargs):
+        super().__init__(**kwargs)
+        self.http = httpx.Client(transport=transport, **self.client_options())
+
+    def request(self, operation, method, path, **kwargs):
+        self.check_breaker()
+        started, attempt = time.perf_counter(), 0
+        while True:
+            try:
+                response = self.http.request(method, path, **kwargs)
+            except httpx.TransportError as error:
+                if self.should_retry(method, attempt, error=error):
+                    time.sleep(self.backoff(attempt))
+                    attempt += 1
+                    continue
+                return self.finish(operation, started, attempt, error=error)
+            if self.should_retry(method, attempt, response=response):
+                time.sleep(self.backoff(attempt))
+                attempt += 1
+                continue
+            return self.finish(operation, started, attempt, response=response)
+
+    def initialize_transaction(self, email, amount, callback_url=None, reference=None):
+        payload = self.initialize_payload(email, amount, callback_url, reference)
+        return self.request("initialize", "POST", "/transaction/initialize", json=payload)
+
+    def verify_transaction(self, reference):
+        return self.request("verify", "GET", f"/transaction/verify/{reference}")
+
+    def close(self):
+        self.http.close()
+
+
+class AsyncPaystackClient(BasePaystackClient):
+    """Non-blocking client for ASGI code (consumers, async workers)."""
+
+    def __init__(self, transport=None, **kwargs):
+        super().__init__(**kwargs)
+        self.http = httpx.AsyncClient(transport=transport, **self.client_options())
+
+    async def request(self, operation, method, path, **kwargs):
+        self.check_breaker()
+        started, attempt = time.perf_counter(), 0
+        while True:
+            try:
+                response = await self.http.request(method, path, **kwargs)
+            except httpx.TransportError as error:
+                if self.should_retry(method, attempt, error=error):
+                    await asyncio.sleep(self.backoff(attempt))
+                    attempt += 1
+                    continue
+                return self.finish(operation, started, attempt, error=error)
+            if self.should_retry(method, attempt, response=response):
+                await asyncio.sleep(self.backoff(attempt))
+                attempt += 1
+                continue
+            return self.finish(operation, started, attempt, response=response)
+
+    async def initialize_transaction(self, email, amount, callback_url=None, reference=None):
+        payload = self.initialize_payload(email, amount, callback_url, reference)
+        return await self.request("initialize", "POST", "/transaction/initialize", json=payload)
+
+    async def verify_transaction(self, reference):
+        return await self.request("verify", "GET", f"/transaction/verify/{reference}")
+
+    async def aclose(self):
+        await self.http.aclose()
+
+
+_client = None
+_client_lock = threading.Lock()
+_async_clients = weakref.WeakKeyDictionary()
+
+
+def get_client():
+    """The process-wide blocking client, created on first use."""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = PaystackClient()
+    return _client
+
+
+def get_async_client():
+    """The async client for the running event loop, created on first use."""
+    loop = asyncio.get_running_loop()
+    client = _async_clients.get(loop)
+    if client is None:
+        client = _async_clients[loop] = AsyncPaystackClient()
+    return client
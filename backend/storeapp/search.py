@@ -0,0 +1,181 @@
+"""
+Full-text search over the product catalog.
+
+SQLite keeps an FTS5 index (``storeapp_product_fts``) in sync with
+``storeapp_product`` through triggers, so every ``Product.save``/``delete``
+and bulk write updates it without extra queries from Python. PostgreSQL ranks
+with a GIN-indexed ``tsvector`` over the same columns, and any other database
+falls back to ``icontains`` lookups.
+
+SQLite drops triggers together with their table, so a migration that makes
+Django rebuild ``storeapp_product`` must be followed by
+``python manage.py rebuild_search_index``.
+"""
+import re
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import Q
+from django.utils.module_loading import import_string
+
+
+FTS_TABLE = "storeapp_product_fts"
+PRODUCT_TABLE = "storeapp_product"
+INDEXED_COLUMNS = ("name", "description", "category")
+
+# bm25() weights, one per indexed column: a hit in the name counts the most
+COLUMN_WEIGHTS = (10.0, 1.0, 3.0)
+
+TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+
+def tokenize(term):
+    """Split a raw search box value into lowercase word tokens."""
+    return [token.lower() for token in TOKEN_RE.findall(term or "")]
+
+
+class SearchBackend:
+    """Base class for catalog search backends."""
+
+    def install(self, schema_editor):
+        """Create whatever index structures the backend needs."""
+
+    def uninstall(self, schema_editor):
+        """Drop the structures created by ``install``."""
+
+    def rebuild(self, using=None):
+        """Re-index every product from scratch."""
+
+    def search(self, queryset, term):
+        raise NotImplementedError
+
+
+class SimpleSearchBackend(SearchBackend):
+    """Unindexed fallback: every token must appear in one of the columns."""
+
+    def search(self, queryset, term):
+        for token in tokenize(term):
+            condition = Q()
+            for column in INDEXED_COLUMNS:
+                condition |= Q(**{f"{column}__icontains": token})
+            queryset = queryset.filter(condition)
+        return queryset
+
+
+class SQLiteFTSBackend(SearchBackend):
+    """FTS5 external-content index maintained by triggers on the product table."""
+
+    def install(self, schema_editor):
+        columns = ", ".join(INDEXED_COLUMNS)
+        new_values = ", ".join(f"new.{column}" for column in INDEXED_COLUMNS)
+        old_values = ", ".join(f"old.{column}" for column in INDEXED_COLUMNS)
+
+        statements = [
+            f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5("
+            f"{columns}, content='{PRODUCT_TABLE}', content_rowid='id', "
+            f"tokenize='unicode61 remove_diacritics 2', prefix='2 3')",
+            f"CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ai AFTER INSERT ON {PRODUCT_TABLE} BEGIN "
+            f"INSERT INTO {FTS_TABLE}(rowid, {columns}) VALUES (new.id, {new_values}); END",
+            f"CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ad AFTER DELETE ON {PRODUCT_TABLE} BEGIN "
+            f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, {columns}) "
+            f"VALUES ('delete', old.id, {old_values}); END",
+            f"CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_au AFTER UPDATE OF {columns} ON {PRODUCT_TABLE} BEGIN "
+            f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, {columns}) "
+            f"VALUES ('delete', old.id, {old_values}); "
+            f"INSERT INTO {FTS_TABLE}(rowid, {columns}) VALUES (new.id, {new_values}); END",
+        ]
+        for statement in statements:
+            schema_editor.execute(statement)
+
+    def uninstall(self, schema_editor):
+        for suffix in ("ai", "ad", "au"):
+            schema_editor.execute(f"DROP TRIGGER IF EXISTS {FTS_TABLE}_{suffix}")
+        schema_editor.execute(f"DROP TABLE IF EXISTS {FTS_TABLE}")
+
+    def rebuild(self, using=None):
+        with (using or connection).cursor() as cursor:
+            cursor.execute(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')")
+
+    def match_expression(self, term):
+        # Quote every token so FTS5 operators typed by users are taken
+        # literally, and add '*' so "shi" finds "shirt" while typing.
+        return " ".join(f'"{token}"*' for token in tokenize(term))
+
+    def search(self, queryset, term):
+        match = self.match_expression(term)
+        if not match:
+            return queryset
+        weights = ", ".join(str(weight) for weight in COLUMN_WEIGHTS)
+        return queryset.extra(
+            select={"search_rank": f"bm25({FTS_TABLE}, {weights})"},
+            tables=[FTS_TABLE],
+            where=[f"{FTS_TABLE}.rowid = {PRODUCT_TABLE}.id", f"{FTS_TABLE} MATCH %s"],
+            params=[match],
+        ).order_by("search_rank", *queryset.query.order_by)
+
+
+class PostgresSearchBackend(SearchBackend):
+    """Ranks with ``ts_rank`` over a GIN-indexed ``tsvector`` of the indexed columns."""
+
+    config = "english"
+
+    def install(self, schema_editor):
+        # Must stay identical to the expression SearchVector(*INDEXED_COLUMNS)
+        # compiles to, otherwise the planner will not pick the index.
+        document = " || ' ' || ".join(
+            f"COALESCE(({column})::text, '')" for column in INDEXED_COLUMNS
+        )
+        schema_editor.execute(
+            f"CREATE INDEX IF NOT EXISTS {PRODUCT_TABLE}_search_idx ON {PRODUCT_TABLE} "
+            f"USING GIN (to_tsvector('{self.config}'::regconfig, {document}))"
+        )
+
+    def uninstall(self, schema_editor):
+        schema_editor.execute(f"DROP INDEX IF EXISTS {PRODUCT_TABLE}_search_idx")
+
+    def search(self, queryset, term):
+        from django.contrib.postgres.search import SearchQuery, SearchRank, SearchVector
+
+        tokens = tokenize(term)
+        if not tokens:
+            return queryset
+        vector = SearchVector(*INDEXED_COLUMNS, config=self.config)
+        query = SearchQuery(
+            " & ".join(f"{token}:*" for token in tokens),
+            search_type="raw",
+            config=self.config,
+        )
+        return (
+            queryset.annotate(search_document=vector, search_rank=SearchRank(vector, query))
+            .filter(search_document=query)
+            .order_by("-search_rank", *queryset.query.order_by)
+        )
+
+
+VENDOR_BACKENDS = {
+    "sqlite": SQLiteFTSBackend,
+    "postgresql": PostgresSearchBackend,
+}
+
+
+def get_backend(vendor=None):
+    """Return the configured backend, or the best one for the database vendor."""
+    path = getattr(settings, "PRODUCT_SEARCH_BACKEND", None)
+    if path:
+        return import_string(path)()
+    return VENDOR_BACKENDS.get(vendor or connection.vendor, SimpleSearchBackend)()
+
+
+def search_products(queryset, term):
+    """Restrict a product ``queryset`` to ``term`` matches, best match first."""
+    return get_backend().search(queryset, term)
+
+
+def install_search_index(apps, schema_editor):
+    backend = get_backend(schema_editor.connection.vendor)
+    backend.install(schema_editor)
+    backend.rebuild(schema_editor.connection)
+
+
+def uninstall_search_index(apps, schema_editor):
+    get_backend(schema_editor.connection.vendor).uninstall(schema_editor)
@@ -1,15 +1,38 @@
 from rest_framework import serializers 
+from django.core.files.storage import default_storage
+from .images import srcsets
 from .models import Cart, CartItem, Order, Orderitem, Product, ShippingInfo 
 
 
-class ProductSerializer(serializers.ModelSerializer):
+class ImageSrcsetMixin(serializers.Serializer):
+    """``image_srcset``: per-format srcset strings for the resized copies of ``image``."""
+    image_srcset = serializers.SerializerMethodField()
+
+    def get_image_srcset(self, product):
+        request = self.context.get("request")
+
+        def url_for(name):
+            url = default_storage.url(name)
+            return request.build_absolute_uri(url) if request is not None else url
+
+        return srcsets(product.image_renditions, url_for)
+
+
+class ProductSerializer(ImageSrcsetMixin, serializers.ModelSerializer):
     class Meta:
         model = Product 
-        fields = "__all__"
+        exclude = ["image_renditions"]
+
+
+class ProductSummarySerializer(ImageSrcsetMixin, serializers.ModelSerializer):
+    """Trimmed product representation for nesting inside carts and orders."""
+    class Meta:
+        model = Product
+        fields = ["id", "name", "slug", "sku", "category", "price", "quantity", "image", "image_srcset", "featured"]
 
 
 class CartItemSerializer(serializers.ModelSerializer):
-    product = ProductSerializer(read_only=True)
+    product = ProductSummarySerializer(read_only=True)
     sub_total = serializers.SerializerMethodField()
     class Meta:
         model = CartItem 
@@ -30,6 +53,9 @@ class CartSerializer(serializers.ModelSerializer):
         fields = ["id", "cart_code", "cartitems", "cart_total"]
 
     def get_cart_total(self, cart):
+        # Annotated by Cart.objects.with_items(); an empty cart sums to None
+        if hasattr(cart, "cart_total"):
+            return cart.cart_total or 0
         items = cart.cartitems.all()
         total = sum([item.quantity * item.product.price for item in items])
         return total
@@ -43,7 +69,7 @@ class ShippingInfoSerializer(serializers.ModelSerializer):
 
 
 class OrderitemSerializer(serializers.ModelSerializer):
-    product = ProductSerializer(read_only=True)
+    product = ProductSummarySerializer(read_only=True)
     class Meta:
         model = Orderitem
         fields = ["id", "product", "quantity"]
@@ -0,0 +1,103 @@
+"""
+Slug allocation for products.
+
+Slugs are ``slugify(name)`` with a numeric suffix when the base is taken
+(``t-shirt``, ``t-shirt-1``, ``t-shirt-2``...). Instead of probing suffixes
+one ``exists()`` query at a time, the slugs already using a base are read
+with one range query on the unique slug index, and the next suffix is
+worked out in memory. ``allocate_slugs`` does the same for a whole batch
+of names, e.g. a bulk import, chunking the range lookups.
+"""
+from django.db import connection
+from django.utils.text import slugify
+
+
+SLUG_MAX_LENGTH = 50
+# Room left in the slug field for a "-<n>" suffix
+SUFFIX_ROOM = 8
+LOOKUP_CHUNK = 100
+
+
+def base_slug(name):
+    return slugify(name or "")[:SLUG_MAX_LENGTH - SUFFIX_ROOM].strip("-") or "product"
+
+
+def taken_suffixes(base, slugs):
+    """Suffixes in use for ``base`` among ``slugs``; 0 stands for the bare base."""
+    taken = set()
+    for slug in slugs:
+        if slug == base:
+            taken.add(0)
+        elif slug.startswith(f"{base}-") and slug[len(base) + 1:].isdigit():
+            taken.add(int(slug[len(base) + 1:]))
+    return taken
+
+
+def has_base(slug, base):
+    """Whether ``slug`` is ``base`` or ``base`` with a numeric suffix."""
+    return bool(taken_suffixes(base, [slug]))
+
+
+def suffix_of(base, slug):
+    return int(slug[len(base) + 1:]) if slug != base else 0
+
+
+def next_slug(base, taken):
+    if 0 not in taken:
+        return base
+    return f"{base}-{max(taken) + 1}"
+
+
+def existing_slugs(queryset, bases):
+    """Slugs in ``queryset`` equal to or suffixed from any of ``bases``."""
+    bases = sorted(set(bases))
+    column = "{}.{}".format(
+        connection.ops.quote_name(queryset.model._meta.db_table), connection.ops.quote_name("slug")
+    )
+    slugs = []
+    for start in range(0, len(bases), LOOKUP_CHUNK):
+        chunk = bases[start:start + LOOKUP_CHUNK]
+        # "base-..." as a range on the unique index ("." sorts right after
+        # "-"); LIKE 'base-%' would not use the index on every backend. The
+        # condition is written as SQL because building thousands of Q
+        # objects costs more than running the query.
+        exact = f"{column} IN ({', '.join(['%s'] * len(chunk))})"
+        ranges = [f"({column} >= %s AND {column} < %s)"] * len(chunk)
+        params = chunk + [bound for base in chunk for bound in (f"{base}-", f"{base}.")]
+        condition = " OR ".join([exact, *ranges])
+        slugs.extend(queryset.extra(where=[condition], params=params).values_list("slug", flat=True))
+    return slugs
+
+
+def allocate_slug(queryset, name, exclude_pk=None):
+    """A free slug for ``name`` with a single query."""
+    base = base_slug(name)
+    if exclude_pk is not None:
+        queryset = queryset.exclude(pk=exclude_pk)
+    return next_slug(base, taken_suffixes(base, existing_slugs(queryset, [base])))
+
+
+def allocate_slugs(queryset, names):
+    """Free, mutually distinct slugs for ``names``, in order."""
+    bases = [base_slug(name) for name in names]
+    existing = existing_slugs(queryset, bases)
+
+    by_base = {}
+    for slug in existing:
+        by_base.setdefault(slug.rsplit("-", 1)[0], []).append(slug)
+        by_base.setdefault(slug, []).append(slug)
+
+    taken, used = {}, set(existing)
+    slugs = []
+    for base in bases:
+        if base not in taken:
+            taken[base] = taken_suffixes(base, by_base.get(base, []))
+        slug = next_slug(base, taken[base])
+        # Another base earlier in the batch may already have produced it
+        while slug in used:
+            taken[base].add(suffix_of(base, slug))
+            slug = next_slug(base, taken[base])
+        taken[base].add(suffix_of(base, slug))
+        used.add(slug)
+        slugs.append(slug)
+    return slugs
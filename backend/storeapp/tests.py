@@ -1,3 +1,1012 @@
-from django.test import TestCase
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import OperationalError, connection, transaction
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework.test import APIClient
 
-# Create your tests here.
+import asyncio
+import io
+import hashlib
+import hmac
+import json
+import tempfile
+import threading
+import time
+from decimal import Decimal
+
+import httpx
+from PIL import Image
+from unittest import mock
+
+from . import cache as catalog_cache
+from . import bulk, checkout, identifiers, images, llm, slugs, uploads
+from .checkout import StockConflict, amount_in_kobo, finalize_order, prepare_order
+from .fake_paystack import FakePaystack, FakePaystackServer
+from .models import Cart, CartItem, GeneratedText, IdentifierSequence, Order, Orderitem, PaymentEvent, Product
+from .pagination import KeysetPagination
+from .payments import AsyncPaystackClient, CallMetrics, CircuitBreaker, CircuitOpenError, PaystackClient, PaystackError
+from .search import search_products
+from .serializers import ProductSerializer
+
+
+LOCMEM_CACHES = {"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}}
+
+
+def make_product(name, **kwargs):
+    kwargs.setdefault("sku", f"SKU-{Product.objects.count() + 1}")
+    kwargs.setdefault("price", "10.00")
+    kwargs.setdefault("quantity", 20)
+    return Product.objects.create(name=name, **kwargs)
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class ProductSearchTests(TestCase):
+    def setUp(self):
+        self.shirt = make_product("Cotton Shirt", category="clothing", description="Soft and light.")
+        self.mug = make_product("Coffee Mug", category="home_and_garden", description="Pairs with a cotton shirt.")
+        self.watch = make_product("Smart Watch", category="electronics", description="Tracks sleep.")
+
+    def search(self, term):
+        return list(search_products(Product.objects.order_by("-id"), term))
+
+    def test_name_matches_rank_above_description_matches(self):
+        self.assertEqual(self.search("cotton shirt"), [self.shirt, self.mug])
+
+    def test_prefix_matching(self):
+        self.assertEqual(self.search("sma"), [self.watch])
+
+    def test_category_is_searchable(self):
+        self.assertEqual(self.search("electronics"), [self.watch])
+
+    def test_index_follows_updates_and_deletes(self):
+        self.watch.name = "Fitness Band"
+        self.watch.save()
+        self.assertEqual(self.search("smart"), [])
+        self.assertEqual(self.search("fitness"), [self.watch])
+
+        self.watch.delete()
+        self.assertEqual(self.search("fitness"), [])
+
+    def test_query_syntax_is_not_interpreted(self):
+        self.assertEqual(self.search('"mug* -('), [self.mug])
+        self.assertEqual(len(self.search("  ")), 3)
+
+    def test_both_listing_endpoints_use_the_index(self):
+        client = APIClient()
+
+        response = client.get(reverse("get_products"), {"search": "cott"})
+        self.assertEqual([p["id"] for p in response.data["results"]], [self.shirt.id, self.mug.id])
+
+        response = client.get(reverse("get_all_products"), {"search": "cott", "category": "all"})
+        self.assertEqual(response.data["count"], 2)
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class CatalogCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        catalog_cache.stats.reset()
+        self.client = APIClient()
+        self.product = make_product("Desk Lamp", featured=True)
+
+    def test_repeated_reads_are_served_from_cache(self):
+        url = reverse("get_product", args=[self.product.id])
+        self.client.get(url)
+        with self.assertNumQueries(0):
+            response = self.client.get(url)
+        self.assertEqual(response.data["name"], "Desk Lamp")
+
+        stats = catalog_cache.stats.as_dict()
+        self.assertEqual((stats["hits"], stats["misses"]), (1, 1))
+        self.assertEqual(stats["bytes_served"], stats["bytes_stored"])
+
+    def test_query_params_are_part_of_the_key(self):
+        make_product("Floor Lamp")
+        url = reverse("get_products")
+        self.assertEqual(self.client.get(url, {"search": "desk"}).data["count"], 1)
+        self.assertEqual(self.client.get(url, {"search": "lamp"}).data["count"], 2)
+
+    def test_writes_bump_the_catalog_version(self):
+        url = reverse("get_featured_products")
+        self.assertEqual(len(self.client.get(url).data), 1)
+
+        response = self.client.patch(
+            reverse("update_product", args=[self.product.id]), {"featured": "false"}
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.client.get(url).data, [])
+
+    @override_settings(ALLOWED_HOSTS=["shop.example.com", "api.example.com"])
+    def test_pagination_links_follow_the_requesting_host(self):
+        for i in range(9):
+            make_product(f"Shelf {i}")
+        url = reverse("get_products")
+        first = self.client.get(url, HTTP_HOST="shop.example.com").data["next"]
+        second = self.client.get(url, HTTP_HOST="api.example.com").data["next"]
+        self.assertTrue(first.startswith("http://shop.example.com/"))
+        self.assertTrue(second.startswith("http://api.example.com/"))
+
+    def test_stats_endpoint(self):
+        shopper = get_user_model().objects.create_user(email="shopper@example.com", username="shopper", password="pw")
+        self.client.force_authenticate(shopper)
+        self.assertEqual(self.client.get(reverse("cache_stats")).status_code, 403)
+
+        user = get_user_model().objects.create_user(email="admin@example.com", username="admin", password="pw",
+                                                    is_staff=True)
+        self.client.force_authenticate(user)
+        self.client.get(reverse("get_featured_products"))
+
+        response = self.client.get(reverse("cache_stats"))
+        self.assertEqual(response.data["misses"], 1)
+        self.assertIn("catalog_version", response.data)
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class KeysetPaginationTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.admin = get_user_model().objects.create_user(email="staff@example.com", username="staff", password="pw")
+        self.client.force_authenticate(self.admin)
+        self.orders = [Order.objects.create(user=self.admin) for _ in range(25)]
+        # Ties on created_at must still page deterministically via the id
+        Order.objects.update(created_at=self.orders[0].created_at)
+
+    def collect(self, url, params):
+        ids, response = [], self.client.get(url, params)
+        while True:
+            ids += [order["id"] for order in response.data["results"]]
+            if not response.data["next"]:
+                return ids, response
+            response = self.client.get(response.data["next"])
+
+    def test_walks_every_order_once_without_counting(self):
+        url = reverse("get_all_orders")
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url, {"paginate": "cursor"})
+        self.assertFalse(any("COUNT(" in q["sql"] or "OFFSET" in q["sql"] for q in queries))
+        self.assertNotIn("count", response.data)
+        self.assertIsNone(response.data["previous"])
+
+        ids, last = self.collect(url, {"paginate": "cursor"})
+        self.assertEqual(ids, sorted((o.id for o in self.orders), reverse=True))
+
+        previous = self.client.get(last.data["previous"])
+        self.assertEqual([o["id"] for o in previous.data["results"]], ids[10:20])
+        self.assertIsNotNone(previous.data["next"])
+
+    def test_page_numbers_remain_the_default(self):
+        response = self.client.get(reverse("get_user_orders"), {"page": 2})
+        self.assertEqual(response.data["count"], 25)
+        self.assertEqual(len(response.data["results"]), 5)
+
+    def test_invalid_cursor_is_rejected(self):
+        response = self.client.get(reverse("get_all_orders"), {"cursor": "nonsense"})
+        self.assertEqual(response.status_code, 404)
+
+    def test_cursor_pages_seek_the_index_without_sorting(self):
+        paginator = KeysetPagination(("-created_at", "-id"), page_size=10)
+        key = [self.orders[10].created_at, self.orders[10].id]
+        for reverse in (False, True):
+            ordering = [paginator.flip(f) for f in paginator.ordering] if reverse else paginator.ordering
+            plan = Order.objects.order_by(*ordering).filter(paginator.seek(key, reverse))[:10].explain()
+            self.assertRegex(plan, r"SEARCH storeapp_order USING (COVERING )?INDEX \w*created\w*")
+            self.assertNotIn("TEMP B-TREE", plan)
+
+    def test_searches_keep_relevance_order_with_cursors(self):
+        make_product("Lamp shade")
+        make_product("Desk lamp", description="lamp lamp lamp")
+        response = self.client.get(reverse("get_products"), {"paginate": "cursor", "search": "lamp"})
+        self.assertIn("count", response.data)
+        ranked = search_products(Product.objects.order_by("-created_at", "-id"), "lamp")
+        self.assertEqual([p["id"] for p in response.data["results"]], [p.id for p in ranked])
+
+    def test_product_listings_accept_cursors(self):
+        for index in range(10):
+            make_product(f"Item {index}", category="books")
+        ids, _ = self.collect(reverse("get_all_products"), {"paginate": "cursor", "category": "books"})
+        self.assertEqual(ids, list(Product.objects.order_by("-id").values_list("id", flat=True)))
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class SerializerQueryCountTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(email="buyer@example.com", username="buyer", password="pw")
+        self.client.force_authenticate(self.user)
+        self.products = [make_product(f"Product {i}", price=f"{i + 1}.50") for i in range(6)]
+
+    def fill_cart(self, code, size):
+        cart = Cart.objects.create(cart_code=code)
+        for product in self.products[:size]:
+            CartItem.objects.create(cart=cart, product=product, quantity=2)
+        return cart
+
+    def place_orders(self, count):
+        for _ in range(count):
+            order = Order.objects.create(user=self.user)
+            for product in self.products:
+                Orderitem.objects.create(order=order, product=product, quantity=1)
+
+    def test_get_cart_query_count_is_independent_of_items(self):
+        self.fill_cart("small", 1)
+        self.fill_cart("large", 6)
+
+        with self.assertNumQueries(2):
+            self.client.get(reverse("get_cart", args=["small"]))
+        with self.assertNumQueries(2):
+            response = self.client.get(reverse("get_cart", args=["large"]))
+
+        expected = sum(2 * product.price for product in Product.objects.all())
+        self.assertEqual(response.data["cart_total"], expected)
+        self.assertNotIn("description", response.data["cartitems"][0]["product"])
+
+    def test_empty_cart_total_is_zero(self):
+        Cart.objects.create(cart_code="empty")
+        response = self.client.get(reverse("get_cart", args=["empty"]))
+        self.assertEqual(response.data["cart_total"], 0)
+
+    def test_order_listings_query_count_is_independent_of_orders(self):
+        self.place_orders(1)
+        with self.assertNumQueries(3):  # count, orders, items with products
+            self.client.get(reverse("get_all_orders"))
+
+        self.place_orders(9)
+        with self.assertNumQueries(3):
+            response = self.client.get(reverse("get_all_orders"))
+        self.assertEqual(len(response.data["results"][0]["orderitems"]), 6)
+
+        with self.assertNumQueries(2):  # no count in cursor mode
+            self.client.get(reverse("get_user_orders"), {"paginate": "cursor"})
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class FinalizeOrderTests(TestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(email="payer@example.com", username="payer", password="pw")
+        self.products = [make_product(f"Stocked {i}", quantity=5) for i in range(5)]
+
+    def make_order(self, lines, cart_code="cart-1", total_amount=Decimal("0.00")):
+        Cart.objects.create(cart_code=cart_code)
+        order = Order.objects.create(user=self.user, cart_code=cart_code, reference=f"ref-{cart_code}",
+                                     total_amount=total_amount)
+        for product, quantity in lines:
+            Orderitem.objects.create(order=order, product=product, quantity=quantity)
+        return order
+
+    def stock(self):
+        return list(Product.objects.order_by("id").values_list("quantity", flat=True))
+
+    def test_statement_count_does_not_grow_with_lines(self):
+        small = self.make_order([(self.products[0], 1)], "small")
+        large = self.make_order([(product, 2) for product in self.products], "large")
+
+        with CaptureQueriesContext(connection) as small_queries:
+            finalize_order(small)
+        with CaptureQueriesContext(connection) as large_queries:
+            finalize_order(large)
+
+        self.assertEqual(len(small_queries), len(large_queries))
+        self.assertEqual(self.stock(), [2, 3, 3, 3, 3])
+        self.assertFalse(Cart.objects.filter(cart_code__in=["small", "large"]).exists())
+
+    def test_shortfalls_are_reported_and_left_in_stock(self):
+        order = self.make_order([(self.products[0], 2), (self.products[1], 9)])
+
+        result = finalize_order(order)
+
+        self.assertTrue(result.finalized)
+        self.assertEqual(
+            [s.as_dict() for s in result.shortfalls],
+            [{"product_id": self.products[1].id, "name": "Stocked 1", "requested": 9, "available": 5}],
+        )
+        self.assertEqual(self.stock(), [3, 5, 5, 5, 5])
+
+    def test_finalizing_twice_only_takes_stock_once(self):
+        order = self.make_order([(self.products[0], 2)])
+        stale = Order.objects.get(pk=order.pk)  # a second worker loaded it before the first finished
+
+        self.assertTrue(finalize_order(order).finalized)
+        self.assertFalse(finalize_order(stale).finalized)
+        self.assertEqual(self.stock()[0], 3)
+
+    def stale_stock(self, reads):
+        """Patch read_stock to report 5 units for the first ``reads`` reads, as if sold since."""
+        real = checkout.read_stock
+        calls = []
+
+        def read(product_ids):
+            calls.append(product_ids)
+            rows = real(product_ids)
+            return [(pk, name, 5) for pk, name, _ in rows] if len(calls) <= reads else rows
+
+        return mock.patch("storeapp.checkout.read_stock", side_effect=read), calls
+
+    def test_stock_taken_concurrently_is_rechecked(self):
+        Product.objects.filter(pk=self.products[0].pk).update(quantity=1)
+        order = self.make_order([(self.products[0], 3)])
+
+        patch, calls = self.stale_stock(reads=1)
+        with patch:
+            result = finalize_order(order)
+
+        self.assertEqual(len(calls), 2)
+        self.assertTrue(result.finalized)
+        self.assertEqual([s.requested for s in result.shortfalls], [3])
+        self.assertEqual(self.stock()[0], 1)
+
+    def test_order_is_not_paid_when_stock_keeps_changing(self):
+        Product.objects.filter(pk=self.products[0].pk).update(quantity=1)
+        order = self.make_order([(self.products[0], 3)])
+
+        patch, _ = self.stale_stock(reads=checkout.FINALIZE_ATTEMPTS)
+        with patch, self.assertRaises(StockConflict):
+            finalize_order(order)
+
+        order.refresh_from_db()
+        self.assertEqual(order.status, "pending")
+        self.assertTrue(Cart.objects.filter(cart_code="cart-1").exists())
+        self.assertEqual(self.stock()[0], 1)
+
+    def charged(self, order, amount):
+        paystack = FakePaystack()
+        paystack.initialize({"email": self.user.email, "amount": amount, "reference": order.reference})
+        return PaystackClient(transport=paystack.transport(), secret_key="sk_test", breaker=CircuitBreaker())
+
+    def test_verify_payment_uses_finalization(self):
+        order = self.make_order([(self.products[0], 1)], total_amount=Decimal("25.00"))
+        client = APIClient()
+        client.force_authenticate(self.user)
+
+        with mock.patch("storeapp.payments.get_client", return_value=self.charged(order, 2500)):
+            first = client.get(reverse("verify-payment", args=[order.reference]))
+            second = client.get(reverse("verify-payment", args=[order.reference]))
+
+        self.assertEqual(first.data["message"], "Payment verified successfully")
+        self.assertEqual(first.data["shortfalls"], [])
+        self.assertEqual(second.data["message"], "Payment already verified previously")
+        self.assertEqual(self.stock()[0], 4)
+
+    def test_verify_payment_rejects_a_short_charge(self):
+        order = self.make_order([(self.products[0], 1)], total_amount=Decimal("25.00"))
+        client = APIClient()
+        client.force_authenticate(self.user)
+
+        with mock.patch("storeapp.payments.get_client", return_value=self.charged(order, 100)):
+            response = client.get(reverse("verify-payment", args=[order.reference]))
+
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("Amount mismatch", response.data["error"])
+        order.refresh_from_db()
+        self.assertEqual(order.status, "pending")
+        self.assertTrue(Cart.objects.filter(cart_code="cart-1").exists())
+        self.assertEqual(self.stock()[0], 5)
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class PrepareOrderTests(TestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(email="cart@example.com", username="cart", password="pw")
+        self.products = [make_product(f"Line {i}", price="10.00") for i in range(6)]
+
+    def make_cart(self, code, lines):
+        cart = Cart.objects.create(cart_code=code, user=self.user)
+        for product, quantity in lines:
+            CartItem.objects.create(cart=cart, product=product, quantity=quantity)
+        return cart
+
+    def test_query_count_does_not_grow_with_lines(self):
+        small = self.make_cart("one", [(self.products[0], 1)])
+        large = self.make_cart("six", [(product, 1) for product in self.products])
+        # Reserve the first block of order numbers outside the comparison
+        prepare_order(self.user, self.make_cart("warm", [(self.products[0], 1)]))
+
+        with CaptureQueriesContext(connection) as small_queries:
+            prepare_order(self.user, small)
+        with CaptureQueriesContext(connection) as large_queries:
+            prepare_order(self.user, large)
+        self.assertEqual(len(small_queries), len(large_queries))
+
+    def test_totals_include_tax_and_shipping(self):
+        self.assertEqual(prepare_order(self.user, self.make_cart("a", [(self.products[0], 2)])).total_amount,
+                         Decimal("31.59"))
+        self.assertEqual(prepare_order(self.user, self.make_cart("b", [(self.products[0], 6)])).total_amount,
+                         Decimal("64.80"))
+
+    def test_total_is_rounded_to_the_stored_cent(self):
+        product = make_product("Odd price", price="10.99")
+        order = prepare_order(self.user, self.make_cart("odd", [(product, 1)]))
+
+        self.assertEqual(order.total_amount, Decimal("21.86"))  # 10.99 * 1.08 + 9.99 = 21.8592
+        order.refresh_from_db()
+        self.assertEqual(order.total_amount, Decimal("21.86"))
+
+    def test_retry_upserts_and_prunes_lines(self):
+        cart = self.make_cart("retry", [(self.products[0], 1), (self.products[1], 1)])
+        order = prepare_order(self.user, cart)
+
+        cart.cartitems.filter(product=self.products[1]).delete()
+        cart.cartitems.filter(product=self.products[0]).update(quantity=3)
+        CartItem.objects.create(cart=cart, product=self.products[2], quantity=2)
+
+        again = prepare_order(self.user, cart)
+        self.assertEqual(again.pk, order.pk)
+        self.assertEqual(
+            sorted(again.orderitems.values_list("product_id", "quantity")),
+            [(self.products[0].id, 3), (self.products[2].id, 2)],
+        )
+        again.refresh_from_db()
+        self.assertEqual(again.total_amount, Decimal("63.99"))
+
+
+class PaystackClientTests(TestCase):
+    def make_client(self, fake, **kwargs):
+        kwargs.setdefault("breaker", CircuitBreaker())
+        kwargs.setdefault("metrics", CallMetrics())
+        return PaystackClient(transport=fake.transport(), secret_key="sk_test", backoff_base=0, **kwargs)
+
+    def test_initialize_then_verify(self):
+        client = self.make_client(FakePaystack())
+        initialized = client.initialize_transaction("a@example.com", 5000, reference="ref-1")
+        verified = client.verify_transaction("ref-1")
+
+        self.assertTrue(initialized.ok)
+        self.assertEqual(verified.data["data"]["status"], "success")
+        self.assertEqual(verified.data["data"]["amount"], 5000)
+        self.assertEqual(client.metrics.as_dict()["verify"]["calls"], 1)
+
+    def test_get_is_retried_but_post_is_not(self):
+        fake = FakePaystack(failure_rate=1.0)
+        client = self.make_client(fake, max_retries=2)
+
+        self.assertEqual(client.verify_transaction("missing").status_code, 503)
+        self.assertEqual(fake.calls, 3)
+        self.assertEqual(client.initialize_transaction("a@example.com", 5000).status_code, 503)
+        self.assertEqual(fake.calls, 4)
+
+    def test_breaker_opens_after_repeated_failures(self):
+        now = [0.0]
+        breaker = CircuitBreaker(failure_threshold=2, reset_timeout=10, clock=lambda: now[0])
+        fake = FakePaystack(failure_rate=1.0)
+        client = self.make_client(fake, max_retries=0, breaker=breaker)
+
+        client.verify_transaction("a")
+        client.verify_transaction("b")
+        with self.assertRaises(CircuitOpenError):
+            client.verify_transaction("c")
+        self.assertEqual(fake.calls, 2)
+
+        now[0] = 11
+        fake.failure_rate = 0
+        fake.auto_settle = True
+        self.assertTrue(client.verify_transaction("d").ok)
+        self.assertEqual(breaker.state, "closed")
+
+    def test_transport_errors_raise_paystack_error(self):
+        def refuse(request):
+            raise httpx.ConnectError("refused", request=request)
+
+        client = PaystackClient(transport=httpx.MockTransport(refuse), secret_key="sk_test", backoff_base=0,
+                                breaker=CircuitBreaker(), metrics=CallMetrics())
+        with self.assertRaises(PaystackError):
+            client.initialize_transaction("a@example.com", 5000)
+        self.assertEqual(client.metrics.as_dict()["initialize"]["retries"], client.max_retries)
+
+    def test_async_client_runs_calls_concurrently(self):
+        fake = FakePaystack(latency=0.05, auto_settle=True)
+
+        async def verify_many():
+            client = AsyncPaystackClient(transport=fake.async_transport(), secret_key="sk_test",
+                                         breaker=CircuitBreaker(), metrics=CallMetrics())
+            try:
+                return await asyncio.gather(*(client.verify_transaction(f"ref-{i}") for i in range(10)))
+            finally:
+                await client.aclose()
+
+        started = time.perf_counter()
+        responses = asyncio.run(verify_many())
+        self.assertTrue(all(response.ok for response in responses))
+        self.assertLess(time.perf_counter() - started, 0.4)
+
+    def test_gateway_stats_are_for_admins(self):
+        client = APIClient()
+        shopper = get_user_model().objects.create_user(email="shopper@example.com", username="shopper", password="pw")
+        client.force_authenticate(shopper)
+        self.assertEqual(client.get(reverse("payment_gateway_stats")).status_code, 403)
+
+        admin = get_user_model().objects.create_user(email="admin@example.com", username="admin", password="pw",
+                                                     is_staff=True)
+        client.force_authenticate(admin)
+        response = client.get(reverse("payment_gateway_stats"))
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("breaker", response.data)
+
+    def test_fake_server_over_http(self):
+        with FakePaystackServer(FakePaystack()) as server:
+            client = PaystackClient(base_url=server.base_url, secret_key="sk_test",
+                                    breaker=CircuitBreaker(), metrics=CallMetrics())
+            try:
+                reference = client.initialize_transaction("a@example.com", 700).data["data"]["reference"]
+                self.assertTrue(client.verify_transaction(reference).ok)
+            finally:
+                client.close()
+
+
+@override_settings(CACHES=LOCMEM_CACHES, PAYSTACK_SECRET_KEY="sk_test", BACKGROUND_TASKS_EAGER=True)
+class PaystackWebhookTests(TestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(email="hook@example.com", username="hook", password="pw")
+        self.product = make_product("Hooked", quantity=5)
+        Cart.objects.create(cart_code="hook-cart", user=self.user)
+        self.order = Order.objects.create(user=self.user, cart_code="hook-cart", reference="hook-ref",
+                                          total_amount=Decimal("25.00"))
+        Orderitem.objects.create(order=self.order, product=self.product, quantity=2)
+
+    def post_event(self, payload, secret="sk_test"):
+        body = json.dumps(payload).encode()
+        signature = hmac.new(secret.encode(), body, hashlib.sha512).hexdigest()
+        with self.captureOnCommitCallbacks(execute=True):
+            return APIClient().post(reverse("paystack_webhook"), body, content_type="application/json",
+                                    HTTP_X_PAYSTACK_SIGNATURE=signature)
+
+    def charge(self, amount=2500, transaction_id=1, reference="hook-ref"):
+        return {"event": "charge.success",
+                "data": {"id": transaction_id, "reference": reference, "status": "success", "amount": amount,
+                         "currency": "NGN"}}
+
+    def test_rejects_bad_signature(self):
+        response = self.post_event(self.charge(), secret="wrong")
+        self.assertEqual(response.status_code, 401)
+        self.assertFalse(PaymentEvent.objects.exists())
+
+    def test_event_finalizes_order_once(self):
+        self.assertEqual(self.post_event(self.charge()).status_code, 200)
+        self.assertEqual(self.post_event(self.charge()).status_code, 200)
+
+        self.order.refresh_from_db()
+        self.product.refresh_from_db()
+        self.assertEqual(self.order.status, "success")
+        self.assertEqual(self.product.quantity, 3)
+        self.assertEqual(PaymentEvent.objects.get().status, "processed")
+        self.assertFalse(Cart.objects.filter(cart_code="hook-cart").exists())
+
+    def test_odd_total_settles_with_the_amount_charged(self):
+        product = make_product("Odd price", price="10.99", quantity=5)
+        cart = Cart.objects.create(cart_code="odd-cart", user=self.user)
+        CartItem.objects.create(cart=cart, product=product, quantity=1)
+        paystack = FakePaystack()
+        client = APIClient()
+        client.force_authenticate(self.user)
+
+        gateway = PaystackClient(transport=paystack.transport(), secret_key="sk_test", breaker=CircuitBreaker())
+        with mock.patch("storeapp.payments.get_client", return_value=gateway):
+            reference = client.post(reverse("initialize_payment"), {"cart_code": "odd-cart"}).data["reference"]
+        charged = paystack.transactions[reference]["amount"]
+        self.assertEqual(charged, 2186)  # 21.8592 rounded to 21.86
+
+        self.post_event(self.charge(amount=charged, reference=reference))
+        order = Order.objects.get(reference=reference)
+        self.assertEqual(order.status, "success")
+        self.assertEqual(amount_in_kobo(order.total_amount), charged)
+        self.assertEqual(PaymentEvent.objects.get().status, "processed")
+
+    def test_amount_mismatch_is_not_finalized(self):
+        self.post_event(self.charge(amount=100))
+        self.order.refresh_from_db()
+        self.assertEqual(self.order.status, "pending")
+        self.assertEqual(PaymentEvent.objects.get().status, "failed")
+
+    def test_currency_mismatch_is_not_finalized(self):
+        event = self.charge()
+        event["data"]["currency"] = "USD"
+        self.post_event(event)
+        self.order.refresh_from_db()
+        self.assertEqual(self.order.status, "pending")
+        self.assertEqual(PaymentEvent.objects.get().status, "failed")
+
+    def test_verify_answers_locally_after_webhook(self):
+        self.post_event(self.charge())
+        client = APIClient()
+        client.force_authenticate(self.user)
+
+        with mock.patch("storeapp.payments.get_client") as get_client:
+            response = client.get(reverse("verify-payment", args=["hook-ref"]))
+        get_client.assert_not_called()
+        self.assertEqual(response.data["status"], "success")
+
+    @override_settings(BACKGROUND_TASKS_EAGER=False)
+    def test_verify_settles_queued_event(self):
+        with mock.patch("storeapp.webhooks.tasks.submit_on_commit"):
+            self.post_event(self.charge())
+        self.assertEqual(PaymentEvent.objects.get().status, "pending")
+        client = APIClient()
+        client.force_authenticate(self.user)
+
+        with mock.patch("storeapp.payments.get_client") as get_client:
+            response = client.get(reverse("verify-payment", args=["hook-ref"]))
+        get_client.assert_not_called()
+        self.assertEqual(response.data["status"], "success")
+        self.assertEqual(PaymentEvent.objects.get().status, "processed")
+
+
+class IdentifierTests(TestCase):
+    def test_codes_are_unique_fixed_width_and_unlike_legacy_codes(self):
+        codes = {identifiers.encode(number) for number in range(1, 50001)}
+        self.assertEqual(len(codes), 50000)
+        self.assertEqual({len(code) for code in codes}, {identifiers.CODE_LENGTH})
+        self.assertNotEqual(identifiers.encode(1 << identifiers.CODE_BITS), identifiers.encode(0))
+
+    def test_block_is_served_without_queries(self):
+        allocator = identifiers.SequenceAllocator("test", block_size=10)
+        first = allocator.next()
+        with self.assertNumQueries(0):
+            rest = [allocator.next() for _ in range(9)]
+        self.assertEqual(rest, list(range(first + 1, first + 10)))
+        self.assertEqual(allocator.next(), first + 10)
+        self.assertEqual(IdentifierSequence.objects.get(name="test").next_value, first + 20)
+
+    def test_block_from_rolled_back_transaction_is_dropped(self):
+        allocator = identifiers.SequenceAllocator("test", block_size=10)
+        with self.assertRaises(ZeroDivisionError), transaction.atomic():
+            allocator.next()
+            1 / 0
+        # The reservation rolled back too, so the same range is reserved again
+        self.assertEqual(allocator.next(), 1)
+        self.assertEqual(IdentifierSequence.objects.get(name="test").next_value, 11)
+
+    def test_forked_process_reserves_its_own_block(self):
+        allocator = identifiers.SequenceAllocator("test", block_size=10)
+        parent = allocator.next()
+        with mock.patch("storeapp.identifiers.os.getpid", return_value=-1):
+            child = allocator.next()
+        self.assertGreaterEqual(child, parent + 10)
+
+    def test_products_and_orders_get_codes(self):
+        order = Order.objects.create(total_amount=Decimal("1.00"))
+        self.assertRegex(order.sku, r"^ORD-[0-9A-Z]{7}$")
+        self.assertRegex(identifiers.product_sku("books"), r"^BOO-[0-9A-Z]{7}$")
+
+
+class IdentifierConcurrencyTests(TransactionTestCase):
+    def test_concurrent_allocators_never_hand_out_the_same_number(self):
+        # Each allocator stands in for one worker process with its own blocks
+        allocators = [identifiers.SequenceAllocator("stress", block_size=7) for _ in range(6)]
+        shared = identifiers.SequenceAllocator("stress", block_size=7)
+        results, errors = [], []
+
+        def draw(allocator):
+            # The in-memory test database fails fast on lock contention where
+            # a real database would wait, so retry the way a busy timeout would
+            while True:
+                try:
+                    return allocator.next()
+                except OperationalError:
+                    time.sleep(0.001)
+
+        def work(allocator):
+            try:
+                numbers = [draw(allocator) for _ in range(150)]
+                numbers += [draw(shared) for _ in range(50)]
+                results.extend(numbers)
+            except Exception as error:
+                errors.append(error)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=work, args=(allocator,)) for allocator in allocators]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(errors, [])
+        self.assertEqual(len(results), 6 * 200)
+        self.assertEqual(len(set(results)), len(results))
+        self.assertEqual(len({identifiers.encode(number) for number in results}), len(results))
+
+
+class SlugAllocationTests(TestCase):
+    def test_duplicate_names_get_increasing_suffixes(self):
+        slugs = [make_product("T-Shirt").slug for _ in range(3)]
+        self.assertEqual(slugs, ["t-shirt", "t-shirt-1", "t-shirt-2"])
+
+    def test_slug_is_left_alone_unless_the_name_changes(self):
+        make_product("T-Shirt")
+        product = Product.objects.get(pk=make_product("T-Shirt").pk)
+
+        product.price = "12.00"
+        with self.assertNumQueries(1):
+            product.save()
+        self.assertEqual(product.slug, "t-shirt-1")
+
+        product.name = "Hoodie"
+        with self.assertNumQueries(2):
+            product.save(update_fields=["name"])
+        self.assertEqual(Product.objects.get(pk=product.pk).slug, "hoodie")
+
+    def test_next_suffix_found_in_one_query(self):
+        for _ in range(6):
+            make_product("Mug")
+        with self.assertNumQueries(1):
+            self.assertEqual(slugs.allocate_slug(Product.objects.all(), "Mug"), "mug-6")
+
+    def test_bulk_allocation(self):
+        make_product("T-Shirt")
+        make_product("Tea")
+        with self.assertNumQueries(1):
+            allocated = slugs.allocate_slugs(Product.objects.all(), ["T-Shirt", "Mug", "T-Shirt", "T-Shirt 2", "Mug"])
+        self.assertEqual(allocated, ["t-shirt-1", "mug", "t-shirt-2", "t-shirt-2-1", "mug-1"])
+
+    def test_long_names_leave_room_for_a_suffix(self):
+        name = "An extraordinarily long product name that goes on and on"
+        first, second = make_product(name), make_product(name)
+        self.assertLessEqual(len(second.slug), Product._meta.get_field("slug").max_length)
+        self.assertEqual(second.slug, f"{first.slug}-1")
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class BulkProductTests(TestCase):
+    def setUp(self):
+        self.staff = get_user_model().objects.create_user(email="ops@example.com", username="ops", password="pw",
+                                                          is_staff=True)
+        self.client = APIClient()
+        self.client.force_authenticate(self.staff)
+
+    def upload(self, content, name="products.csv"):
+        upload = SimpleUploadedFile(name, content.encode())
+        return self.client.post(reverse("import_products"), {"file": upload}, format="multipart")
+
+    def test_csv_import_creates_updates_and_reports_bad_rows(self):
+        make_product("Old Mug", sku="MUG-1", price="5.00")
+        response = self.upload(
+            "sku,name,category,price,quantity,featured\n"
+            "MUG-1,Old Mug,home_and_garden,6.50,3,true\n"
+            ",T-Shirt,clothing,12.00,10,\n"
+            ",T-Shirt,clothing,13.00,10,no\n"
+            "BAD-1,,toys,-1,x,maybe\n"
+        )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual((response.data["created"], response.data["updated"]), (2, 1))
+        self.assertEqual(response.data["error_count"], 1)
+        self.assertEqual(response.data["errors"][0]["line"], 5)
+        self.assertEqual(len(response.data["errors"][0]["errors"]), 5)
+
+        mug = Product.objects.get(sku="MUG-1")
+        self.assertEqual((mug.price, mug.quantity, mug.featured, mug.slug), (Decimal("6.50"), 3, True, "old-mug"))
+        shirts = Product.objects.filter(name="T-Shirt").order_by("price")
+        self.assertEqual([shirt.slug for shirt in shirts], ["t-shirt", "t-shirt-1"])
+        self.assertTrue(all(shirt.sku.startswith("CLO-") for shirt in shirts))
+
+    def test_undecodable_line_keeps_the_rows_before_it(self):
+        rows = "".join(f"ROW-{i},Row {i},1.00\n" for i in range(600)).encode()
+        content = b"sku,name,price\n" + rows + "BAD-1,Caf\u00e9,1.00\n".encode("latin-1") + b"LATE-1,Late,1.00\n"
+        upload = SimpleUploadedFile("products.csv", content)
+        response = self.client.post(reverse("import_products"), {"file": upload}, format="multipart")
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual((response.data["created"], response.data["error_count"]), (600, 1))
+        self.assertEqual(response.data["errors"][0]["line"], 602)
+        self.assertFalse(Product.objects.filter(sku__in=["BAD-1", "LATE-1"]).exists())
+
+    def test_query_count_does_not_grow_with_rows(self):
+        def import_rows(start, count):
+            lines = ["sku,name,price"] + [f"ROW-{i},Row {i},1.00" for i in range(start, start + count)]
+            with CaptureQueriesContext(connection) as queries:
+                bulk.import_products(iter(line + "\n" for line in lines))
+            return len(queries)
+
+        self.assertEqual(import_rows(0, 5), import_rows(5, 50))
+
+    def test_jsonl_import_and_rename(self):
+        make_product("Lamp", sku="LAMP-1")
+        report = bulk.import_products(iter([
+            '{"sku": "LAMP-1", "name": "Desk Lamp", "price": 30}\n',
+            'not json\n',
+            '{"sku": "LAMP-1", "name": "Floor Lamp", "price": 40}\n',
+        ]), "jsonl")
+
+        self.assertEqual((report.updated, report.error_count), (1, 2))
+        self.assertEqual(Product.objects.get(sku="LAMP-1").slug, "desk-lamp")
+
+    def test_renamed_products_keep_their_old_slugs_out_of_the_chunk(self):
+        make_product("Lamp", sku="LAMP-1")
+        make_product("Desk Lamp", sku="LAMP-2")
+        report = bulk.import_products(iter([
+            "sku,name,price\n",
+            "NEW-1,Lamp,20\n",  # must not be handed "lamp" while LAMP-1 still holds it
+            "LAMP-1,Floor Lamp,40\n",
+            "LAMP-2,Desk lamp,35\n",  # same base, keeps "desk-lamp"
+        ]))
+
+        self.assertEqual((report.created, report.updated, report.error_count), (1, 2, 0))
+        slugs = dict(Product.objects.values_list("sku", "slug"))
+        self.assertEqual(slugs, {"LAMP-1": "floor-lamp", "LAMP-2": "desk-lamp", "NEW-1": "lamp-1"})
+
+    def test_export_streams_a_reimportable_file(self):
+        for i in range(3):
+            make_product(f"Export {i}", category="books")
+        response = self.client.get(reverse("export_products"), {"file_format": "jsonl"})
+
+        self.assertTrue(response.streaming)
+        lines = b"".join(response.streaming_content).decode().splitlines()
+        self.assertEqual(len(lines), 3)
+        report = bulk.import_products(iter(line + "\n" for line in lines), "jsonl")
+        self.assertEqual((report.created, report.updated, report.error_count), (0, 3, 0))
+
+    def test_requires_staff(self):
+        customer = get_user_model().objects.create_user(email="c@example.com", username="c", password="pw")
+        self.client.force_authenticate(customer)
+        self.assertEqual(self.client.get(reverse("export_products")).status_code, 403)
+
+
+@override_settings(CACHES=LOCMEM_CACHES, BACKGROUND_TASKS_EAGER=True)
+class ImageRenditionTests(TestCase):
+    def setUp(self):
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        self.settings_override = override_settings(MEDIA_ROOT=media.name)
+        self.settings_override.enable()
+        self.addCleanup(self.settings_override.disable)
+        self.staff = get_user_model().objects.create_user(email="img@example.com", username="img", password="pw",
+                                                          is_staff=True)
+
+    def jpeg(self, size=(1600, 900)):
+        exif = Image.Exif()
+        exif[0x010F] = "Camera Maker"
+        buffer = io.BytesIO()
+        Image.new("RGB", size, (200, 30, 90)).save(buffer, format="JPEG", exif=exif.tobytes())
+        return SimpleUploadedFile("photo.jpg", buffer.getvalue(), content_type="image/jpeg")
+
+    def test_upload_produces_stripped_renditions_and_srcset(self):
+        client = APIClient()
+        client.force_authenticate(self.staff)
+        with self.captureOnCommitCallbacks(execute=True):
+            response = client.post(reverse("add_product"), {
+                "name": "Poster", "category": "home_and_garden", "price": "9.99", "quantity": "4",
+                "minimumStock": "1", "description": "Print", "image": self.jpeg(),
+            }, format="multipart")
+        self.assertEqual(response.status_code, 200)
+
+        product = Product.objects.get(pk=response.data["id"])
+        renditions = product.image_renditions["renditions"]
+        formats = {rendition["format"] for rendition in renditions}
+        self.assertIn("webp", formats)
+        self.assertEqual(len(renditions), len(formats) * len(images.RENDITION_WIDTHS))
+        for rendition in renditions:
+            with default_storage.open(rendition["name"]) as file, Image.open(file) as image:
+                self.assertEqual(image.width, rendition["width"])
+                self.assertEqual(image.format.lower(), rendition["format"])
+                self.assertFalse(image.getexif())
+                self.assertNotIn("icc_profile", image.info)
+
+        srcset = ProductSerializer(product).data["image_srcset"]
+        self.assertEqual(set(srcset), formats)
+        self.assertRegex(srcset["webp"], r"/[0-9a-f]{64}\.webp 320w")
+
+    def test_small_images_are_not_upscaled(self):
+        product = make_product("Tiny", image=self.jpeg(size=(200, 100)))
+        value = images.generate_renditions(product.pk)
+        self.assertEqual({rendition["width"] for rendition in value["renditions"]}, {200})
+
+    def test_stale_job_does_not_overwrite_newer_image(self):
+        product = make_product("Swap", image=self.jpeg())
+        with mock.patch("storeapp.images.render", side_effect=lambda source, pk: (
+            Product.objects.filter(pk=pk).update(image="product_images/other.jpg"),
+            {"source": source, "renditions": []},
+        )[1]):
+            self.assertIsNone(images.generate_renditions(product.pk))
+        product.refresh_from_db()
+        self.assertIsNone(product.image_renditions)
+
+
+@override_settings(BACKGROUND_TASKS_EAGER=True)
+class ImageUploadTests(TestCase):
+    def setUp(self):
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        self.settings_override = override_settings(MEDIA_ROOT=media.name)
+        self.settings_override.enable()
+        self.addCleanup(self.settings_override.disable)
+        self.client = APIClient()
+
+    def png(self, name="photo.png", content_type="image/png"):
+        buffer = io.BytesIO()
+        Image.new("RGB", (40, 30), (10, 120, 200)).save(buffer, format="PNG")
+        return SimpleUploadedFile(name, buffer.getvalue(), content_type=content_type)
+
+    def post_product(self, image, **extra):
+        data = {"name": "Lamp", "category": "home_and_garden", "price": "12.00", "quantity": "3",
+                "minimumStock": "1", "description": "Desk lamp", "image": image, **extra}
+        return self.client.post(reverse("add_product"), data, format="multipart")
+
+    def test_identical_uploads_share_one_stored_file(self):
+        first = self.post_product(self.png())
+        # Same bytes, different client name and declared type
+        second = self.post_product(self.png(name="copy.jpeg", content_type="image/jpeg"), name="Lamp 2")
+        self.assertEqual(first.status_code, 200)
+        self.assertEqual(second.status_code, 200)
+
+        names = list(Product.objects.values_list("image", flat=True))
+        self.assertEqual(len(set(names)), 1)
+        self.assertRegex(names[0], r"^product_images/[0-9a-f]{64}\.png$")
+        self.assertEqual(len(default_storage.listdir("product_images")[1]), 1)
+
+    def test_files_without_a_handler_digest_are_hashed_by_the_storage(self):
+        # As from the admin form: a plain upload with a misleading name
+        first = uploads.store_image(self.png(name="photo.jpeg"))
+        second = uploads.store_image(self.png(name="again.gif"))
+        self.assertEqual(first, second)
+        self.assertRegex(first, r"^product_images/[0-9a-f]{64}\.png$")
+        self.assertEqual(len(default_storage.listdir("product_images")[1]), 1)
+
+    def test_type_comes_from_content_not_declared_type(self):
+        fake = SimpleUploadedFile("evil.png", b"<?php echo 'hi'; ?>" * 10, content_type="image/png")
+        response = self.post_product(fake)
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data["error"], "Only .jpg, .png images are allowed.")
+        self.assertFalse(Product.objects.exists())
+
+    @override_settings(DATA_UPLOAD_MAX_MEMORY_SIZE=1024)
+    def test_oversized_request_is_rejected_unread(self):
+        with mock.patch("storeapp.views.MAX_IMAGE_SIZE_MB", 1):
+            big = SimpleUploadedFile("big.png", b"\x89PNG\r\n\x1a\n" + b"0" * (1024 * 1024 + 10))
+            response = self.post_product(big)
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data["error"], "Image must not be larger than 1MB.")
+        self.assertFalse(Product.objects.exists())
+
+    def test_handler_stops_buffering_once_over_the_limit(self):
+        handler = uploads.ImageUploadHandler(max_bytes=100)
+        with self.assertRaises(uploads.StopFutureHandlers):
+            handler.new_file("image", "big.jpg", "image/jpeg", None)
+        self.assertIsNone(handler.receive_data_chunk(b"\xff\xd8\xff" + b"0" * 60, 0))
+        with self.assertRaises(uploads.SkipFile):
+            handler.receive_data_chunk(b"0" * 60, 63)
+        self.assertEqual(handler.error, "Image must not be larger than 0MB.")
+        self.assertTrue(handler.file.closed)
+
+    def test_other_file_fields_pass_through(self):
+        handler = uploads.ImageUploadHandler()
+        handler.new_file("file", "products.csv", "text/csv", None)
+        self.assertEqual(handler.receive_data_chunk(b"sku,name\n", 0), b"sku,name\n")
+        self.assertIsNone(handler.file_complete(9))
+
+
+@override_settings(LLM_BACKEND="stub")
+class LLMGatewayTests(TestCase):
+    def setUp(self):
+        self.backend = llm.get_backend()
+        self.backend.calls = 0
+
+    def test_descriptions_are_cached_by_normalized_name(self):
+        client = APIClient()
+        first = client.post(reverse("generate_product_description"), {"name": "Trail Shoe"}, format="json")
+        again = client.post(reverse("generate_product_description"), {"name": "  trail   SHOE "}, format="json")
+        self.assertEqual(first.status_code, 200)
+        self.assertEqual(again.data["description"], first.data["description"])
+        self.assertEqual(self.backend.calls, 1)
+        self.assertEqual(GeneratedText.objects.count(), 1)
+
+    def test_concurrent_calls_share_one_upstream_request(self):
+        async def burst():
+            return await asyncio.gather(*[llm.agenerate("Same prompt") for _ in range(5)])
+
+        with mock.patch.object(self.backend, "latency", 0.05):
+            results = asyncio.run(burst())
+        self.assertEqual(len(set(results)), 1)
+        self.assertEqual(self.backend.calls, 1)
+
+    def test_failures_and_timeouts_raise_llm_error(self):
+        with mock.patch.object(self.backend, "generate", side_effect=RuntimeError("quota")):
+            with self.assertRaisesMessage(llm.LLMError, "quota"):
+                llm.generate("Anything")
+            response = APIClient().post(reverse("generate_product_description"), {"name": "Lamp"}, format="json")
+        self.assertEqual(response.status_code, 503)
+
+        with mock.patch.object(self.backend, "latency", 1):
+            with self.assertRaisesMessage(llm.LLMError, "Timed out"):
+                asyncio.run(llm.agenerate("Slow", timeout=0.01))
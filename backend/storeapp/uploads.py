@@ -0,0 +1,181 @@
+"""
+Product image uploads.
+
+``ImageUploadHandler`` sits in front of Django's own upload handlers for
+one form field. While the multipart body streams in, it:
+
+* rejects the request before reading it when ``Content-Length`` alone is
+  already over the limit, and otherwise stops buffering the file as soon
+  as it crosses ``max_bytes`` (the rest of the part is read and discarded);
+* checks the magic bytes of the first chunk, so the type comes from the
+  content rather than the client's ``Content-Type`` or file extension;
+* hashes the content as it goes.
+
+``store_image`` then hands the file to the default storage,
+``ecommerce.media.ContentAddressedStorage``, which names it by that hash
+(``product_images/<sha256>.<ext>``) and stores the same picture only once.
+"""
+import hashlib
+import os
+import posixpath
+import tempfile
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import UploadedFile
+from django.core.files.uploadhandler import FileUploadHandler, SkipFile, StopFutureHandlers
+from django.http import QueryDict
+from django.utils.datastructures import MultiValueDict
+
+
+UPLOAD_DIR = "product_images"
+SIGNATURES = {
+    "image/jpeg": b"\xff\xd8\xff",
+    "image/png": b"\x89PNG\r\n\x1a\n",
+}
+EXTENSIONS = {"image/jpeg": ".jpg", "image/png": ".png"}
+SNIFF_BYTES = max(len(signature) for signature in SIGNATURES.values())
+
+
+def sniff(header):
+    """The content type whose signature ``header`` starts with, or None."""
+    for content_type, signature in SIGNATURES.items():
+        if header.startswith(signature):
+            return content_type
+    return None
+
+
+class HashedUploadedFile(UploadedFile):
+    """An upload whose ``content_type`` was sniffed and whose SHA-256 is known."""
+
+    def __init__(self, file, name, content_type, size, charset, sha256):
+        super().__init__(file, name, content_type, size, charset)
+        self.sha256 = sha256
+
+
+class ImageUploadHandler(FileUploadHandler):
+    """
+    Size-bounded, sniffed and hashed upload of the ``image_field`` file.
+    Problems are collected in ``errors`` (field name -> message) instead of
+    raised, so the view can answer with a normal 400.
+    """
+
+    def __init__(self, request=None, field_name="image", max_bytes=5 * 1024 * 1024, allowed_types=None):
+        super().__init__(request)
+        self.image_field = field_name
+        self.max_bytes = max_bytes
+        self.allowed_types = set(allowed_types or SIGNATURES)
+        self.errors = {}
+        self.active = False
+
+    @property
+    def error(self):
+        return self.errors.get(self.image_field)
+
+    def size_error(self):
+        return f"Image must not be larger than {self.max_bytes // (1024 * 1024)}MB."
+
+    def handle_raw_input(self, input_data, META, content_length, boundary, encoding=None):
+        # Room for the other form fields on top of the image itself
+        limit = self.max_bytes + settings.DATA_UPLOAD_MAX_MEMORY_SIZE
+        if content_length > limit:
+            self.errors[self.image_field] = self.size_error()
+            # Claim the request as parsed so the body is never read
+            return QueryDict(encoding=encoding), MultiValueDict()
+        return None
+
+    def new_file(self, field_name, *args, **kwargs):
+        super().new_file(field_name, *args, **kwargs)
+        self.active = field_name == self.image_field
+        if not self.active:
+            return
+        self.file = tempfile.SpooledTemporaryFile(
+            max_size=settings.FILE_UPLOAD_MAX_MEMORY_SIZE, dir=settings.FILE_UPLOAD_TEMP_DIR
+        )
+        self.digest = hashlib.sha256()
+        self.header = b""
+        self.sniffed_type = None
+        self.size = 0
+        # This handler stores the file; the default ones never see it
+        raise StopFutureHandlers()
+
+    def reject(self, message):
+        self.errors[self.image_field] = message
+        self.file.close()
+        self.active = False
+        raise SkipFile()
+
+    def receive_data_chunk(self, raw_data, start):
+        if not self.active:
+            return raw_data
+
+        self.size += len(raw_data)
+        if self.size > self.max_bytes:
+            self.reject(self.size_error())
+        if self.sniffed_type is None:
+            self.header += raw_data[:SNIFF_BYTES - len(self.header)]
+            if len(self.header) >= SNIFF_BYTES:
+                self.check_type()
+
+        self.digest.update(raw_data)
+        self.file.write(raw_data)
+        return None
+
+    def type_error(self):
+        allowed = ", ".join(sorted(EXTENSIONS[content_type] for content_type in self.allowed_types))
+        return f"Only {allowed} images are allowed."
+
+    def check_type(self):
+        self.sniffed_type = sniff(self.header)
+        if self.sniffed_type not in self.allowed_types:
+            self.reject(self.type_error())
+
+    def file_complete(self, file_size):
+        if not self.active:
+            return None
+        self.active = False
+        if self.sniffed_type is None:
+            # Shorter than the longest signature. SkipFile is not allowed
+            # here, so record the error and let the view refuse the file.
+            self.sniffed_type = sniff(self.header)
+            if self.sniffed_type not in self.allowed_types:
+                self.errors[self.image_field] = self.type_error()
+        self.file.seek(0)
+        return HashedUploadedFile(
+            self.file, self.file_name, self.sniffed_type, file_size, self.charset, self.digest.hexdigest()
+        )
+
+    def upload_interrupted(self):
+        if self.active:
+            self.file.close()
+            self.active = False
+
+
+def accept_image(request, field_name="image", max_bytes=5 * 1024 * 1024, allowed_types=None):
+    """
+    Put an ``ImageUploadHandler`` in front of the request's upload handlers
+    and return it. Must run before ``request.data``/``request.FILES`` is read.
+    """
+    handler = ImageUploadHandler(request, field_name, max_bytes, allowed_types)
+    request.upload_handlers.insert(0, handler)
+    return handler
+
+
+def sniff_file(file):
+    """The sniffed content type of any file object; the position is reset."""
+    file.seek(0)
+    header = file.read(SNIFF_BYTES)
+    file.seek(0)
+    return sniff(header)
+
+
+def store_image(upload, storage=default_storage):
+    """
+    Save ``upload`` in ``UPLOAD_DIR`` and return the storage name. The
+    storage names it by content hash (reusing the ``sha256`` the upload
+    handler computed) and reuses an identical file that is already stored.
+    """
+    content_type = upload.content_type if getattr(upload, "sha256", None) else sniff_file(upload)
+    extension = EXTENSIONS.get(content_type) or os.path.splitext(upload.name or "")[1].lower()
+    # Only the directory and extension of the name are kept
+    return storage.save(posixpath.join(UPLOAD_DIR, f"image{extension}"), upload)
@@ -6,6 +6,8 @@ from . import views
 urlpatterns = [
     path("add_product/", views.add_product, name="add_product"),
     path("generate_product_description/", views.generate_product_description, name="generate_product_description"),
+    path("import_products/", views.import_products, name="import_products"),
+    path("export_products/", views.export_products, name="export_products"),
     path("get_products/", views.get_products, name="get_products"),
     path("get_product/<int:pk>/", views.get_product, name='get_product'),
     path("update_product/<int:pk>/", views.update_product, name="update_product"),
@@ -22,9 +24,12 @@ urlpatterns = [
     path('create_or_update_shipping_info/', views.create_or_update_shipping_info, name="create_or_update_shipping_info"),
     path('initialize_payment/', views.initialize_payment, name='initialize_payment'),
     path('verify_payment/<str:reference>/', views.verify_payment, name='verify-payment'),
+    path('paystack_webhook/', views.paystack_webhook, name='paystack_webhook'),
     path('get_shipping_address/', views.get_shipping_address, name='get_shipping_address'),
     path("analytics/", views.get_analytics_data, name="analytics-data"),
     path("dashboard-stats/", views.admin_dashboard_stats, name="admin-dashboard-stats"),
+    path("cache_stats/", views.get_cache_stats, name="cache_stats"),
+    path("payment_gateway_stats/", views.get_payment_gateway_stats, name="payment_gateway_stats"),
     path("get_user_orders/", views.get_user_orders, name="get_user_orders"),
     path("get_all_orders/", views.get_all_orders, name='get_all_orders'),
     path("update_order_status/<int:pk>/", views.update_order_status, name='update_order_status'),
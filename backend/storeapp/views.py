@@ -1,42 +1,39 @@
-import uuid
 import json
-import requests
-from decimal import Decimal
 from django.shortcuts import get_object_or_404
-from rest_framework.decorators import api_view, permission_classes
+from rest_framework.decorators import api_view, authentication_classes, permission_classes
 from rest_framework.response import Response
 from rest_framework import status
-from google import genai
 from django.conf import settings
-from django.db.models import Q
-from rest_framework.permissions import IsAuthenticated
-from rest_framework.pagination import PageNumberPagination
+from rest_framework.permissions import AllowAny, IsAdminUser, IsAuthenticated
 from django.db.models import Sum, Count, F
 from django.db.models.functions import TruncMonth
 from django.utils.timezone import now
-from django.http import JsonResponse
+from django.http import JsonResponse, StreamingHttpResponse
 from datetime import timedelta
 from django.utils import timezone
 
 
-import os
-
 from storeapp.models import Cart, CartItem, Order, Orderitem, Product, ShippingInfo
+from storeapp.identifiers import product_sku
+from storeapp.search import search_products
+from storeapp import cache as catalog_cache
+from storeapp import bulk, images, llm, payments, uploads, webhooks
+from storeapp.pagination import get_paginator
+from storeapp.checkout import PAID_STATUSES, StockConflict, amount_in_kobo, charge_mismatch, finalize_order, prepare_order
 from storeapp.serializers import CartItemSerializer, CartSerializer, OrderSerializer, ProductSerializer, ShippingInfoSerializer
 
-# Configure Gemini
-client = genai.Client()
-
 
 
 MAX_IMAGE_SIZE_MB = 5
 ALLOWED_IMAGE_TYPES = ['image/jpeg', 'image/png']
-ALLOWED_EXTENSIONS = ['.jpg', '.jpeg', '.png']
 
 FRONTEND_URL = "http://localhost:5173"
 
 @api_view(['POST'])
 def add_product(request):
+    # Size, type (by magic bytes) and hash are handled while the upload streams in
+    upload = uploads.accept_image(request, max_bytes=MAX_IMAGE_SIZE_MB * 1024 * 1024,
+                                  allowed_types=ALLOWED_IMAGE_TYPES)
     name = request.data.get("name")
     description = request.data.get("description")
     category = request.data.get("category")
@@ -47,30 +44,12 @@ def add_product(request):
     image = request.FILES.get("image")
     featured = request.data.get("featured") in ["true", "True", "1"]
 
-
-    if image and image.size > MAX_IMAGE_SIZE_MB * 1024 * 1024:
-            return Response({
-                "error": "Image must not be larger than 5MB."
-            }, status=400)
-
-    # ✅ Validate image type by content type (MIME)
-    if image:
-        content_type = image.content_type
-        ext = os.path.splitext(image.name)[1].lower()
-        if content_type not in ALLOWED_IMAGE_TYPES or ext not in ALLOWED_EXTENSIONS:
-            return Response({
-                "error": "Only .jpg, .jpeg, and .png image types are allowed."
-            }, status=400)
+    if upload.error:
+        return Response({"error": upload.error}, status=400)
 
     # ✅ Generate SKU
-    prefix = category[:3].upper() if category else "GEN"
-    while True:
-        uid = uuid.uuid4().hex[:6].upper()
-        new_sku = f"{prefix}-{uid}"
-        if not Product.objects.filter(sku=new_sku).exists():
-            break
-
-        
+    new_sku = product_sku(category)
+
     product = Product.objects.create(
         name=name,
         category=category,
@@ -78,16 +57,55 @@ def add_product(request):
         price=price,
         quantity=quantity,
         minimumStock=minimumStock,
-        image=image,
+        image=uploads.store_image(image) if image else None,
         sku=new_sku,
         featured = featured
     )
+    catalog_cache.bump_catalog_version()
+    if image:
+        images.schedule_renditions(product)
 
     serializer = ProductSerializer(product)
     return Response(serializer.data)
 
 
 
+@api_view(["POST"])
+@permission_classes([IsAdminUser])
+def import_products(request):
+    """
+    Create or update products in bulk from an uploaded CSV or JSON Lines
+    file (``file``), matching existing products by SKU.
+    """
+    upload = request.FILES.get("file")
+    if upload is None:
+        return Response({"error": "Upload a CSV or JSONL file as 'file'."}, status=status.HTTP_400_BAD_REQUEST)
+
+    file_format = request.query_params.get("file_format") or bulk.format_for(upload.name)
+    if file_format not in bulk.FORMATS:
+        return Response({"error": f"file_format must be one of {', '.join(bulk.FORMATS)}"},
+                        status=status.HTTP_400_BAD_REQUEST)
+
+    report = bulk.import_products(bulk.decode_lines(upload), file_format)
+    return Response(report.as_dict(), status=status.HTTP_200_OK)
+
+
+@api_view(["GET"])
+@permission_classes([IsAdminUser])
+def export_products(request):
+    """Stream the whole catalog as CSV (default) or JSON Lines."""
+    file_format = request.query_params.get("file_format", "csv")
+    if file_format not in bulk.FORMATS:
+        return Response({"error": f"file_format must be one of {', '.join(bulk.FORMATS)}"},
+                        status=status.HTTP_400_BAD_REQUEST)
+
+    content_type = "text/csv" if file_format == "csv" else "application/x-ndjson"
+    response = StreamingHttpResponse(bulk.export_products(file_format=file_format), content_type=content_type)
+    response["Content-Disposition"] = f'attachment; filename="products.{file_format}"'
+    return response
+
+
+
 @api_view(["POST"])
 def generate_product_description(request):
     product_name = request.data.get("name")
@@ -95,60 +113,59 @@ def generate_product_description(request):
     if not product_name:
         return Response({"error": "Product name is required"}, status=status.HTTP_400_BAD_REQUEST)
 
+    name = " ".join(product_name.split())
+    prompt = f"Write a sleek and engaging product description (max 100 words) for a product called '{name}'."
     try:
-        prompt = f"Write a sleek and engaging product description (max 100 words) for a product called '{product_name}'."
+        # Cached per normalized name; concurrent requests share one call
+        description = llm.generate(prompt, model="gemini-2.5-flash", cache=True)
+    except llm.LLMError as e:
+        return Response({"error": str(e)}, status=status.HTTP_503_SERVICE_UNAVAILABLE)
 
+    return Response({
+        "name": product_name,
+        "description": description
+    }, status=status.HTTP_200_OK)
 
-        response = client.models.generate_content(
-        model="gemini-2.5-flash",
-        contents=prompt
-        )
-
-        description = response.text.strip()
-
-        return Response({
-            "name": product_name,
-            "description": description
-        }, status=status.HTTP_200_OK)
-
-    except Exception as e:
-        return Response({"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
-    
 
 
 
 @api_view(['GET'])
 def get_products(request):
     search = request.query_params.get("search")
-    products = Product.objects.all().order_by("-created_at")
+    products = Product.objects.all().order_by("-created_at", "-id")
 
     if search:
-        products = products.filter(Q(name__icontains=search) | Q(category__icontains=search))
-    else:
-        products = products
-    
-    # ✅ Setup pagination
-    paginator = PageNumberPagination()
-    paginator.page_size = 8  # 8 products per page
-    result_page = paginator.paginate_queryset(products, request)
-    
-    serializer = ProductSerializer(result_page, many=True)
-    
-    return paginator.get_paginated_response(serializer.data)
+        products = search_products(products, search)
+
+    def build():
+        # ✅ Setup pagination (8 products per page)
+        paginator = get_paginator(request, 8, ("-created_at", "-id"), ranked=bool(search))
+        result_page = paginator.paginate_queryset(products, request)
+
+        serializer = ProductSerializer(result_page, many=True)
+        return paginator.get_paginated_response(serializer.data).data
+
+    return Response(catalog_cache.get_or_build(
+        "get_products", request.query_params, build, vary=request.build_absolute_uri("/")
+    ))
 
 
 @api_view(['GET'])
 def get_product(request, pk):
-    product = get_object_or_404(Product, id=pk)
-    serializer = ProductSerializer(product)
-    return Response(serializer.data)
+    def build():
+        product = get_object_or_404(Product, id=pk)
+        return ProductSerializer(product).data
+
+    return Response(catalog_cache.get_or_build(f"get_product:{pk}", {}, build))
 
 
 @api_view(['GET'])
 def get_product_by_slug(request, slug):
-    product = get_object_or_404(Product, slug=slug)
-    serializer = ProductSerializer(product)
-    return Response(serializer.data)
+    def build():
+        product = get_object_or_404(Product, slug=slug)
+        return ProductSerializer(product).data
+
+    return Response(catalog_cache.get_or_build(f"get_product_by_slug:{slug}", {}, build))
 
 
 
@@ -159,6 +176,8 @@ def update_product(request, pk):
     except Product.DoesNotExist:
         return Response({"error": "Product not found."}, status=404)
 
+    upload = uploads.accept_image(request, max_bytes=MAX_IMAGE_SIZE_MB * 1024 * 1024,
+                                  allowed_types=ALLOWED_IMAGE_TYPES)
     name = request.data.get("name", product.name)
     description = request.data.get("description", product.description)
     category = request.data.get("category", product.category)
@@ -169,21 +188,10 @@ def update_product(request, pk):
 
     image = request.FILES.get("image", None)
 
-    # ✅ Validate new image if provided
+    if upload.error:
+        return Response({"error": upload.error}, status=400)
     if image:
-        if image.size > MAX_IMAGE_SIZE_MB * 1024 * 1024:
-            return Response({
-                "error": "Image must not be larger than 5MB."
-            }, status=400)
-
-        content_type = image.content_type
-        ext = os.path.splitext(image.name)[1].lower()
-        if content_type not in ALLOWED_IMAGE_TYPES or ext not in ALLOWED_EXTENSIONS:
-            return Response({
-                "error": "Only .jpg, .jpeg, and .png image types are allowed."
-            }, status=400)
-
-        product.image = image  # update image only if provided
+        product.image = uploads.store_image(image)  # update image only if provided
 
     # ✅ Update product fields
     product.name = name
@@ -195,6 +203,9 @@ def update_product(request, pk):
     product.featured = featured
 
     product.save()
+    catalog_cache.bump_catalog_version()
+    if image:
+        images.schedule_renditions(product)
 
     serializer = ProductSerializer(product)
     return Response(serializer.data, status=200)
@@ -209,6 +220,7 @@ def delete_product(request, pk):
 
     product_name = product.name  # keep the name before deleting
     product.delete()
+    catalog_cache.bump_catalog_version()
     return Response(
         {"message": f"Product '{product_name}' has been successfully deleted."},
         status=status.HTTP_204_NO_CONTENT
@@ -230,6 +242,7 @@ def add_to_cart(request):
     cartitem.quantity = 1 
     cartitem.save() 
 
+    cart = Cart.objects.with_items().get(pk=cart.pk)
     serializer = CartSerializer(cart)
     return Response(serializer.data)
 
@@ -264,7 +277,7 @@ def increase_cartitem_quantity(request):
 
     # quantity = int(quantity)
 
-    cartitem = CartItem.objects.get(id=cartitem_id)
+    cartitem = CartItem.objects.select_related("product").get(id=cartitem_id)
     cartitem.quantity += 1
     cartitem.save()
 
@@ -278,7 +291,7 @@ def decrease_cartitem_quantity(request):
 
     # quantity = int(quantity)
 
-    cartitem = CartItem.objects.get(id=cartitem_id)
+    cartitem = CartItem.objects.select_related("product").get(id=cartitem_id)
     cartitem.quantity -= 1
     cartitem.save()
 
@@ -290,7 +303,7 @@ def decrease_cartitem_quantity(request):
 @api_view(['DELETE'])
 def delete_cartitem(request, pk):
     try:
-        cartitem = CartItem.objects.get(id=pk)
+        cartitem = CartItem.objects.select_related("product").get(id=pk)
     except CartItem.DoesNotExist:
         return Response({"error": "Cartitem not found."}, status=status.HTTP_404_NOT_FOUND)
 
@@ -305,9 +318,11 @@ def delete_cartitem(request, pk):
 
 @api_view(["GET"])
 def get_featured_products(request):
-    products = Product.objects.filter(featured=True)
-    serializer = ProductSerializer(products, many=True)
-    return Response(serializer.data)
+    def build():
+        products = Product.objects.filter(featured=True)
+        return ProductSerializer(products, many=True).data
+
+    return Response(catalog_cache.get_or_build("get_featured_products", {}, build))
 
 
 # @api_view(['GET'])
@@ -323,24 +338,28 @@ def get_all_products(request):
     products = Product.objects.all().order_by('-id')  # optional ordering
 
     if search:
-        products = products.filter(Q(name__icontains=search) | Q(description__icontains=search))
+        products = search_products(products, search)
     
     if category == "all":
         products = products
     else:
         products = products.filter(category=category)
 
-    paginator = PageNumberPagination()
-    paginator.page_size = 8  # 8 products per page
-    paginated_products = paginator.paginate_queryset(products, request)
+    def build():
+        paginator = get_paginator(request, 8, ("-id",), ranked=bool(search))  # 8 products per page
+        paginated_products = paginator.paginate_queryset(products, request)
 
-    serializer = ProductSerializer(paginated_products, many=True)
-    return paginator.get_paginated_response(serializer.data)
+        serializer = ProductSerializer(paginated_products, many=True)
+        return paginator.get_paginated_response(serializer.data).data
+
+    return Response(catalog_cache.get_or_build(
+        "get_all_products", request.query_params, build, vary=request.build_absolute_uri("/")
+    ))
 
 
 @api_view(['GET'])
 def get_cart(request, cart_code):
-    cart = get_object_or_404(Cart, cart_code=cart_code)
+    cart = get_object_or_404(Cart.objects.with_items(), cart_code=cart_code)
     serializer = CartSerializer(cart)
     return Response(serializer.data)
 
@@ -404,60 +423,31 @@ def initialize_payment(request):
         return Response({"error": "User email not found"}, status=status.HTTP_400_BAD_REQUEST)
 
     cart = get_object_or_404(Cart, cart_code=cart_code)
-    cartitems = cart.cartitems.all()
-
-    # Compute cart total
-    cart_total = sum([Decimal(item.product.price) * item.quantity for item in cartitems])
-    tax = cart_total * Decimal("0.08")
-    shipping_fee = Decimal("9.99")
-    total_amount = cart_total + tax
-
-    if cart_total <= 50:
-        total_amount = total_amount + shipping_fee
-
-
-    # Create order and order items
-    order, created = Order.objects.get_or_create(user=request.user, cart_code=cart.cart_code)
-    order.total_amount = total_amount
-    order.save()
-
-    for item in cartitems:
-        orderitem, created = Orderitem.objects.get_or_create(order=order, product=item.product)
-        orderitem.quantity = item.quantity
-        orderitem.save()
 
-    amount_in_kobo = int(total_amount * 100)
-
-    url = "https://api.paystack.co/transaction/initialize"
-    headers = {
-        "Authorization": f"Bearer {settings.PAYSTACK_SECRET_KEY}",
-        "Content-Type": "application/json",
-    }
-    payload = {
-        "email": email,
-        "amount": amount_in_kobo,
-        # "currency": "USD",
-        "callback_url": f"{FRONTEND_URL}/payment-status",
-    }
+    # Create or refresh the order and its items from the cart
+    order = prepare_order(request.user, cart)
 
     try:
-        response = requests.post(url, json=payload, headers=headers)
-        data = response.json()
+        response = payments.get_client().initialize_transaction(
+            email=email,
+            amount=amount_in_kobo(order.total_amount),
+            callback_url=f"{FRONTEND_URL}/payment-status",
+        )
+    except payments.PaystackError as e:
+        return Response({"error": str(e)}, status=status.HTTP_503_SERVICE_UNAVAILABLE)
 
-        if response.status_code == 200 and data.get("status"):
-            order.reference = data["data"]["reference"]
-            order.save()
+    data = response.data
+    if response.ok:
+        order.reference = data["data"]["reference"]
+        order.save(update_fields=["reference", "updated_at"])
 
-            return Response({
-                "authorization_url": data["data"]["authorization_url"],
-                "access_code": data["data"]["access_code"],
-                "reference": data["data"]["reference"],
-            }, status=status.HTTP_200_OK)
-
-        return Response(data, status=response.status_code)
+        return Response({
+            "authorization_url": data["data"]["authorization_url"],
+            "access_code": data["data"]["access_code"],
+            "reference": data["data"]["reference"],
+        }, status=status.HTTP_200_OK)
 
-    except requests.exceptions.RequestException as e:
-        return Response({"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+    return Response(data, status=response.status_code)
 
 
 
@@ -467,85 +457,99 @@ def initialize_payment(request):
 def verify_payment(request, reference):
     """
     Verify a Paystack payment and update the order status.
+
+    Answers from the order itself once the webhook has settled it, and only
+    asks Paystack when no webhook has arrived yet.
     """
-    url = f"https://api.paystack.co/transaction/verify/{reference}"
-    headers = {
-        "Authorization": f"Bearer {settings.PAYSTACK_SECRET_KEY}",
-    }
+    order = Order.objects.filter(reference=reference, user=request.user).first()
+    if order is None:
+        return Response({"error": "Order not found"}, status=status.HTTP_404_NOT_FOUND)
 
-    try:
-        response = requests.get(url, headers=headers)
-        data = response.json()
-
-        # Check if Paystack confirms success
-        if response.status_code == 200 and data.get("data", {}).get("status") == "success":
-            try:
-                order = Order.objects.get(reference=reference, user=request.user)
-            except Order.DoesNotExist:
-                return Response({"error": "Order not found"}, status=status.HTTP_404_NOT_FOUND)
-
-            # ✅ Return early if order already marked as successful
-            if order.status == "success":
-                return Response({
-                    "message": "Payment already verified previously",
-                    "reference": reference,
-                    "status": data["data"]["status"]
-                }, status=status.HTTP_200_OK)
-
-            # Mark as paid
-            order.status = "success"
-            order.save()
-
-            # Delete the cart after successful payment
-            cart = Cart.objects.filter(cart_code=order.cart_code).last()
-            if cart:
-                cart.delete()
-            
-            # Mark as paid
-            # order.status = "success"
-            # order.cart_code = ""
-            # order.save()
-
-            # ✅ Subtract quantities only once
-            orderitems = order.orderitems.all()
-            for item in orderitems:
-                if item.product.quantity >= item.quantity:
-                    item.product.quantity -= item.quantity
-                    item.product.save()
+    if order.status not in PAID_STATUSES and webhooks.settle_from_webhook(reference):
+        order.refresh_from_db(fields=["status", "updated_at"])
+    if order.status in PAID_STATUSES:
+        return Response({
+            "message": "Payment already verified previously",
+            "reference": reference,
+            "amount": order.total_amount,
+            "payment_date": order.updated_at,
+            "status": "success",
+        }, status=status.HTTP_200_OK)
 
+    try:
+        response = payments.get_client().verify_transaction(reference)
+    except payments.PaystackError as e:
+        return Response({"error": str(e)}, status=status.HTTP_503_SERVICE_UNAVAILABLE)
+
+    data = response.data
+
+    # Check if Paystack confirms success
+    if response.status_code == 200 and data.get("data", {}).get("status") == "success":
+        # Same check as the webhook: the charge has to cover this order
+        mismatch = charge_mismatch(order, data["data"])
+        if mismatch:
+            return Response({"error": mismatch}, status=status.HTTP_400_BAD_REQUEST)
+
+        # ✅ Flip status, delete the cart and take stock in one transaction;
+        # only the first of several concurrent verifications gets through
+        try:
+            result = finalize_order(order)
+        except StockConflict as e:
+            # Nothing was applied; the client can verify again
+            return Response({"error": str(e)}, status=status.HTTP_409_CONFLICT)
+        if not result.finalized:
             return Response({
-                "message": "Payment verified successfully",
+                "message": "Payment already verified previously",
                 "reference": reference,
-                "amount": data["data"]["amount"] / 100,
-                "currency": data["data"]["currency"],
-                "payment_date": data["data"]["paid_at"],
                 "status": data["data"]["status"]
             }, status=status.HTTP_200_OK)
 
-        return Response({"error": "Payment not successful"}, status=status.HTTP_400_BAD_REQUEST)
+        return Response({
+            "message": "Payment verified successfully",
+            "reference": reference,
+            "amount": data["data"]["amount"] / 100,
+            "currency": data["data"]["currency"],
+            "payment_date": data["data"]["paid_at"],
+            "status": data["data"]["status"],
+            "shortfalls": [shortfall.as_dict() for shortfall in result.shortfalls]
+        }, status=status.HTTP_200_OK)
+
+    return Response({"error": "Payment not successful"}, status=status.HTTP_400_BAD_REQUEST)
 
-    except requests.exceptions.RequestException as e:
-        return Response({"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
+@api_view(["GET"])
+@permission_classes([IsAdminUser])
+def get_payment_gateway_stats(request):
+    """Paystack call latency, error and retry counts and circuit breaker state for this process."""
+    return Response({
+        "breaker": payments.breaker.state,
+        "operations": payments.metrics.as_dict(),
+    })
 
 
 
 
 
-# @api_view(["POST"])
-# # @csrf_exempt
-# def paystack_webhook(request):
-#     event = json.loads(request.body)
-#     if event["event"] == "charge.success":
-#         reference = event["data"]["reference"]
-#         try:
-#             order = Order.objects.get(reference=reference)
-#             order.is_paid = True
-#             order.payment_status = "success"
-#             order.save()
-#         except Order.DoesNotExist:
-#             pass
-#     return Response(status=200)
+
+@api_view(["POST"])
+@authentication_classes([])
+@permission_classes([AllowAny])
+def paystack_webhook(request):
+    """
+    Receive a Paystack event. The event is stored and acknowledged straight
+    away; the order is finalized in the background.
+    """
+    body = request.body
+    if not webhooks.verify_signature(body, request.META.get(webhooks.SIGNATURE_HEADER)):
+        return Response({"error": "Invalid signature"}, status=status.HTTP_401_UNAUTHORIZED)
+
+    try:
+        payload = json.loads(body)
+    except ValueError:
+        return Response({"error": "Invalid payload"}, status=status.HTTP_400_BAD_REQUEST)
+
+    webhooks.record_event(payload)
+    return Response({"received": True}, status=status.HTTP_200_OK)
 
 
 @api_view(['GET'])
@@ -682,14 +686,25 @@ def admin_dashboard_stats(request):
 
 
 
+@api_view(["GET"])
+@permission_classes([IsAdminUser])
+def get_cache_stats(request):
+    """
+    Catalog cache counters for this worker process.
+    """
+    data = catalog_cache.stats.as_dict()
+    data["catalog_version"] = catalog_cache.get_catalog_version()
+    return Response(data)
+
+
+
 @api_view(["GET"])
 @permission_classes([IsAuthenticated])
 def get_user_orders(request):
-    orders = Order.objects.filter(user=request.user).order_by("-created_at")  # latest first
+    orders = Order.objects.with_items().filter(user=request.user).order_by("-created_at", "-id")  # latest first
 
     # Pagination setup
-    paginator = PageNumberPagination()
-    paginator.page_size = 5
+    paginator = get_paginator(request, 5, ("-created_at", "-id"))
     paginated_orders = paginator.paginate_queryset(orders, request)
 
     serializer = OrderSerializer(paginated_orders, many=True)
@@ -704,7 +719,7 @@ def get_all_orders(request):
 
     status = request.query_params.get("status")
     sku = request.query_params.get("sku")
-    orders = Order.objects.all().order_by("-created_at")  # latest first
+    orders = Order.objects.with_items().order_by("-created_at", "-id")  # latest first
 
     if sku:
         sku = sku.strip()
@@ -718,8 +733,7 @@ def get_all_orders(request):
             orders = orders.filter(status=status)
 
     # Pagination setup
-    paginator = PageNumberPagination()
-    paginator.page_size = 10
+    paginator = get_paginator(request, 10, ("-created_at", "-id"))
     paginated_orders = paginator.paginate_queryset(orders, request)
 
     serializer = OrderSerializer(paginated_orders, many=True)
@@ -730,7 +744,7 @@ def get_all_orders(request):
 
 @api_view(['PUT'])
 def update_order_status(request, pk):
-    order = get_object_or_404(Order, id=pk)
+    order = get_object_or_404(Order.objects.with_items(), id=pk)
     status = request.data.get("status", order.status)
     order.status = status 
     order.save()
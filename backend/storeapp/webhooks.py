@@ -0,0 +1,139 @@
+"""
+Paystack webhook ingestion.
+
+The webhook view only checks the signature and stores the event; a
+redelivered event hits the unique ``event_id`` and is dropped. Applying the
+event (finalizing the order) happens after the response, on the background
+runner, and ``manage.py process_payment_events`` drains whatever is left
+behind, e.g. after a restart. Once the webhook has landed, ``verify_payment``
+can answer from the order itself instead of calling Paystack.
+"""
+import hashlib
+import hmac
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from ecommerce import tasks
+from .checkout import charge_mismatch, finalize_order
+from .models import Order, PaymentEvent
+
+
+logger = logging.getLogger(__name__)
+
+SIGNATURE_HEADER = "HTTP_X_PAYSTACK_SIGNATURE"
+HANDLED_EVENTS = {"charge.success"}
+MAX_ATTEMPTS = 5
+
+# An event stuck in "processing" this long belonged to a worker that died
+STALE_AFTER = timedelta(minutes=5)
+
+
+def verify_signature(body, signature, secret_key=None):
+    """Paystack signs the raw body with HMAC-SHA512 keyed by the secret key."""
+    secret_key = secret_key if secret_key is not None else settings.PAYSTACK_SECRET_KEY
+    if not secret_key or not signature:
+        return False
+    expected = hmac.new(secret_key.encode(), body, hashlib.sha512).hexdigest()
+    return hmac.compare_digest(expected, signature)
+
+
+def event_id_for(payload):
+    """Paystack events carry no id of their own; the transaction id is unique per event type."""
+    data = payload.get("data") or {}
+    return f"{payload.get('event')}:{data.get('id') or data.get('reference')}"
+
+
+def record_event(payload):
+    """
+    Store a webhook event and queue it for processing. Returns
+    ``(event, created)``; ``created`` is False for a redelivery.
+    """
+    data = payload.get("data") or {}
+    try:
+        with transaction.atomic():
+            event = PaymentEvent.objects.create(
+                event_id=event_id_for(payload),
+                event=payload.get("event", ""),
+                reference=data.get("reference") or "",
+                payload=payload,
+                status="pending" if payload.get("event") in HANDLED_EVENTS else "ignored",
+            )
+    except IntegrityError:
+        return PaymentEvent.objects.get(event_id=event_id_for(payload)), False
+
+    if event.status == "pending":
+        tasks.submit_on_commit(process_event, event.pk)
+    return event, True
+
+
+def process_event(event_pk):
+    """
+    Apply one pending event. Safe to call from several workers at once:
+    the event is claimed with a conditional UPDATE first.
+    """
+    claimed = PaymentEvent.objects.filter(pk=event_pk, status="pending").update(
+        status="processing", attempts=F("attempts") + 1, updated_at=timezone.now()
+    )
+    if not claimed:
+        return None
+
+    event = PaymentEvent.objects.get(pk=event_pk)
+    try:
+        status, error = apply_charge_success(event)
+    except Exception as exc:
+        logger.exception("Could not apply payment event %s", event.event_id)
+        status = "pending" if event.attempts < MAX_ATTEMPTS else "failed"
+        error = str(exc)
+
+    event.status, event.error = status, error
+    event.save(update_fields=["status", "error", "updated_at"])
+    return event
+
+
+def apply_charge_success(event):
+    data = event.payload.get("data") or {}
+    if data.get("status") != "success":
+        return "ignored", "Charge was not successful"
+
+    order = Order.objects.filter(reference=event.reference).first()
+    if order is None:
+        return "ignored", "No order with this reference"
+
+    mismatch = charge_mismatch(order, data)
+    if mismatch:
+        return "failed", mismatch
+
+    result = finalize_order(order)
+    if result.shortfalls:
+        shortfalls = ", ".join(f"{item.name} ({item.requested}/{item.available})" for item in result.shortfalls)
+        return "processed", f"Stock shortfalls: {shortfalls}"
+    return "processed", ""
+
+
+def process_pending(limit=100):
+    """Process queued events oldest first; returns how many were handled."""
+    PaymentEvent.objects.filter(
+        status="processing", updated_at__lt=timezone.now() - STALE_AFTER
+    ).update(status="pending", updated_at=timezone.now())
+
+    pending = PaymentEvent.objects.filter(status="pending").order_by("received_at", "pk")
+    handled = 0
+    for event_pk in pending.values_list("pk", flat=True)[:limit]:
+        if process_event(event_pk) is not None:
+            handled += 1
+    return handled
+
+
+def settle_from_webhook(reference):
+    """
+    Apply a queued webhook event for ``reference`` right away, so a verify
+    request that races the background runner still sees the paid order.
+    Returns True when an event was applied.
+    """
+    event_pks = PaymentEvent.objects.filter(reference=reference, status="pending").values_list("pk", flat=True)
+    return any([process_event(event_pk) is not None for event_pk in event_pks])
@@ -1,5 +1,7 @@
 from django.contrib import admin
-from .models import SupportRoom, ChatMessage, SupportNotification
+from django.utils import timezone
+
+from .models import SupportRoom, ChatMessage, SupportNotification, DeviceToken, PushMessage
 
 
 @admin.register(SupportRoom)
@@ -22,8 +24,8 @@ class SupportRoomAdmin(admin.ModelAdmin):
 
 @admin.register(ChatMessage)
 class ChatMessageAdmin(admin.ModelAdmin):
-    list_display = ('room', 'sender_type', 'message_preview', 'is_read', 'created_at')
-    list_filter = ('sender_type', 'is_read', 'created_at')
+    list_display = ('room', 'sender_type', 'message_preview', 'created_at')
+    list_filter = ('sender_type', 'created_at')
     search_fields = ('room__room_id', 'message', 'sender__email')
     readonly_fields = ('created_at',)
     ordering = ('-created_at',)
@@ -39,4 +41,29 @@ class SupportNotificationAdmin(admin.ModelAdmin):
     list_filter = ('notification_type', 'is_read', 'created_at')
     search_fields = ('support_agent__email', 'room__room_id', 'message')
     readonly_fields = ('created_at',)
-    ordering = ('-created_at',)
\ No newline at end of file
+    ordering = ('-created_at',)
+
+
+@admin.register(DeviceToken)
+class DeviceTokenAdmin(admin.ModelAdmin):
+    list_display = ('user', 'platform', 'created_at', 'last_seen_at')
+    list_filter = ('platform',)
+    search_fields = ('user__email', 'token')
+    readonly_fields = ('created_at', 'last_seen_at')
+
+
+@admin.register(PushMessage)
+class PushMessageAdmin(admin.ModelAdmin):
+    list_display = ('title', 'status', 'attempts', 'next_attempt_at', 'updated_at')
+    list_filter = ('status', 'created_at')
+    search_fields = ('title', 'token', 'error')
+    readonly_fields = ('created_at', 'updated_at')
+    ordering = ('-created_at',)
+    actions = ['retry_messages']
+
+    @admin.action(description='Retry selected dead messages')
+    def retry_messages(self, request, queryset):
+        retried = queryset.filter(status='dead').update(
+            status='pending', attempts=0, next_attempt_at=timezone.now(), error=''
+        )
+        self.message_user(request, f'{retried} messages queued again.')
@@ -0,0 +1,152 @@
+"""
+Support bot replies for the chat websocket.
+
+The model call never runs on the sync thread pool. ``ChatConsumer`` hands
+each reply to ``spawn`` as an asyncio task, so the customer's socket keeps
+receiving while the bot "types". Tokens are streamed to the room group as
+``chat_message_delta`` events, batched every ``DELTA_INTERVAL`` seconds.
+
+``limiter()`` bounds concurrent generations per event loop
+(``SUPPORT_BOT_CONCURRENCY``) and how many may queue behind them
+(``SUPPORT_BOT_QUEUE``). Past that, replies are refused straight away
+(``Busy``) instead of piling up.
+
+``metrics`` records time to first token, total reply time and the time
+spent in sync (thread pool) calls; ``thread_utilization`` is the share of
+reply time that held a thread.
+"""
+import asyncio
+import threading
+import weakref
+from collections import deque
+from contextlib import asynccontextmanager
+
+from django.conf import settings
+
+
+BOT_MODEL = "gemini-2.0-flash-exp"
+DELTA_INTERVAL = 0.05
+FALLBACK_REPLY = "I'm having trouble processing that. Would you like to speak with a human agent?"
+BUSY_REPLY = "Our assistant is busy right now. An agent will be with you shortly."
+
+
+def build_prompt(context, message_text):
+    return f"""You are a helpful e-commerce customer support bot for an online store.
+
+Previous conversation:
+{context}
+
+Current customer message: {message_text}
+
+Provide a helpful, concise response about:
+- Order status and tracking
+- Product information
+- Returns and refunds
+- Account issues
+- General inquiries
+
+If you cannot fully resolve the issue or the customer seems frustrated,
+politely suggest they can speak to a human agent. Keep responses under 100 words."""
+
+
+class Busy(Exception):
+    """Too many replies are generating or waiting already."""
+
+
+class Limiter:
+    def __init__(self, concurrency, max_waiting):
+        self.concurrency = concurrency
+        self.max_waiting = max_waiting
+        self.semaphore = asyncio.Semaphore(concurrency)
+        self.active = 0
+        self.waiting = 0
+
+    @asynccontextmanager
+    async def slot(self):
+        if self.active >= self.concurrency and self.waiting >= self.max_waiting:
+            raise Busy()
+        self.waiting += 1
+        try:
+            await self.semaphore.acquire()
+        finally:
+            self.waiting -= 1
+        self.active += 1
+        try:
+            yield
+        finally:
+            self.active -= 1
+            self.semaphore.release()
+
+
+# Semaphores belong to their event loop
+_limiters = weakref.WeakKeyDictionary()
+
+
+def limiter():
+    loop = asyncio.get_running_loop()
+    if loop not in _limiters:
+        _limiters[loop] = Limiter(
+            getattr(settings, "SUPPORT_BOT_CONCURRENCY", 4), getattr(settings, "SUPPORT_BOT_QUEUE", 16)
+        )
+    return _limiters[loop]
+
+
+class BotMetrics:
+    def __init__(self, window=1000):
+        self._lock = threading.Lock()
+        self.window = window
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.replies = self.errors = self.rejected = 0
+            self.first_token_ms = deque(maxlen=self.window)
+            self.total_ms = deque(maxlen=self.window)
+            self.sync_ms = deque(maxlen=self.window)
+
+    def record(self, first_token_ms, total_ms, sync_ms, ok=True):
+        with self._lock:
+            self.replies += 1
+            self.errors += 0 if ok else 1
+            if first_token_ms is not None:
+                self.first_token_ms.append(first_token_ms)
+            self.total_ms.append(total_ms)
+            self.sync_ms.append(sync_ms)
+
+    def record_rejected(self):
+        with self._lock:
+            self.rejected += 1
+
+    @staticmethod
+    def percentile(values, fraction):
+        ordered = sorted(values)
+        if not ordered:
+            return None
+        return round(ordered[min(len(ordered) - 1, int(fraction * len(ordered)))], 2)
+
+    def as_dict(self):
+        with self._lock:
+            total = sum(self.total_ms)
+            return {
+                "replies": self.replies,
+                "errors": self.errors,
+                "rejected": self.rejected,
+                "first_token_p50_ms": self.percentile(self.first_token_ms, 0.50),
+                "first_token_p95_ms": self.percentile(self.first_token_ms, 0.95),
+                "total_p50_ms": self.percentile(self.total_ms, 0.50),
+                "total_p95_ms": self.percentile(self.total_ms, 0.95),
+                "thread_utilization": round(sum(self.sync_ms) / total, 3) if total else None,
+            }
+
+
+metrics = BotMetrics()
+
+# Running reply tasks; the event loop only keeps weak references to tasks
+_tasks = set()
+
+
+def spawn(coroutine):
+    task = asyncio.get_running_loop().create_task(coroutine)
+    _tasks.add(task)
+    task.add_done_callback(_tasks.discard)
+    return task
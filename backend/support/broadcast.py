@@ -0,0 +1,40 @@
+"""
+Pushing events from HTTP views to websocket groups.
+
+Events are sent after the transaction commits, so consumers that reload
+state on receipt see the new rows, and they are sent from the support event
+dispatcher (``support.events``), so the request never waits on the channel
+layer. A channel layer that cannot be reached only costs the live update.
+"""
+import logging
+
+from channels.layers import get_channel_layer
+from django.db import transaction
+
+from .events import dispatcher
+
+
+logger = logging.getLogger(__name__)
+
+
+async def group_send(group, event):
+    layer = get_channel_layer()
+    if layer is None:
+        return
+    try:
+        await layer.group_send(group, event)
+    except Exception:
+        logger.warning("Could not send %s to %s", event.get("type"), group, exc_info=True)
+
+
+def group_send_on_commit(group, event):
+    transaction.on_commit(lambda: dispatcher.submit(group_send, group, event))
+
+
+def room_status_changed(room):
+    """Tell the room's chat consumers to reload it (accepted, closed, ...)."""
+    group_send_on_commit(f"chat_{room.room_id}", {
+        "type": "room_status",
+        "status": room.status,
+        "support_agent": room.support_agent.email if room.support_agent_id else None,
+    })
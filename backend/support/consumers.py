@@ -1,25 +1,36 @@
 #websocket consumers
 import json
+import logging
+import time
+import uuid
 from channels.generic.websocket import AsyncWebsocketConsumer
 from channels.db import database_sync_to_async
 from django.contrib.auth import get_user_model
+from django.db import transaction
 from .models import SupportRoom, ChatMessage, SupportNotification
-from google import genai
-from django.conf import settings
+from . import bot, dispatch, history
+from storeapp import llm
 
 User = get_user_model()
-client = genai.Client(api_key=settings.GEMINI_API_KEY)
+logger = logging.getLogger(__name__)
 
 
 class ChatConsumer(AsyncWebsocketConsumer):
+    """
+    The room (with customer and agent) is loaded once on connect and kept in
+    ``self.room``; handlers work from it instead of looking the room up
+    again. Status changes made elsewhere arrive as ``room_status`` group
+    events, which reload it.
+    """
+
     async def connect(self):
         self.room_id = self.scope['url_route']['kwargs']['room_id']
         self.room_group_name = f'chat_{self.room_id}'
         self.user = self.scope['user']
 
         # Verify user has access to this room
-        has_access = await self.verify_room_access()
-        if not has_access:
+        self.room = await self.load_room()
+        if not self.has_room_access():
             await self.close()
             return
 
@@ -50,8 +61,8 @@ class ChatConsumer(AsyncWebsocketConsumer):
         if message_type == 'chat_message':
             message_text = data.get('message')
             
-            # Save message to database
-            message, room = await self.save_message(message_text)
+            # Save message to database (and notify the assigned agent)
+            message = await self.save_message(message_text)
             
             # Broadcast to room group
             await self.channel_layer.group_send(
@@ -66,41 +77,14 @@ class ChatConsumer(AsyncWebsocketConsumer):
                 }
             )
 
-            # If customer sent message and room is pending, get bot response
-            if message['sender_type'] == 'customer' and room['status'] == 'pending':
-                bot_response = await self.get_bot_response(message_text, room)
-                
-                if bot_response:
-                    # Check if needs escalation
-                    needs_escalation = await self.check_escalation(message_text)
-                    
-                    # Save bot message
-                    bot_message = await self.save_bot_message(bot_response)
-                    
-                    # Broadcast bot response
-                    await self.channel_layer.group_send(
-                        self.room_group_name,
-                        {
-                            'type': 'chat_message',
-                            'message': bot_response,
-                            'sender_type': 'bot',
-                            'sender_email': 'AI Assistant',
-                            'timestamp': bot_message['timestamp'],
-                            'message_id': bot_message['id']
-                        }
-                    )
-                    
-                    # If escalation needed, notify agents
-                    if needs_escalation:
-                        await self.notify_all_agents(room)
-
-            # If customer sent message to active room, notify agent
-            elif message['sender_type'] == 'customer' and room['status'] == 'active':
-                await self.notify_assigned_agent(room)
+            # If customer sent message and room is pending, the bot answers
+            # in the background so this socket keeps receiving meanwhile
+            if message['sender_type'] == 'customer' and self.room.status == 'pending':
+                bot.spawn(self.bot_reply(message_text))
 
             # If agent sent message, notify customer
             elif message['sender_type'] == 'agent':
-                await self.notify_customer(room)
+                self.notify_customer()
 
         elif message_type == 'typing':
             # Broadcast typing indicator
@@ -114,8 +98,21 @@ class ChatConsumer(AsyncWebsocketConsumer):
             )
 
         elif message_type == 'mark_read':
-            # Mark messages as read
-            await self.mark_messages_read()
+            # Move the read watermark (to the latest message without "upto")
+            try:
+                upto = history.message_id(data.get('upto'))
+            except (TypeError, ValueError):
+                return
+            await self.mark_messages_read(upto)
+
+        elif message_type == 'resume':
+            # After a reconnect: what was missed since the last message seen
+            try:
+                after = history.message_id(data.get('after'))
+                limit = history.clamp_limit(data.get('limit'))
+            except (TypeError, ValueError):
+                return
+            await self.send(text_data=json.dumps(await self.get_history(after, limit)))
 
     async def chat_message(self, event):
         # Send message to WebSocket
@@ -125,7 +122,19 @@ class ChatConsumer(AsyncWebsocketConsumer):
             'sender_type': event['sender_type'],
             'sender_email': event['sender_email'],
             'timestamp': event['timestamp'],
-            'message_id': event['message_id']
+            'message_id': event['message_id'],
+            # Set on bot replies; replaces the text streamed under this id
+            'stream_id': event.get('stream_id')
+        }))
+
+    async def chat_message_delta(self, event):
+        # Part of a bot reply that is still being generated
+        await self.send(text_data=json.dumps({
+            'type': 'chat_message_delta',
+            'stream_id': event['stream_id'],
+            'delta': event['delta'],
+            'sender_type': 'bot',
+            'sender_email': 'AI Assistant'
         }))
 
     async def typing_indicator(self, event):
@@ -146,27 +155,49 @@ class ChatConsumer(AsyncWebsocketConsumer):
             'room_id': event.get('room_id')
         }))
 
+    async def room_status(self, event):
+        # The room was accepted or closed elsewhere; reload the cached state
+        self.room = await self.load_room()
+        await self.send(text_data=json.dumps({
+            'type': 'room_status',
+            'status': event['status'],
+            'support_agent': event.get('support_agent')
+        }))
+
     @database_sync_to_async
-    def verify_room_access(self):
-        try:
-            room = SupportRoom.objects.get(room_id=self.room_id)
-            return (room.customer == self.user or 
-                    room.support_agent == self.user or 
-                    self.user.is_staff)
-        except SupportRoom.DoesNotExist:
+    def load_room(self):
+        return (SupportRoom.objects
+                .select_related('customer', 'support_agent')
+                .filter(room_id=self.room_id)
+                .first())
+
+    def has_room_access(self):
+        if self.room is None:
             return False
+        return (self.room.customer_id == self.user.id or
+                self.room.support_agent_id == self.user.id or
+                self.user.is_staff)
 
     @database_sync_to_async
     def save_message(self, message_text):
-        room = SupportRoom.objects.get(room_id=self.room_id)
-        sender_type = 'customer' if room.customer == self.user else 'agent'
-        
-        message = ChatMessage.objects.create(
-            room=room,
-            sender=self.user,
-            sender_type=sender_type,
-            message=message_text
-        )
+        room = self.room
+        sender_type = 'customer' if room.customer_id == self.user.id else 'agent'
+
+        with transaction.atomic():
+            message = ChatMessage.objects.create(
+                room=room,
+                sender=self.user,
+                sender_type=sender_type,
+                message=message_text
+            )
+            # If customer sent message to active room, notify agent
+            if sender_type == 'customer' and room.status == 'active' and room.support_agent_id:
+                SupportNotification.objects.create(
+                    support_agent_id=room.support_agent_id,
+                    room=room,
+                    notification_type='message',
+                    message=f'New message from {room.customer.email}'
+                )
         
         return {
             'id': message.id,
@@ -174,17 +205,12 @@ class ChatConsumer(AsyncWebsocketConsumer):
             'sender_type': message.sender_type,
             'sender_email': self.user.email,
             'timestamp': message.created_at.isoformat()
-        }, {
-            'status': room.status,
-            'room_id': room.room_id
         }
 
     @database_sync_to_async
     def save_bot_message(self, message_text):
-        room = SupportRoom.objects.get(room_id=self.room_id)
-        
         message = ChatMessage.objects.create(
-            room=room,
+            room=self.room,
             sender_type='bot',
             message=message_text
         )
@@ -196,45 +222,78 @@ class ChatConsumer(AsyncWebsocketConsumer):
         }
 
     @database_sync_to_async
-    def get_bot_response(self, message_text, room_data):
-        try:
-            room = SupportRoom.objects.get(room_id=room_data['room_id'])
-            previous_messages = ChatMessage.objects.filter(room=room).order_by('-created_at')[:5]
-            
-            context = "\n".join([
-                f"{msg.sender_type}: {msg.message}" 
-                for msg in reversed(previous_messages)
-            ])
-            
-            prompt = f"""You are a helpful e-commerce customer support bot for an online store.
+    def get_bot_context(self):
+        previous_messages = ChatMessage.objects.filter(room_id=self.room.pk).order_by('-created_at')[:5]
 
-Previous conversation:
-{context}
+        return "\n".join([
+            f"{msg.sender_type}: {msg.message}" 
+            for msg in reversed(previous_messages)
+        ])
 
-Current customer message: {message_text}
+    async def send_delta(self, stream_id, delta):
+        await self.channel_layer.group_send(
+            self.room_group_name,
+            {'type': 'chat_message_delta', 'stream_id': stream_id, 'delta': delta}
+        )
 
-Provide a helpful, concise response about:
-- Order status and tracking
-- Product information
-- Returns and refunds
-- Account issues
-- General inquiries
+    async def bot_reply(self, message_text):
+        """Stream a bot reply to the room, then save and broadcast it whole."""
+        stream_id = uuid.uuid4().hex
+        started = time.perf_counter()
+        first_token_ms, sync_ms, ok, busy = None, 0.0, True, False
+        try:
+            async with bot.limiter().slot():
+                sync_started = time.perf_counter()
+                context = await self.get_bot_context()
+                sync_ms += (time.perf_counter() - sync_started) * 1000
+
+                parts, pending, flushed_at = [], [], time.perf_counter()
+                prompt = bot.build_prompt(context, message_text)
+                async for piece in llm.astream(prompt, model=bot.BOT_MODEL):
+                    if first_token_ms is None:
+                        first_token_ms = (time.perf_counter() - started) * 1000
+                    parts.append(piece)
+                    pending.append(piece)
+                    # Batch tokens so a fast stream does not flood the layer
+                    if time.perf_counter() - flushed_at >= bot.DELTA_INTERVAL:
+                        await self.send_delta(stream_id, "".join(pending))
+                        pending, flushed_at = [], time.perf_counter()
+                if pending:
+                    await self.send_delta(stream_id, "".join(pending))
+                bot_response = "".join(parts).strip()
+        except bot.Busy:
+            busy = True
+            bot_response = bot.BUSY_REPLY
+        except Exception:
+            logger.exception("Bot reply failed")
+            ok = False
+            bot_response = bot.FALLBACK_REPLY
+
+        sync_started = time.perf_counter()
+        bot_message = await self.save_bot_message(bot_response)
+        sync_ms += (time.perf_counter() - sync_started) * 1000
+
+        await self.channel_layer.group_send(
+            self.room_group_name,
+            {
+                'type': 'chat_message',
+                'message': bot_response,
+                'sender_type': 'bot',
+                'sender_email': 'AI Assistant',
+                'timestamp': bot_message['timestamp'],
+                'message_id': bot_message['id'],
+                'stream_id': stream_id
+            }
+        )
+        if busy:
+            bot.metrics.record_rejected()
+        else:
+            bot.metrics.record(first_token_ms, (time.perf_counter() - started) * 1000, sync_ms, ok)
 
-If you cannot fully resolve the issue or the customer seems frustrated, 
-politely suggest they can speak to a human agent. Keep responses under 100 words."""
-            
-            response = client.models.generate_content(
-                model="gemini-2.0-flash-exp",
-                contents=prompt
-            )
-            
-            return response.text.strip()
-            
-        except Exception as e:
-            print(f"Bot error: {e}")
-            return "I'm having trouble processing that. Would you like to speak with a human agent?"
+        # If escalation needed, notify agents
+        if self.check_escalation(message_text):
+            await self.notify_all_agents()
 
-    @database_sync_to_async
     def check_escalation(self, message_text):
         escalation_keywords = [
             'speak to human', 'real person', 'agent', 'representative',
@@ -244,52 +303,29 @@ politely suggest they can speak to a human agent. Keep responses under 100 words
         return any(keyword in message_text.lower() for keyword in escalation_keywords)
 
     @database_sync_to_async
-    def notify_all_agents(self, room_data):
-        room = SupportRoom.objects.get(room_id=room_data['room_id'])
-        support_agents = User.objects.filter(is_staff=True, is_active=True)
-        
-        for agent in support_agents:
-            SupportNotification.objects.create(
-                support_agent=agent,
-                room=room,
-                notification_type='new_request',
-                message=f'Customer needs help: {room.customer.email}'
-            )
-
-    @database_sync_to_async
-    def notify_assigned_agent(self, room_data):
-        room = SupportRoom.objects.get(room_id=room_data['room_id'])
-        if room.support_agent:
-            SupportNotification.objects.create(
-                support_agent=room.support_agent,
-                room=room,
-                notification_type='message',
-                message=f'New message from {room.customer.email}'
-            )
+    def notify_all_agents(self):
+        dispatch.notify_agents(
+            self.room, 'new_request', f'Customer needs help: {self.room.customer.email}',
+            push_title='Customer Needs Help', push_body=f'Customer {self.room.customer.email} asked for an agent'
+        )
 
-    @database_sync_to_async
-    def notify_customer(self, room_data):
+    def notify_customer(self):
         # This would integrate with push notification service
         # For now, we'll just log it
-        room = SupportRoom.objects.get(room_id=room_data['room_id'])
-        print(f"Notify customer {room.customer.email}: New message from agent")
+        print(f"Notify customer {self.room.customer.email}: New message from agent")
 
     @database_sync_to_async
-    def mark_messages_read(self):
-        room = SupportRoom.objects.get(room_id=self.room_id)
-        
-        if room.support_agent == self.user:
-            ChatMessage.objects.filter(
-                room=room, 
-                sender_type='customer', 
-                is_read=False
-            ).update(is_read=True)
-        elif room.customer == self.user:
-            ChatMessage.objects.filter(
-                room=room, 
-                sender_type='agent', 
-                is_read=False
-            ).update(is_read=True)
+    def mark_messages_read(self, upto=None):
+        self.room.mark_read(self.user, upto)
+
+    @database_sync_to_async
+    def get_history(self, after, limit):
+        rows, has_more = history.page(self.room, after=after, limit=limit)
+        return {
+            'type': 'history',
+            'messages': [history.message_event(message) for message in rows],
+            'has_more': has_more
+        }
 
 
 class NotificationConsumer(AsyncWebsocketConsumer):
@@ -302,11 +338,12 @@ class NotificationConsumer(AsyncWebsocketConsumer):
         
         self.notification_group_name = f'notifications_{self.user.id}'
         
-        # Join notification group
+        # Join this agent's group and the group shared by all agents
         await self.channel_layer.group_add(
             self.notification_group_name,
             self.channel_name
         )
+        await self.channel_layer.group_add(dispatch.AGENTS_GROUP, self.channel_name)
         await self.accept()
 
     async def disconnect(self, close_code):
@@ -314,6 +351,7 @@ class NotificationConsumer(AsyncWebsocketConsumer):
             self.notification_group_name,
             self.channel_name
         )
+        await self.channel_layer.group_discard(dispatch.AGENTS_GROUP, self.channel_name)
 
     async def receive(self, text_data):
         data = json.loads(text_data)
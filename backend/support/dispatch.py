@@ -0,0 +1,51 @@
+"""
+Notification fan-out to support agents.
+
+``notify_agents`` costs the same whatever the number of agents: one query
+for their ids, one ``bulk_create`` for their ``SupportNotification`` rows,
+one broadcast to the shared ``agents`` group (every staff
+``NotificationConsumer`` is in it) once the transaction commits, and one
+insert into the push outbox, delivered in batches by ``support.push``.
+"""
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.utils import timezone
+
+from . import broadcast, push
+from .models import SupportNotification
+
+
+AGENTS_GROUP = "agents"
+BULK_BATCH_SIZE = 500
+
+
+def agent_ids():
+    return list(get_user_model().objects.filter(is_staff=True, is_active=True).values_list("id", flat=True))
+
+
+def notify_agents(room, notification_type, message, push_title=None, push_body=None):
+    """Notify every active agent about ``room``; returns how many were notified."""
+    ids = agent_ids()
+    if not ids:
+        return 0
+
+    with transaction.atomic():
+        SupportNotification.objects.bulk_create(
+            [
+                SupportNotification(
+                    support_agent_id=agent_id, room=room, notification_type=notification_type, message=message
+                )
+                for agent_id in ids
+            ],
+            batch_size=BULK_BATCH_SIZE,
+        )
+        if push_title:
+            push.enqueue(ids, push_title, push_body or message, {"room_id": room.room_id, "type": notification_type})
+    broadcast.group_send_on_commit(AGENTS_GROUP, {
+        "type": "notification",
+        "notification_type": notification_type,
+        "message": message,
+        "room_id": room.room_id,
+        "timestamp": timezone.now().isoformat(),
+    })
+    return len(ids)
@@ -0,0 +1,77 @@
+"""
+On-commit event bus for support side effects.
+
+Model saves only publish events (see ``support.signals``). An event is held
+until the surrounding transaction commits and dropped if it rolls back.
+Committed events go to ``dispatcher``, one event loop on a daemon thread,
+which runs the async handlers registered with ``@subscribe``. Channel layer
+sends therefore never run on a request or consumer thread, and a failing
+handler is logged without touching the write that produced the event.
+
+With ``BACKGROUND_TASKS_EAGER = True`` handlers run inline on commit, as in
+the tests.
+"""
+import asyncio
+import logging
+import os
+import threading
+from collections import defaultdict
+
+from asgiref.sync import async_to_sync
+from django.conf import settings
+from django.db import transaction
+
+
+logger = logging.getLogger(__name__)
+
+_handlers = defaultdict(list)
+
+
+def subscribe(event):
+    """Register an async handler, called with the event's payload as keyword arguments."""
+    def register(handler):
+        _handlers[event].append(handler)
+        return handler
+    return register
+
+
+def publish(event, **payload):
+    """Run the handlers of ``event`` once the current transaction commits."""
+    if _handlers.get(event):
+        transaction.on_commit(lambda: dispatcher.submit(handle, event, payload))
+
+
+async def handle(event, payload):
+    for handler in list(_handlers[event]):
+        try:
+            await handler(**payload)
+        except Exception:
+            logger.exception("Handler %s for %s failed", handler.__name__, event)
+
+
+class Dispatcher:
+    """Runs coroutines on an event loop of its own, started on first use."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._loop = None
+        self._pid = None
+
+    def get_loop(self):
+        with self._lock:
+            # A forked worker does not inherit the thread running the loop
+            if self._loop is None or self._pid != os.getpid():
+                loop = asyncio.new_event_loop()
+                threading.Thread(target=loop.run_forever, name="support-events", daemon=True).start()
+                self._loop, self._pid = loop, os.getpid()
+            return self._loop
+
+    def submit(self, func, *args):
+        """Schedule ``func(*args)``; returns a ``concurrent.futures.Future`` (None when eager)."""
+        if getattr(settings, "BACKGROUND_TASKS_EAGER", False):
+            async_to_sync(func)(*args)
+            return None
+        return asyncio.run_coroutine_threadsafe(func(*args), self.get_loop())
+
+
+dispatcher = Dispatcher()
@@ -0,0 +1,105 @@
+"""
+In-process fake of the FCM legacy HTTP endpoint (``POST /fcm/send``).
+
+``FakeFCM`` answers multicast requests like FCM would: one result per
+registration id, ``NotRegistered`` for tokens in ``unregistered``,
+``Unavailable`` for those in ``unavailable``, and optional latency and
+failure injection. Use it as an ``httpx`` transport or serve it with
+``FakeFCMServer`` / ``manage.py fake_fcm`` and point ``FCM_URL`` at it to
+benchmark push delivery offline.
+"""
+import asyncio
+import json
+import random
+import threading
+import time
+import uuid
+
+import httpx
+
+from storeapp.fake_paystack import FakePaystackServer
+
+
+class FakeFCM:
+    def __init__(self, latency=0.0, failure_rate=0.0, unavailable_rate=0.0, unregistered=(), unavailable=(),
+                 seed=None):
+        """
+        ``latency`` is seconds added to every request, ``failure_rate`` the
+        share of requests answered with a 503 and ``unavailable_rate`` the
+        share of devices answered with the retryable ``Unavailable`` error.
+        """
+        self.latency = latency
+        self.failure_rate = failure_rate
+        self.unavailable_rate = unavailable_rate
+        self.unregistered = set(unregistered)
+        self.unavailable = set(unavailable)
+        self.random = random.Random(seed)
+        self.calls = 0
+        self.delivered = []
+        self._lock = threading.Lock()
+
+    def handle(self, method, path, body=None):
+        """Return ``(status_code, payload)`` for one request."""
+        with self._lock:
+            self.calls += 1
+            failing = self.random.random() < self.failure_rate
+        if failing:
+            return 503, {"error": "Service temporarily unavailable"}
+        if method != "POST" or path != "/fcm/send":
+            return 404, {"error": "Not found"}
+
+        body = body or {}
+        tokens = body.get("registration_ids") or ([body["to"]] if body.get("to") else [])
+        if not tokens or "notification" not in body:
+            return 400, {"error": "registration_ids and notification are required"}
+
+        results = []
+        with self._lock:
+            for token in tokens:
+                if token in self.unregistered:
+                    results.append({"error": "NotRegistered"})
+                elif token in self.unavailable or self.random.random() < self.unavailable_rate:
+                    results.append({"error": "Unavailable"})
+                else:
+                    self.delivered.append(token)
+                    results.append({"message_id": f"0:{uuid.uuid4().hex}"})
+        success = sum(1 for result in results if "message_id" in result)
+        return 200, {
+            "multicast_id": self.random.getrandbits(63),
+            "success": success,
+            "failure": len(results) - success,
+            "canonical_ids": 0,
+            "results": results,
+        }
+
+    def transport(self):
+        """An ``httpx`` transport for sync clients."""
+        def handler(request):
+            if self.latency:
+                time.sleep(self.latency)
+            return self.respond(request)
+        return httpx.MockTransport(handler)
+
+    def async_transport(self):
+        """An ``httpx`` transport for async clients; latency does not block the loop."""
+        async def handler(request):
+            if self.latency:
+                await asyncio.sleep(self.latency)
+            return self.respond(request)
+        return httpx.MockTransport(handler)
+
+    def respond(self, request):
+        body = json.loads(request.content) if request.content else None
+        status_code, payload = self.handle(request.method, request.url.path, body)
+        return httpx.Response(status_code, json=payload)
+
+
+class FakeFCMServer(FakePaystackServer):
+    """Serves a ``FakeFCM`` over HTTP from a background thread."""
+
+    def __init__(self, fake=None, host="127.0.0.1", port=0):
+        super().__init__(fake or FakeFCM(), host=host, port=port)
+
+    @property
+    def fcm_url(self):
+        return f"{self.base_url}/fcm/send"
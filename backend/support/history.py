@@ -0,0 +1,85 @@
+"""
+Incremental chat history.
+
+Clients keep the id of the newest message they have and ask only for what
+came after it; older messages are paged backwards by id:
+
+* ``?limit=N``: the latest N messages
+* ``?before=<id>&limit=N``: the N messages before ``id``
+* ``?after=<id>&limit=N``: up to N messages after ``id``, oldest first
+
+Every page is ordered oldest first. ``has_more`` says whether another page
+exists in the direction asked for (older for ``before`` and the latest
+page, newer for ``after``). The chat websocket answers
+``{"type": "resume", "after": <id>}`` with the same page, so a client that
+reconnects only fetches what it missed.
+
+Reading is a per-room watermark (``SupportRoom.mark_read``), not a flag per
+message.
+"""
+from .models import ChatMessage
+from .serializers import ChatMessageSerializer
+
+
+DEFAULT_LIMIT = 50
+MAX_LIMIT = 200
+SYNC_PARAMS = ('after', 'before', 'limit')
+
+
+def message_id(value):
+    """A message id from a query parameter or JSON field; None when absent."""
+    if value in (None, ''):
+        return None
+    value = int(value)
+    if value < 0:
+        raise ValueError('Message ids are positive')
+    return value
+
+
+def clamp_limit(value):
+    if value in (None, ''):
+        return DEFAULT_LIMIT
+    return max(1, min(int(value), MAX_LIMIT))
+
+
+def page(room, after=None, before=None, limit=DEFAULT_LIMIT):
+    """``(messages oldest first, has_more)`` for one page of ``room``'s history."""
+    messages = ChatMessage.objects.filter(room_id=room.pk).select_related('sender')
+    if after is not None:
+        rows = list(messages.filter(pk__gt=after).order_by('pk')[:limit + 1])
+        return rows[:limit], len(rows) > limit
+
+    if before is not None:
+        messages = messages.filter(pk__lt=before)
+    rows = list(messages.order_by('-pk')[:limit + 1])
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    rows.reverse()
+    return rows, has_more
+
+
+def read_upto(room):
+    return {'customer': room.customer_read_upto, 'agent': room.agent_read_upto}
+
+
+def response_data(room, rows, has_more):
+    return {
+        'messages': ChatMessageSerializer(rows, many=True, context={'room': room}).data,
+        'has_more': has_more,
+        'read_upto': read_upto(room),
+    }
+
+
+def message_event(message):
+    """A message in the shape of the websocket ``chat_message`` event."""
+    if message.sender_type == 'bot':
+        sender_email = 'AI Assistant'
+    else:
+        sender_email = message.sender.email if message.sender_id else None
+    return {
+        'message': message.message,
+        'sender_type': message.sender_type,
+        'sender_email': sender_email,
+        'timestamp': message.created_at.isoformat(),
+        'message_id': message.id,
+    }
@@ -0,0 +1,39 @@
+import asyncio
+from datetime import timedelta
+
+from asgiref.sync import sync_to_async
+from django.core.management.base import BaseCommand, CommandError
+
+from support import push
+
+
+class Command(BaseCommand):
+    help = "Deliver queued push notifications (run with --loop as a worker)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--limit", type=int, default=push.CLAIM_LIMIT, help="Messages claimed per round.")
+        parser.add_argument("--concurrency", type=int, default=push.CONCURRENCY, help="FCM requests in flight.")
+        parser.add_argument("--loop", action="store_true", help="Keep polling for new messages.")
+        parser.add_argument("--interval", type=float, default=2.0, help="Seconds between polls with --loop.")
+        parser.add_argument("--keep-days", type=int, default=7, help="Days delivered messages are kept.")
+
+    def handle(self, *args, **options):
+        if not push.enabled():
+            raise CommandError("FCM_SERVER_KEY is not set.")
+        asyncio.run(self.run(options))
+
+    async def run(self, options):
+        # One worker, and so one connection pool, for the life of the process
+        async with push.PushWorker(concurrency=options["concurrency"]) as worker:
+            while True:
+                stats = await worker.drain(options["limit"])
+                if stats.requests:
+                    self.stdout.write(
+                        f"Sent {stats.sent}, retrying {stats.retried}, dead {stats.dead} "
+                        f"({stats.requests} requests)."
+                    )
+                if not options["loop"]:
+                    break
+                if not stats.requests:
+                    await sync_to_async(push.prune)(timedelta(days=options["keep_days"]))
+                    await asyncio.sleep(options["interval"])
@@ -0,0 +1,31 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from support.fake_fcm import FakeFCM, FakeFCMServer
+
+
+class Command(BaseCommand):
+    help = "Serve a local fake of the FCM send endpoint (set FCM_URL to the address it prints)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--port", type=int, default=8766)
+        parser.add_argument("--latency-ms", type=float, default=0.0, help="Delay added to every request.")
+        parser.add_argument("--failure-rate", type=float, default=0.0, help="Share of requests answered with a 503.")
+        parser.add_argument(
+            "--unavailable-rate", type=float, default=0.0, help="Share of devices answered with Unavailable."
+        )
+
+    def handle(self, *args, **options):
+        fake = FakeFCM(
+            latency=options["latency_ms"] / 1000,
+            failure_rate=options["failure_rate"],
+            unavailable_rate=options["unavailable_rate"],
+        )
+        with FakeFCMServer(fake, port=options["port"]) as server:
+            self.stdout.write(self.style.SUCCESS(f"Fake FCM listening on {server.fcm_url}"))
+            try:
+                while True:
+                    time.sleep(3600)
+            except KeyboardInterrupt:
+                self.stdout.write(f"Stopped after {fake.calls} requests, {len(fake.delivered)} devices reached.")
@@ -0,0 +1,54 @@
+# Generated by Django 5.2.6 on 2026-10-16 23:53
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def fill_counters(apps, schema_editor):
+    """Same as support.models.recount_rooms, with the historical models."""
+    SupportRoom = apps.get_model('support', 'SupportRoom')
+    ChatMessage = apps.get_model('support', 'ChatMessage')
+    messages = ChatMessage.objects.filter(room=OuterRef('pk')).order_by()
+
+    def count(queryset):
+        return Coalesce(Subquery(queryset.values('room').annotate(n=Count('pk')).values('n')[:1]), 0)
+
+    SupportRoom.objects.update(
+        message_count=count(messages),
+        customer_unread=count(messages.filter(sender_type='agent', is_read=False)),
+        agent_unread=count(messages.filter(sender_type='customer', is_read=False)),
+        last_message=Subquery(messages.order_by('-created_at', '-pk').values('pk')[:1]),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('support', '0002_device_tokens_push_outbox'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='supportroom',
+            name='agent_unread',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='supportroom',
+            name='customer_unread',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='supportroom',
+            name='last_message',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='support.chatmessage'),
+        ),
+        migrations.AddField(
+            model_name='supportroom',
+            name='message_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(fill_counters, migrations.RunPython.noop),
+    ]
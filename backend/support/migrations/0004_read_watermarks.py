@@ -0,0 +1,45 @@
+# Generated by Django 5.2.6 on 2026-10-16 23:59
+
+from django.db import migrations, models
+from django.db.models import Max, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def fill_watermarks(apps, schema_editor):
+    # Each side has read up to the newest of the other side's messages it had marked read
+    SupportRoom = apps.get_model('support', 'SupportRoom')
+    ChatMessage = apps.get_model('support', 'ChatMessage')
+
+    def newest_read(sender_type):
+        read = ChatMessage.objects.filter(room=OuterRef('pk'), sender_type=sender_type, is_read=True).order_by()
+        return Coalesce(Subquery(read.values('room').annotate(upto=Max('pk')).values('upto')[:1]), 0)
+
+    SupportRoom.objects.update(
+        customer_read_upto=newest_read('agent'),
+        agent_read_upto=newest_read('customer'),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('support', '0003_room_message_counters'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='supportroom',
+            name='agent_read_upto',
+            field=models.PositiveBigIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='supportroom',
+            name='customer_read_upto',
+            field=models.PositiveBigIntegerField(default=0),
+        ),
+        migrations.RunPython(fill_watermarks, migrations.RunPython.noop),
+        migrations.RemoveField(
+            model_name='chatmessage',
+            name='is_read',
+        ),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 5.2.6 on 2026-10-17 00:03
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('support', '0004_read_watermarks'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='chatmessage',
+            index=models.Index(fields=['room', 'sender_type', 'id'], name='support_cha_room_id_c6544a_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='chatmessage',
+            index=models.Index(fields=['room', 'created_at'], name='support_cha_room_id_eb43ad_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='supportnotification',
+            index=models.Index(condition=models.Q(('is_read', False)), fields=['support_agent', '-created_at'], name='notification_unread_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='supportroom',
+            index=models.Index(fields=['status', '-created_at'], name='support_sup_status_3639e0_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='supportroom',
+            index=models.Index(fields=['support_agent', '-created_at'], name='support_sup_support_853918_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='supportroom',
+            index=models.Index(fields=['customer', 'status'], name='support_sup_custome_13fcbe_idx'),
+        ),
+    ]
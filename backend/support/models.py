@@ -1,9 +1,53 @@
 # backend/support/models.py
-from django.db import models
+from django.db import models, transaction
+from django.db.models import Count, Exists, F, OuterRef, Q, Subquery
+from django.db.models.functions import Coalesce
 from django.conf import settings
+from django.utils import timezone
 import uuid
 
-class SupportRoom(models.Model):
+
+class TrackedFieldsMixin:
+    """
+    Remembers the values of ``tracked_fields`` (attnames) as they were
+    loaded or last saved, so ``post_save`` receivers can tell what a save
+    changed without reading the old row again. ``QuerySet.update`` bypasses
+    this, as it bypasses signals.
+    """
+    tracked_fields = ()
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance.remember_loaded()
+        return instance
+
+    def remember_loaded(self):
+        # Deferred fields are not known, so they never count as changed
+        self._loaded = {name: self.__dict__[name] for name in self.tracked_fields if name in self.__dict__}
+
+    def loaded_value(self, name, default=None):
+        return getattr(self, '_loaded', {}).get(name, default)
+
+    def has_changed(self, name):
+        loaded = getattr(self, '_loaded', {})
+        return name in loaded and loaded[name] != getattr(self, name)
+
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        self.remember_loaded()
+
+
+class SupportRoom(TrackedFieldsMixin, models.Model):
+    """
+    ``message_count``, ``customer_unread``, ``agent_unread`` and
+    ``last_message`` are maintained by ``ChatMessage.save`` and
+    ``mark_read`` with F() updates, so listing rooms needs no per-room
+    queries. ``customer_read_upto`` and ``agent_read_upto`` are read
+    watermarks: each side has read the other's messages up to that id.
+    ``save()`` leaves all of these alone unless they are named in
+    ``update_fields``; ``recount_rooms`` rebuilds the counters.
+    """
     STATUS_CHOICES = (
         ('active', 'Active'),
         ('resolved', 'Resolved'),
@@ -29,17 +73,82 @@ class SupportRoom(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     resolved_at = models.DateTimeField(null=True, blank=True)
+    message_count = models.PositiveIntegerField(default=0)
+    customer_unread = models.PositiveIntegerField(default=0)
+    agent_unread = models.PositiveIntegerField(default=0)
+    last_message = models.ForeignKey(
+        'ChatMessage',
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='+'
+    )
+    customer_read_upto = models.PositiveBigIntegerField(default=0)
+    agent_read_upto = models.PositiveBigIntegerField(default=0)
+
+    tracked_fields = ('status', 'support_agent_id')
+    COUNTER_FIELDS = (
+        'message_count', 'customer_unread', 'agent_unread', 'last_message',
+        'customer_read_upto', 'agent_read_upto',
+    )
     
     def save(self, *args, **kwargs):
         if not self.room_id:
             self.room_id = f"room_{uuid.uuid4().hex[:12]}"
+        if not self._state.adding and not args and kwargs.get('update_fields') is None:
+            # A stale instance must not overwrite counters bumped since it was loaded
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name not in self.COUNTER_FIELDS
+            ]
         super().save(*args, **kwargs)
+
+    def unread_for(self, user):
+        if self.support_agent_id == user.id:
+            return self.agent_unread
+        if self.customer_id == user.id:
+            return self.customer_unread
+        return 0
+
+    def mark_read(self, user, upto=None):
+        """
+        Move ``user``'s read watermark up to message ``upto`` (the latest
+        message when None) and recount their unread messages, in a single
+        UPDATE of this row. Returns False when the watermark did not move:
+        not a participant, ``upto`` not in this room, or already read.
+        """
+        if self.support_agent_id == user.id:
+            sender_type, watermark, counter = 'customer', 'agent_read_upto', 'agent_unread'
+        elif self.customer_id == user.id:
+            sender_type, watermark, counter = 'agent', 'customer_read_upto', 'customer_unread'
+        else:
+            return False
+
+        messages = ChatMessage.objects.filter(room_id=self.pk).order_by()
+        rooms = SupportRoom.objects.filter(pk=self.pk)
+        if upto is None:
+            latest = Subquery(messages.order_by('-pk').values('pk')[:1])
+            moved = rooms.filter(**{f'{watermark}__lt': latest}).update(**{watermark: latest, counter: 0})
+        else:
+            unread = messages.filter(sender_type=sender_type, pk__gt=upto)
+            moved = rooms.filter(Exists(messages.filter(pk=upto)), **{f'{watermark}__lt': upto}).update(**{
+                watermark: upto,
+                counter: Coalesce(Subquery(unread.values('room').annotate(n=Count('pk')).values('n')[:1]), 0),
+            })
+        return bool(moved)
     
     def __str__(self):
         return f"{self.room_id} - {self.customer.email}"
     
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            # The pending queue and an agent's rooms, newest first
+            models.Index(fields=['status', '-created_at']),
+            models.Index(fields=['support_agent', '-created_at']),
+            # A customer's open room
+            models.Index(fields=['customer', 'status']),
+        ]
 
 
 class ChatMessage(models.Model):
@@ -58,14 +167,33 @@ class ChatMessage(models.Model):
     )
     sender_type = models.CharField(max_length=20, choices=SENDER_TYPES)
     message = models.TextField()
-    is_read = models.BooleanField(default=False)
     created_at = models.DateTimeField(auto_now_add=True)
+
+    # Which room counter a new message bumps, by sender
+    UNREAD_COUNTERS = {'customer': 'agent_unread', 'agent': 'customer_unread'}
     
     def __str__(self):
         return f"{self.sender_type}: {self.message[:50]}"
+
+    def save(self, *args, **kwargs):
+        adding = self._state.adding
+        with transaction.atomic(savepoint=False):
+            super().save(*args, **kwargs)
+            if adding:
+                updates = {'message_count': F('message_count') + 1, 'last_message': self}
+                counter = self.UNREAD_COUNTERS.get(self.sender_type)
+                if counter:
+                    updates[counter] = F(counter) + 1
+                SupportRoom.objects.filter(pk=self.room_id).update(**updates)
     
     class Meta:
         ordering = ['created_at']
+        indexes = [
+            # Unread counts: one side's messages past a read watermark
+            models.Index(fields=['room', 'sender_type', 'id']),
+            # The full history and the recent messages given to the bot
+            models.Index(fields=['room', 'created_at']),
+        ]
 
 
 class SupportNotification(models.Model):
@@ -91,4 +219,84 @@ class SupportNotification(models.Model):
         return f"{self.notification_type} - {self.room.room_id}"
     
     class Meta:
-        ordering = ['-created_at']
\ No newline at end of file
+        ordering = ['-created_at']
+        indexes = [
+            # An agent's unread notifications, newest first
+            models.Index(
+                fields=['support_agent', '-created_at'],
+                condition=Q(is_read=False),
+                name='notification_unread_idx',
+            ),
+        ]
+
+
+class DeviceToken(models.Model):
+    PLATFORMS = (
+        ('web', 'Web'),
+        ('android', 'Android'),
+        ('ios', 'iOS'),
+    )
+
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='device_tokens'
+    )
+    token = models.CharField(max_length=255, unique=True)
+    platform = models.CharField(max_length=20, choices=PLATFORMS, default='web')
+    created_at = models.DateTimeField(auto_now_add=True)
+    last_seen_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.platform} device of {self.user_id}"
+
+
+class PushMessage(models.Model):
+    """
+    Outbox of push notifications, one row per device. Rows are written in
+    the same transaction as whatever they announce and the push worker
+    (``support.push``) drains them.
+    """
+    STATUS = (
+        ('pending', 'Pending'),
+        ('sending', 'Sending'),
+        ('sent', 'Sent'),
+        ('dead', 'Dead'),
+    )
+
+    token = models.CharField(max_length=255)
+    title = models.CharField(max_length=255)
+    body = models.TextField()
+    data = models.JSONField(default=dict, blank=True)
+    status = models.CharField(max_length=20, choices=STATUS, default='pending')
+    attempts = models.PositiveIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    claim = models.CharField(max_length=32, blank=True)
+    error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.title} ({self.status})"
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'next_attempt_at']),
+            models.Index(fields=['claim']),
+        ]
+
+
+def recount_rooms(rooms=None):
+    """Rebuild the message counters of ``rooms`` (all rooms by default) in one UPDATE."""
+    rooms = SupportRoom.objects.all() if rooms is None else rooms
+    messages = ChatMessage.objects.filter(room=OuterRef('pk')).order_by()
+
+    def count(queryset):
+        return Coalesce(Subquery(queryset.values('room').annotate(n=Count('pk')).values('n')[:1]), 0)
+
+    return rooms.update(
+        message_count=count(messages),
+        customer_unread=count(messages.filter(sender_type='agent', pk__gt=OuterRef('customer_read_upto'))),
+        agent_unread=count(messages.filter(sender_type='customer', pk__gt=OuterRef('agent_read_upto'))),
+        last_message=Subquery(messages.order_by('-created_at', '-pk').values('pk')[:1]),
+    )
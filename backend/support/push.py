@@ -0,0 +1,273 @@
+"""
+Push notifications through Firebase Cloud Messaging.
+
+Nothing talks to FCM on the request path. ``enqueue`` writes one
+``PushMessage`` per registered device of the given users, in the caller's
+transaction, and kicks the worker on the background runner once it commits.
+
+``PushWorker`` drains that outbox. It claims due rows and groups identical
+notifications into multicast requests of up to ``BATCH_SIZE`` devices. It
+sends ``concurrency`` of those at a time over one pooled
+``httpx.AsyncClient`` and records the result of every device:
+
+* Transient failures (timeouts, 429/5xx, ``Unavailable``) are retried with
+  exponential backoff.
+* After ``MAX_ATTEMPTS``, or on a permanent error, the row is dead-lettered
+  (``status="dead"``, the error kept for inspection).
+* Tokens FCM reports as unregistered are deleted.
+
+``manage.py deliver_pushes --loop`` runs the worker and picks up retries and
+anything a dying process left behind. Point ``FCM_URL`` at
+``support.fake_fcm`` (``manage.py fake_fcm``) to run delivery offline;
+``manage.py benchmark_pushes`` measures its throughput that way.
+"""
+import asyncio
+import json
+import logging
+import random
+import uuid
+from dataclasses import dataclass
+from datetime import timedelta
+from itertools import chain
+
+import httpx
+from asgiref.sync import async_to_sync, sync_to_async
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from ecommerce import tasks
+from .models import DeviceToken, PushMessage
+
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_FCM_URL = "https://fcm.googleapis.com/fcm/send"
+BATCH_SIZE = 1000
+CLAIM_LIMIT = 5000
+CONCURRENCY = 4
+MAX_ATTEMPTS = 5
+BACKOFF_BASE = 30.0
+BACKOFF_CAP = 3600.0
+
+# A message stuck in "sending" this long belonged to a worker that died
+STALE_AFTER = timedelta(minutes=5)
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+RETRY_ERRORS = {"Unavailable", "InternalServerError", "DeviceMessageRateExceeded"}
+UNREGISTERED_ERRORS = {"NotRegistered", "InvalidRegistration"}
+
+SENT, RETRY, DEAD = "sent", "retry", "dead"
+
+
+def enabled():
+    return bool(settings.FCM_SERVER_KEY)
+
+
+def fcm_url():
+    return getattr(settings, "FCM_URL", None) or DEFAULT_FCM_URL
+
+
+def enqueue(user_ids, title, body, data=None):
+    """Queue a push to every device of ``user_ids``; returns how many were queued."""
+    if not enabled():
+        return 0
+    tokens = list(DeviceToken.objects.filter(user_id__in=user_ids).values_list("token", flat=True))
+    if not tokens:
+        return 0
+    PushMessage.objects.bulk_create(
+        [PushMessage(token=token, title=title, body=body, data=data or {}) for token in tokens],
+        batch_size=500,
+    )
+    tasks.submit_on_commit(deliver_pending)
+    return len(tokens)
+
+
+# ---- Outbox ----
+
+def claim(limit=CLAIM_LIMIT):
+    """Mark up to ``limit`` due messages as ours and return them."""
+    now = timezone.now()
+    PushMessage.objects.filter(status="sending", updated_at__lt=now - STALE_AFTER).update(
+        status="pending", claim="", updated_at=now
+    )
+    due = (
+        PushMessage.objects.filter(status="pending", next_attempt_at__lte=now)
+        .order_by("next_attempt_at", "pk").values("pk")[:limit]
+    )
+    claim_id = uuid.uuid4().hex
+    # Only rows still pending are taken, so concurrent workers never share one
+    PushMessage.objects.filter(pk__in=due, status="pending").update(
+        status="sending", claim=claim_id, attempts=F("attempts") + 1, updated_at=now
+    )
+    return list(PushMessage.objects.filter(claim=claim_id).order_by("pk"))
+
+
+def backoff(attempts):
+    """Seconds before retry number ``attempts``: doubling, capped, with jitter."""
+    delay = min(BACKOFF_CAP, BACKOFF_BASE * 2 ** (attempts - 1))
+    return delay / 2 + random.uniform(0, delay / 2)
+
+
+@dataclass
+class DeliveryStats:
+    requests: int = 0
+    sent: int = 0
+    retried: int = 0
+    dead: int = 0
+
+    def add(self, other):
+        for name in self.__dict__:
+            setattr(self, name, getattr(self, name) + getattr(other, name))
+
+    def as_dict(self):
+        return dict(self.__dict__)
+
+
+def record(outcomes, max_attempts=MAX_ATTEMPTS):
+    """Store ``[(message, outcome, error)]`` from a delivery round."""
+    stats = DeliveryStats()
+    now = timezone.now()
+    sent, changed, unregistered = [], [], []
+    for message, outcome, error in outcomes:
+        if outcome == SENT:
+            sent.append(message.pk)
+            continue
+        if outcome == RETRY and message.attempts < max_attempts:
+            message.status = "pending"
+            message.next_attempt_at = now + timedelta(seconds=backoff(message.attempts))
+            stats.retried += 1
+        else:
+            message.status = "dead"
+            stats.dead += 1
+            if error in UNREGISTERED_ERRORS:
+                unregistered.append(message.token)
+        message.error, message.claim, message.updated_at = error, "", now
+        changed.append(message)
+
+    with transaction.atomic():
+        if sent:
+            PushMessage.objects.filter(pk__in=sent).update(status="sent", claim="", error="", updated_at=now)
+        if changed:
+            PushMessage.objects.bulk_update(
+                changed, ["status", "next_attempt_at", "error", "claim", "updated_at"], batch_size=500
+            )
+        if unregistered:
+            DeviceToken.objects.filter(token__in=unregistered).delete()
+    stats.sent = len(sent)
+    return stats
+
+
+def prune(older_than=timedelta(days=7)):
+    """Delete delivered messages older than ``older_than``; dead ones are kept."""
+    deleted, _ = PushMessage.objects.filter(status="sent", updated_at__lt=timezone.now() - older_than).delete()
+    return deleted
+
+
+def batches(messages, size=BATCH_SIZE):
+    """Group messages with the same content into multicast batches."""
+    groups = {}
+    for message in messages:
+        key = (message.title, message.body, json.dumps(message.data, sort_keys=True))
+        groups.setdefault(key, []).append(message)
+    return [group[start:start + size] for group in groups.values() for start in range(0, len(group), size)]
+
+
+# ---- Delivery ----
+
+def make_client():
+    return httpx.AsyncClient(
+        timeout=httpx.Timeout(10.0, connect=3.0),
+        limits=httpx.Limits(max_connections=CONCURRENCY * 2, max_keepalive_connections=CONCURRENCY),
+    )
+
+
+class PushWorker:
+    """Delivers the outbox over one pooled client; use as an async context manager."""
+
+    def __init__(self, client=None, batch_size=BATCH_SIZE, concurrency=CONCURRENCY, max_attempts=MAX_ATTEMPTS):
+        self.client = client
+        self.owns_client = client is None
+        self.batch_size = batch_size
+        self.concurrency = concurrency
+        self.max_attempts = max_attempts
+
+    async def __aenter__(self):
+        if self.client is None:
+            self.client = make_client()
+        return self
+
+    async def __aexit__(self, *exc_info):
+        if self.owns_client:
+            await self.client.aclose()
+            self.client = None
+
+    async def drain(self, limit=CLAIM_LIMIT):
+        """Deliver everything that is due, ``limit`` messages per round."""
+        total = DeliveryStats()
+        while True:
+            messages = await sync_to_async(claim)(limit)
+            if not messages:
+                return total
+            total.add(await self.deliver(messages))
+            if len(messages) < limit:
+                return total
+
+    async def deliver(self, messages):
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def send(batch):
+            async with semaphore:
+                return await self.send(batch)
+
+        groups = batches(messages, self.batch_size)
+        outcomes = await asyncio.gather(*(send(batch) for batch in groups))
+        stats = await sync_to_async(record)(list(chain.from_iterable(outcomes)), self.max_attempts)
+        stats.requests = len(groups)
+        return stats
+
+    async def send(self, messages):
+        """One multicast request; returns ``[(message, outcome, error)]``."""
+        first = messages[0]
+        payload = {
+            "registration_ids": [message.token for message in messages],
+            "notification": {"title": first.title, "body": first.body, "icon": "/icon.png"},
+            "data": first.data,
+        }
+        headers = {"Authorization": f"key={settings.FCM_SERVER_KEY}"}
+        try:
+            response = await self.client.post(fcm_url(), json=payload, headers=headers)
+        except httpx.HTTPError as error:
+            logger.warning("FCM request for %d devices failed: %s", len(messages), error)
+            return [(message, RETRY, f"{type(error).__name__}: {error}") for message in messages]
+
+        if response.status_code != 200:
+            outcome = RETRY if response.status_code in RETRY_STATUSES else DEAD
+            return [(message, outcome, f"HTTP {response.status_code}") for message in messages]
+        try:
+            results = response.json()["results"]
+        except (ValueError, KeyError, TypeError):
+            return [(message, RETRY, "Malformed FCM response") for message in messages]
+
+        outcomes = []
+        for index, message in enumerate(messages):
+            result = results[index] if index < len(results) else {"error": "Unavailable"}
+            error = result.get("error")
+            if not error:
+                outcomes.append((message, SENT, ""))
+            else:
+                outcomes.append((message, RETRY if error in RETRY_ERRORS else DEAD, error))
+        return outcomes
+
+
+def deliver_pending(limit=CLAIM_LIMIT):
+    """Drain the outbox from sync code (the background runner)."""
+    if not enabled():
+        return DeliveryStats()
+
+    async def run():
+        async with PushWorker() as worker:
+            return await worker.drain(limit)
+
+    return async_to_sync(run)()
@@ -1,3 +1,5 @@
+from django.urls import re_path
+
 from . import consumers
 
 websocket_urlpatterns = [
@@ -9,7 +9,9 @@ class UserBasicSerializer(serializers.ModelSerializer):
 
 
 class ChatMessageSerializer(serializers.ModelSerializer):
+    """Pass the room as ``context['room']``: ``is_read`` comes from its read watermarks."""
     sender_info = UserBasicSerializer(source='sender', read_only=True)
+    is_read = serializers.SerializerMethodField()
     
     class Meta:
         model = ChatMessage
@@ -18,8 +20,18 @@ class ChatMessageSerializer(serializers.ModelSerializer):
             'message', 'is_read', 'created_at'
         ]
 
+    def get_is_read(self, obj):
+        room = self.context.get('room') or obj.room
+        if obj.sender_type == 'customer':
+            return obj.id <= room.agent_read_upto
+        return obj.id <= room.customer_read_upto
+
 
 class SupportRoomSerializer(serializers.ModelSerializer):
+    """
+    Reads only the room's own counters and ``last_message``; list views
+    select_related customer, support_agent and last_message.
+    """
     customer_info = UserBasicSerializer(source='customer', read_only=True)
     agent_info = UserBasicSerializer(source='support_agent', read_only=True)
     unread_count = serializers.SerializerMethodField()
@@ -31,23 +43,17 @@ class SupportRoomSerializer(serializers.ModelSerializer):
             'id', 'room_id', 'customer', 'customer_info',
             'support_agent', 'agent_info', 'status', 'subject',
             'created_at', 'updated_at', 'resolved_at',
-            'unread_count', 'last_message'
+            'message_count', 'unread_count', 'last_message'
         ]
     
     def get_unread_count(self, obj):
         request = self.context.get('request')
         if not request:
             return 0
-        
-        user = request.user
-        if obj.support_agent == user:
-            return obj.messages.filter(sender_type='customer', is_read=False).count()
-        elif obj.customer == user:
-            return obj.messages.filter(sender_type='agent', is_read=False).count()
-        return 0
+        return obj.unread_for(request.user)
     
     def get_last_message(self, obj):
-        last_msg = obj.messages.last()
+        last_msg = obj.last_message
         if last_msg:
             return {
                 'message': last_msg.message,
@@ -1 +1,41 @@
-# django signals
\ No newline at end of file
+"""
+post_save receivers for support models. They compare against the values
+the room was loaded with (``TrackedFieldsMixin``) instead of re-reading it,
+and only queue work: see ``support.notifications`` and ``support.events``.
+"""
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+
+from . import broadcast
+from .models import SupportRoom, ChatMessage
+from .notifications import notify_agent_joined, notify_new_message, notify_room_closed
+
+
+CLOSED_STATUSES = ('resolved', 'closed')
+
+
+@receiver(post_save, sender=SupportRoom)
+def room_status_changed(sender, instance, created, **kwargs):
+    """
+    Handle room status changes
+    """
+    if created or not (instance.has_changed('status') or instance.has_changed('support_agent_id')):
+        return
+
+    # Open chat sockets reload the room
+    broadcast.room_status_changed(instance)
+
+    previous = instance.loaded_value('status')
+    if instance.status == 'active' and previous == 'pending' and instance.support_agent_id:
+        notify_agent_joined(instance)
+    elif instance.status in CLOSED_STATUSES and previous not in CLOSED_STATUSES:
+        notify_room_closed(instance)
+
+
+@receiver(post_save, sender=ChatMessage)
+def new_message_created(sender, instance, created, **kwargs):
+    """
+    Handle new messages
+    """
+    if created and instance.sender_type != 'bot':
+        notify_new_message(instance)
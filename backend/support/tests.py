@@ -1,3 +1,527 @@
-from django.test import TestCase
+import asyncio
+import json
+import threading
 
-# Create your tests here.
+from asgiref.sync import async_to_sync, sync_to_async
+from channels.layers import channel_layers
+from channels.testing import WebsocketCommunicator
+from django.contrib.auth import get_user_model
+from django.db import connection, transaction
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+from unittest import mock
+
+import httpx
+
+from storeapp import llm
+from . import bot, dispatch, events, push
+from .consumers import ChatConsumer
+from .fake_fcm import FakeFCM
+from .models import ChatMessage, DeviceToken, PushMessage, SupportNotification, SupportRoom, recount_rooms
+
+
+IN_MEMORY_LAYERS = {"default": {"BACKEND": "channels.layers.InMemoryChannelLayer"}}
+
+
+class ConsumerTestMixin:
+    async def connect(self, user=None):
+        communicator = WebsocketCommunicator(ChatConsumer.as_asgi(), f"/ws/chat/{self.room.room_id}/")
+        communicator.scope["user"] = user or self.customer
+        communicator.scope["url_route"] = {"kwargs": {"room_id": self.room.room_id}}
+        connected, _ = await communicator.connect()
+        self.assertTrue(connected)
+        await communicator.receive_json_from()  # connection_established
+        return communicator
+
+
+@override_settings(CHANNEL_LAYERS=IN_MEMORY_LAYERS, LLM_BACKEND="stub")
+class BotReplyTests(ConsumerTestMixin, TransactionTestCase):
+    def setUp(self):
+        channel_layers.backends.clear()
+        self.customer = get_user_model().objects.create_user(
+            email="chat@example.com", username="chat", password="pw"
+        )
+        self.room = SupportRoom.objects.create(customer=self.customer, status="pending")
+        self.backend = llm.get_backend()
+        bot.metrics.reset()
+
+    async def collect_reply(self, communicator):
+        """Messages up to and including the bot's final chat_message."""
+        received = []
+        while True:
+            event = await communicator.receive_json_from(timeout=2)
+            received.append(event)
+            if event["type"] == "chat_message" and event["sender_type"] == "bot":
+                return received
+
+    def test_reply_streams_deltas_then_the_saved_message(self):
+        async def scenario():
+            communicator = await self.connect()
+            with mock.patch.object(bot, "DELTA_INTERVAL", 0), mock.patch.object(self.backend, "latency", 0.05):
+                await communicator.send_json_to({"type": "chat_message", "message": "Where is my order?"})
+                received = await self.collect_reply(communicator)
+            await communicator.disconnect()
+            return received
+
+        received = async_to_sync(scenario)()
+        deltas = [event for event in received if event["type"] == "chat_message_delta"]
+        final = received[-1]
+        self.assertGreater(len(deltas), 1)
+        self.assertEqual("".join(event["delta"] for event in deltas), final["message"])
+        self.assertEqual({event["stream_id"] for event in deltas}, {final["stream_id"]})
+        self.assertTrue(ChatMessage.objects.filter(room=self.room, sender_type="bot", message=final["message"]).exists())
+
+        stats = bot.metrics.as_dict()
+        self.assertEqual(stats["replies"], 1)
+        self.assertIsNotNone(stats["first_token_p50_ms"])
+        self.assertLess(stats["thread_utilization"], 0.5)
+
+    def test_replies_past_the_queue_are_refused(self):
+        async def scenario():
+            limiter = bot.Limiter(concurrency=1, max_waiting=1)
+            release = asyncio.Event()
+
+            async def hold():
+                async with limiter.slot():
+                    await release.wait()
+
+            holders = [asyncio.create_task(hold()) for _ in range(2)]
+            await asyncio.sleep(0)
+            with self.assertRaises(bot.Busy):
+                async with limiter.slot():
+                    pass
+            release.set()
+            await asyncio.gather(*holders)
+
+        async_to_sync(scenario)()
+
+    def test_model_failure_falls_back(self):
+        async def failing(*args, **kwargs):
+            raise RuntimeError("quota")
+            yield  # pragma: no cover
+
+        async def scenario():
+            communicator = await self.connect()
+            with mock.patch.object(self.backend, "astream", failing):
+                await communicator.send_json_to({"type": "chat_message", "message": "Hello"})
+                received = await self.collect_reply(communicator)
+            await communicator.disconnect()
+            return received
+
+        self.assertEqual(async_to_sync(scenario)()[-1]["message"], bot.FALLBACK_REPLY)
+        self.assertEqual(bot.metrics.as_dict()["errors"], 1)
+
+
+@override_settings(CHANNEL_LAYERS=IN_MEMORY_LAYERS, LLM_BACKEND="stub", BACKGROUND_TASKS_EAGER=True)
+class RoomStateTests(ConsumerTestMixin, TransactionTestCase):
+    def setUp(self):
+        User = get_user_model()
+        self.customer = User.objects.create_user(email="state@example.com", username="state", password="pw")
+        self.agent = User.objects.create_user(email="agent@example.com", username="agent", password="pw",
+                                              is_staff=True)
+        self.room = SupportRoom.objects.create(customer=self.customer, status="pending")
+
+    def test_message_needs_no_room_lookups(self):
+        SupportRoom.objects.filter(pk=self.room.pk).update(status="active", support_agent=self.agent)
+
+        async def scenario():
+            communicator = await self.connect()
+            await communicator.send_json_to({"type": "chat_message", "message": "Still waiting"})
+            await communicator.receive_json_from()
+            await communicator.send_json_to({"type": "mark_read"})
+            await communicator.receive_nothing()
+            await communicator.disconnect()
+
+        with CaptureQueriesContext(connection) as queries:
+            async_to_sync(scenario)()
+        statements = [query["sql"] for query in queries if query["sql"].startswith(("SELECT", "INSERT", "UPDATE"))]
+
+        # One room load on connect; then the message, its room counters and
+        # the agent notification in one transaction, and the read receipt
+        self.assertEqual([sql.split()[0] for sql in statements], ["SELECT", "INSERT", "UPDATE", "INSERT", "UPDATE"])
+        self.assertIn("support_supportroom", statements[0])
+        self.assertEqual(SupportNotification.objects.filter(support_agent=self.agent).count(), 1)
+
+    def test_status_change_reloads_the_cached_room(self):
+        async def scenario():
+            communicator = await self.connect()
+            client = APIClient()
+            client.force_authenticate(self.agent)
+            response = await sync_to_async(client.post)(reverse("accept-support-room", args=[self.room.room_id]))
+            self.assertEqual(response.status_code, 200)
+            event = await communicator.receive_json_from()
+
+            # Active now: no bot reply, the agent is notified instead
+            await communicator.send_json_to({"type": "chat_message", "message": "Hi agent"})
+            await communicator.receive_json_from()
+            quiet = await communicator.receive_nothing(timeout=0.2)
+            await communicator.disconnect()
+            return event, quiet
+
+        event, quiet = async_to_sync(scenario)()
+        self.assertEqual(event, {"type": "room_status", "status": "active", "support_agent": "agent@example.com"})
+        self.assertTrue(quiet)
+        self.assertFalse(ChatMessage.objects.filter(room=self.room, sender_type="bot").exclude(
+            message__startswith="Support agent").exists())
+        self.assertEqual(SupportNotification.objects.filter(support_agent=self.agent, notification_type="message")
+                         .count(), 1)
+
+
+@override_settings(CHANNEL_LAYERS=IN_MEMORY_LAYERS, BACKGROUND_TASKS_EAGER=True, FCM_SERVER_KEY="key")
+class AgentFanOutTests(TestCase):
+    def setUp(self):
+        channel_layers.backends.clear()
+        User = get_user_model()
+        self.customer = User.objects.create_user(email="fan@example.com", username="fan", password="pw")
+        agents = User.objects.bulk_create([
+            User(email=f"agent{i}@example.com", username=f"agent{i}", is_staff=True) for i in range(40)
+        ])
+        DeviceToken.objects.bulk_create([DeviceToken(user=agent, token=f"device-{agent.pk}") for agent in agents])
+        self.fcm = FakeFCM()
+        self.client = APIClient()
+        self.client.force_authenticate(self.customer)
+
+    def test_new_room_notifies_every_agent_in_constant_queries(self):
+        layer = channel_layers["default"]
+        listener = async_to_sync(layer.new_channel)()
+        async_to_sync(layer.group_add)(dispatch.AGENTS_GROUP, listener)
+
+        make_client = lambda: httpx.AsyncClient(transport=self.fcm.async_transport())
+        with mock.patch.object(push, "make_client", make_client), self.captureOnCommitCallbacks(execute=True):
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.post(reverse("create-support-room"), {"subject": "Help"})
+        self.assertEqual(response.status_code, 201)
+
+        inserts = [q["sql"] for q in queries if q["sql"].startswith("INSERT")]
+        self.assertEqual(len([sql for sql in inserts if "supportnotification" in sql]), 1)
+        self.assertEqual(len([sql for sql in inserts if "pushmessage" in sql]), 1)
+        self.assertEqual(SupportNotification.objects.filter(notification_type="new_request").count(), 40)
+
+        event = async_to_sync(layer.receive)(listener)
+        self.assertEqual(event["type"], "notification")
+        self.assertEqual(event["notification_type"], "new_request")
+
+        # Delivered after commit, to all 40 devices in one request
+        self.assertEqual(self.fcm.calls, 1)
+        self.assertEqual(len(self.fcm.delivered), 40)
+        self.assertEqual(PushMessage.objects.filter(status="sent").count(), 40)
+
+    def test_nothing_is_queued_without_a_server_key(self):
+        with override_settings(FCM_SERVER_KEY=""), self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse("create-support-room"), {"subject": "Help"})
+        self.assertFalse(PushMessage.objects.exists())
+
+
+@override_settings(FCM_SERVER_KEY="key")
+class PushDeliveryTests(TestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(email="push@example.com", username="push", password="pw")
+
+    def queue(self, tokens, **fields):
+        DeviceToken.objects.bulk_create([DeviceToken(user=self.user, token=token) for token in tokens])
+        return PushMessage.objects.bulk_create(
+            [PushMessage(token=token, title="Hi", body="There", **fields) for token in tokens]
+        )
+
+    def drain(self, fcm, **options):
+        async def run():
+            async with push.PushWorker(httpx.AsyncClient(transport=fcm.async_transport()), **options) as worker:
+                return await worker.drain()
+        return async_to_sync(run)()
+
+    def test_messages_are_sent_in_batches(self):
+        fcm = FakeFCM()
+        self.queue([f"token-{i}" for i in range(25)])
+
+        stats = self.drain(fcm, batch_size=10)
+
+        self.assertEqual((stats.requests, stats.sent), (3, 25))
+        self.assertEqual(fcm.calls, 3)
+        self.assertEqual(PushMessage.objects.filter(status="sent").count(), 25)
+
+    def test_failures_are_retried_then_dead_lettered(self):
+        # "flaky" is answered Unavailable on every attempt
+        fcm = FakeFCM(unregistered={"gone"}, unavailable={"flaky"})
+        self.queue(["gone", "ok"])
+        self.queue(["flaky"], attempts=push.MAX_ATTEMPTS - 2)
+
+        stats = self.drain(fcm)
+        self.assertEqual((stats.sent, stats.retried, stats.dead), (1, 1, 1))
+
+        gone = PushMessage.objects.get(token="gone")
+        self.assertEqual((gone.status, gone.error), ("dead", "NotRegistered"))
+        self.assertFalse(DeviceToken.objects.filter(token="gone").exists())
+
+        flaky = PushMessage.objects.get(token="flaky")
+        self.assertEqual(flaky.status, "pending")
+        self.assertGreater(flaky.next_attempt_at, timezone.now())
+
+        # Not due yet; once it is, the last attempt dead-letters it
+        self.assertEqual(self.drain(fcm).requests, 0)
+        PushMessage.objects.filter(pk=flaky.pk).update(next_attempt_at=timezone.now())
+        self.assertEqual(self.drain(fcm).dead, 1)
+        self.assertEqual(PushMessage.objects.get(pk=flaky.pk).status, "dead")
+
+    def test_unavailable_fcm_leaves_messages_for_later(self):
+        self.queue(["a", "b"])
+
+        stats = self.drain(FakeFCM(failure_rate=1.0))
+
+        self.assertEqual(stats.retried, 2)
+        self.assertEqual(set(PushMessage.objects.values_list("status", "attempts")), {("pending", 1)})
+
+    def test_devices_register_and_unregister(self):
+        client = APIClient()
+        client.force_authenticate(self.user)
+        url = reverse("register-device")
+
+        self.assertEqual(client.post(url, {"token": "abc", "platform": "android"}).status_code, 201)
+        self.assertEqual(client.post(url, {"token": "abc", "platform": "android"}).status_code, 200)
+        self.assertEqual(client.post(url, {"token": "abc", "platform": "fax"}).status_code, 400)
+        self.assertEqual(DeviceToken.objects.get(token="abc").user, self.user)
+
+        self.assertEqual(client.delete(url, {"token": "abc"}).status_code, 204)
+        self.assertFalse(DeviceToken.objects.exists())
+
+
+@override_settings(CHANNEL_LAYERS=IN_MEMORY_LAYERS, BACKGROUND_TASKS_EAGER=True)
+class SupportEventTests(TestCase):
+    def setUp(self):
+        channel_layers.backends.clear()
+        User = get_user_model()
+        self.customer = User.objects.create_user(email="events@example.com", username="events", password="pw")
+        self.agent = User.objects.create_user(email="helper@example.com", username="helper", password="pw",
+                                              is_staff=True)
+        self.room = SupportRoom.objects.create(customer=self.customer, status="pending")
+        self.layer = channel_layers["default"]
+        self.inbox = async_to_sync(self.layer.new_channel)()
+        async_to_sync(self.layer.group_add)(f"notifications_{self.customer.id}", self.inbox)
+
+    def received(self):
+        async def drain():
+            events = []
+            while True:
+                try:
+                    events.append(await asyncio.wait_for(self.layer.receive(self.inbox), 0.05))
+                except asyncio.TimeoutError:
+                    return events
+        return async_to_sync(drain)()
+
+    def test_rooms_remember_the_loaded_status(self):
+        room = SupportRoom.objects.get(pk=self.room.pk)
+        room.status = "active"
+        self.assertTrue(room.has_changed("status"))
+        self.assertEqual(room.loaded_value("status"), "pending")
+
+        # Saving reads no old row, and the saved values become the baseline
+        with CaptureQueriesContext(connection) as queries:
+            room.save()
+        self.assertEqual([q["sql"].split()[0] for q in queries], ["UPDATE"])
+        self.assertFalse(room.has_changed("status"))
+
+    def test_side_effects_wait_for_commit(self):
+        room = SupportRoom.objects.get(pk=self.room.pk)
+        room.support_agent, room.status = self.agent, "active"
+        with self.captureOnCommitCallbacks() as callbacks:
+            room.save()
+            self.assertEqual(self.received(), [])
+        for callback in callbacks:
+            callback()
+
+        [event] = self.received()
+        self.assertEqual(event["notification_type"], "agent_joined")
+        self.assertIn("helper", event["message"])
+
+    def test_rolled_back_saves_publish_nothing(self):
+        room = SupportRoom.objects.get(pk=self.room.pk)
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            with self.assertRaises(RuntimeError), transaction.atomic():
+                room.status = "closed"
+                room.save()
+                raise RuntimeError
+        self.assertEqual(callbacks, [])
+        self.assertEqual(self.received(), [])
+
+    def test_agent_messages_notify_the_customer(self):
+        SupportRoom.objects.filter(pk=self.room.pk).update(status="active", support_agent=self.agent)
+        room = SupportRoom.objects.get(pk=self.room.pk)
+        with self.captureOnCommitCallbacks(execute=True):
+            ChatMessage.objects.create(room=room, sender=self.agent, sender_type="agent", message="Hello")
+            ChatMessage.objects.create(room=room, sender_type="bot", message="Beep")
+
+        [event] = self.received()
+        self.assertEqual((event["notification_type"], event["room_id"]), ("message", room.room_id))
+
+    def test_dispatcher_runs_handlers_off_the_calling_thread(self):
+        async def where():
+            return threading.current_thread().name
+
+        with override_settings(BACKGROUND_TASKS_EAGER=False):
+            future = events.Dispatcher().submit(where)
+        self.assertEqual(future.result(timeout=2), "support-events")
+
+
+class RoomCounterTests(TestCase):
+    def setUp(self):
+        User = get_user_model()
+        self.agent = User.objects.create_user(email="lead@example.com", username="lead", password="pw", is_staff=True)
+        self.customers = [
+            User.objects.create_user(email=f"c{i}@example.com", username=f"c{i}", password="pw") for i in range(3)
+        ]
+        self.rooms = [
+            SupportRoom.objects.create(customer=customer, support_agent=self.agent, status="active")
+            for customer in self.customers
+        ]
+        for room in self.rooms:
+            ChatMessage.objects.create(room=room, sender=room.customer, sender_type="customer", message="Hi")
+            ChatMessage.objects.create(room=room, sender=room.customer, sender_type="customer", message="Hello?")
+            SupportNotification.objects.create(
+                support_agent=self.agent, room=room, notification_type="message", message="New message"
+            )
+        self.client = APIClient()
+        self.client.force_authenticate(self.agent)
+
+    def test_messages_and_reads_maintain_the_counters(self):
+        room = self.rooms[0]
+        reply = ChatMessage.objects.create(room=room, sender=self.agent, sender_type="agent", message="On it")
+        room.refresh_from_db()
+        self.assertEqual((room.message_count, room.agent_unread, room.customer_unread), (3, 2, 1))
+        self.assertEqual(room.last_message, reply)
+
+        self.assertTrue(room.mark_read(self.agent))
+        room.refresh_from_db()
+        self.assertEqual((room.agent_unread, room.customer_unread), (0, 1))
+
+        # A stale copy saving a status change does not reset the counters
+        stale = SupportRoom.objects.get(pk=room.pk)
+        ChatMessage.objects.create(room=room, sender=room.customer, sender_type="customer", message="Thanks")
+        stale.status = "resolved"
+        stale.save()
+        room.refresh_from_db()
+        self.assertEqual((room.status, room.message_count, room.agent_unread), ("resolved", 4, 1))
+
+    def test_room_views_return_the_current_counters(self):
+        customer = get_user_model().objects.create_user(email="new@example.com", username="new", password="pw")
+        client = APIClient()
+        client.force_authenticate(customer)
+
+        created = client.post(reverse("create-support-room"), {"subject": "Help"}).json()
+        self.assertEqual(created["message_count"], 1)
+        self.assertEqual(created["last_message"]["message"], "Hello! I'm here to help. How can I assist you today?")
+
+        accepted = self.client.post(reverse("accept-support-room", args=[created["room_id"]])).json()
+        self.assertEqual(accepted["message_count"], 2)
+        self.assertEqual(accepted["last_message"]["message"], "Support agent lead has joined the chat.")
+
+        closed = client.post(reverse("close-support-room", args=[created["room_id"]])).json()
+        self.assertEqual(closed["message_count"], 3)
+        self.assertEqual(closed["status"], "resolved")
+        self.assertEqual(closed["last_message"]["message"], "This support conversation has been closed. Thank you!")
+
+    def test_recount_matches_the_maintained_counters(self):
+        expected = list(SupportRoom.objects.order_by("pk").values_list(
+            "message_count", "customer_unread", "agent_unread", "last_message"))
+        SupportRoom.objects.update(message_count=0, agent_unread=0, last_message=None)
+        recount_rooms()
+        self.assertEqual(list(SupportRoom.objects.order_by("pk").values_list(
+            "message_count", "customer_unread", "agent_unread", "last_message")), expected)
+
+    def test_listings_take_constant_queries(self):
+        def queries_for(name):
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.get(reverse(name))
+            self.assertEqual(response.status_code, 200)
+            return len(queries), response.json()
+
+        rooms_queries, rooms = queries_for("get-user-rooms")
+        notification_queries, _ = queries_for("get-notifications")
+        self.assertEqual({room["unread_count"] for room in rooms}, {2})
+        self.assertEqual({room["last_message"]["message"] for room in rooms}, {"Hello?"})
+
+        more = get_user_model().objects.create_user(email="c9@example.com", username="c9", password="pw")
+        room = SupportRoom.objects.create(customer=more, support_agent=self.agent, status="active")
+        ChatMessage.objects.create(room=room, sender=more, sender_type="customer", message="Me too")
+        SupportNotification.objects.create(support_agent=self.agent, room=room, notification_type="message",
+                                           message="New message")
+        self.assertEqual(queries_for("get-user-rooms")[0], rooms_queries)
+        self.assertEqual(queries_for("get-notifications")[0], notification_queries)
+
+
+@override_settings(CHANNEL_LAYERS=IN_MEMORY_LAYERS)
+class MessageSyncTests(ConsumerTestMixin, TransactionTestCase):
+    def setUp(self):
+        User = get_user_model()
+        self.customer = User.objects.create_user(email="sync@example.com", username="sync", password="pw")
+        self.agent = User.objects.create_user(email="syncagent@example.com", username="syncagent", password="pw",
+                                              is_staff=True)
+        self.room = SupportRoom.objects.create(customer=self.customer, support_agent=self.agent, status="active")
+        self.messages = [
+            ChatMessage.objects.create(
+                room=self.room, sender=self.agent if i % 2 else self.customer,
+                sender_type="agent" if i % 2 else "customer", message=f"Message {i}"
+            )
+            for i in range(12)
+        ]
+        self.ids = [message.id for message in self.messages]
+        self.client = APIClient()
+        self.client.force_authenticate(self.customer)
+        self.url = reverse("get-room-messages", args=[self.room.room_id])
+
+    def fetch(self, **params):
+        response = self.client.get(self.url, params)
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        return [message["id"] for message in data["messages"]], data["has_more"]
+
+    def test_latest_page_then_older_then_newer(self):
+        self.assertEqual(self.fetch(limit=5), (self.ids[-5:], True))
+        self.assertEqual(self.fetch(before=self.ids[-5], limit=5), (self.ids[2:7], True))
+        self.assertEqual(self.fetch(before=self.ids[2], limit=5), (self.ids[:2], False))
+        self.assertEqual(self.fetch(after=self.ids[-3]), (self.ids[-2:], False))
+        self.assertEqual(self.fetch(after=self.ids[-1]), ([], False))
+        self.assertEqual(self.client.get(self.url, {"after": "x"}).status_code, 400)
+
+    def test_sync_pages_take_constant_queries(self):
+        with CaptureQueriesContext(connection) as small:
+            self.fetch(limit=2)
+        with CaptureQueriesContext(connection) as large:
+            self.fetch(limit=12)
+        self.assertEqual(len(small), len(large))
+
+    def test_reading_moves_a_watermark(self):
+        read_url = reverse("mark-room-read", args=[self.room.room_id])
+        response = self.client.post(read_url, {"upto": self.ids[5]})
+        self.assertEqual(response.json(), {
+            "read_upto": {"customer": self.ids[5], "agent": 0},
+            "unread_count": 3,
+        })
+        page = self.client.get(self.url, {"limit": 12}).json()["messages"]
+        is_read = {message["id"]: message["is_read"] for message in page}
+        self.assertTrue(is_read[self.ids[5]])
+        self.assertFalse(is_read[self.ids[7]])
+
+        # Never backwards, and only to messages of this room
+        self.client.post(read_url, {"upto": self.ids[1]})
+        self.assertEqual(self.client.post(read_url, {"upto": 10 ** 9}).json()["read_upto"]["customer"], self.ids[5])
+
+        # The legacy full fetch still marks everything read
+        self.client.get(self.url)
+        self.room.refresh_from_db()
+        self.assertEqual((self.room.customer_read_upto, self.room.customer_unread), (self.ids[-1], 0))
+
+    def test_socket_resumes_after_the_last_message_seen(self):
+        async def scenario():
+            communicator = await self.connect()
+            await communicator.send_json_to({"type": "resume", "after": self.ids[-4]})
+            reply = await communicator.receive_json_from()
+            await communicator.disconnect()
+            return reply
+
+        reply = async_to_sync(scenario)()
+        self.assertEqual(reply["type"], "history")
+        self.assertEqual([message["message_id"] for message in reply["messages"]], self.ids[-3:])
+        self.assertEqual(reply["messages"][-1]["sender_email"], "syncagent@example.com")
+        self.assertFalse(reply["has_more"])
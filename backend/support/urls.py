@@ -12,8 +12,15 @@ urlpatterns = [
     # Messages
     path('rooms/<str:room_id>/messages/', views.get_room_messages, name='get-room-messages'),
     path('rooms/<str:room_id>/send/', views.send_message, name='send-message'),
+    path('rooms/<str:room_id>/read/', views.mark_room_read, name='mark-room-read'),
     
     # Notifications
     path('notifications/', views.get_notifications, name='get-notifications'),
     path('notifications/<int:notification_id>/read/', views.mark_notification_read, name='mark-notification-read'),
+
+    # Push notifications
+    path('devices/', views.register_device, name='register-device'),
+
+    # Bot
+    path('bot/stats/', views.get_bot_stats, name='bot-stats'),
 ]
\ No newline at end of file
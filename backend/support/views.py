@@ -1,19 +1,26 @@
 from rest_framework.decorators import api_view, permission_classes
-from rest_framework.permissions import IsAuthenticated
+from rest_framework.permissions import IsAdminUser, IsAuthenticated
 from rest_framework.response import Response
 from rest_framework import status
 from django.shortcuts import get_object_or_404
-from .models import SupportRoom, ChatMessage, SupportNotification
+from django.utils import timezone
+from .models import SupportRoom, ChatMessage, SupportNotification, DeviceToken
 from .serializers import (
     SupportRoomSerializer, 
     ChatMessageSerializer, 
     SupportNotificationSerializer
 )
-from google import genai
-from django.conf import settings
+from storeapp import llm
+from . import bot, dispatch, history
+
+def reloaded(room):
+    """
+    ``room`` as stored now. ``ChatMessage.save`` bumps the counters and
+    ``last_message`` with a queryset update, so an instance held across a
+    message create is stale.
+    """
+    return SupportRoom.objects.select_related('customer', 'support_agent', 'last_message').get(pk=room.pk)
 
-# Initialize AI client
-client = genai.Client(api_key=settings.GEMINI_API_KEY)
 
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
@@ -29,7 +36,7 @@ def create_support_room(request):
     ).first()
     
     if existing_room:
-        serializer = SupportRoomSerializer(existing_room)
+        serializer = SupportRoomSerializer(existing_room, context={'request': request})
         return Response({
             'message': 'You already have an active support room',
             'room': serializer.data
@@ -49,21 +56,13 @@ def create_support_room(request):
         message="Hello! I'm here to help. How can I assist you today?"
     )
     
-    # Notify all support agents
-    support_agents = request.user.__class__.objects.filter(
-        is_staff=True,
-        is_active=True
+    # Notify all support agents (one bulk insert, one broadcast, pushes in the background)
+    dispatch.notify_agents(
+        room, 'new_request', f'New support request from {user.email}',
+        push_title='New Support Request', push_body=f'Customer {user.email} needs assistance'
     )
     
-    for agent in support_agents:
-        SupportNotification.objects.create(
-            support_agent=agent,
-            room=room,
-            notification_type='new_request',
-            message=f'New support request from {user.email}'
-        )
-    
-    serializer = SupportRoomSerializer(room)
+    serializer = SupportRoomSerializer(reloaded(room), context={'request': request})
     return Response(serializer.data, status=status.HTTP_201_CREATED)
 
 
@@ -120,7 +119,7 @@ def send_message(request, room_id):
             message=f'New message from {user.email}'
         )
     
-    serializer = ChatMessageSerializer(message)
+    serializer = ChatMessageSerializer(message, context={'room': room})
     return Response(serializer.data, status=status.HTTP_201_CREATED)
 
 
@@ -155,12 +154,7 @@ Current customer message: {message_text}
 Provide a helpful, concise response. If you cannot fully resolve the issue, 
 suggest they can speak to a human agent. Keep responses under 100 words."""
         
-        response = client.models.generate_content(
-            model="gemini-2.0-flash-exp",
-            contents=prompt
-        )
-        
-        return response.text.strip()
+        return llm.generate(prompt, model="gemini-2.0-flash-exp")
         
     except Exception as e:
         print(f"Bot error: {e}")
@@ -170,29 +164,73 @@ suggest they can speak to a human agent. Keep responses under 100 words."""
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def get_room_messages(request, room_id):
-    """Get all messages in a support room"""
+    """
+    Get messages in a support room. With ``limit``, ``before`` or ``after``
+    this is one page of the incremental sync in support.history; without,
+    the whole history, marked read (what the original chat widgets expect).
+    """
     user = request.user
     room = get_object_or_404(SupportRoom, room_id=room_id)
     
     # Verify access
-    if room.customer != user and room.support_agent != user and not user.is_staff:
+    if room.customer_id != user.id and room.support_agent_id != user.id and not user.is_staff:
         return Response(
             {'error': 'Unauthorized'},
             status=status.HTTP_403_FORBIDDEN
         )
-    
-    messages = ChatMessage.objects.filter(room=room)
+
+    params = request.query_params
+    if any(param in params for param in history.SYNC_PARAMS):
+        try:
+            after = history.message_id(params.get('after'))
+            before = history.message_id(params.get('before'))
+            limit = history.clamp_limit(params.get('limit'))
+        except ValueError:
+            return Response(
+                {'error': 'after, before and limit must be positive integers'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        rows, has_more = history.page(room, after=after, before=before, limit=limit)
+        return Response(history.response_data(room, rows, has_more))
     
     # Mark messages as read
-    if room.support_agent == user:
-        messages.filter(sender_type='customer', is_read=False).update(is_read=True)
-    elif room.customer == user:
-        messages.filter(sender_type='agent', is_read=False).update(is_read=True)
+    if room.mark_read(user):
+        room.refresh_from_db(fields=['customer_read_upto', 'agent_read_upto'])
     
-    serializer = ChatMessageSerializer(messages, many=True)
+    messages = ChatMessage.objects.filter(room=room).select_related('sender')
+    serializer = ChatMessageSerializer(messages, many=True, context={'room': room})
     return Response(serializer.data)
 
 
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def mark_room_read(request, room_id):
+    """Move the user's read watermark up to message ``upto`` (default: the latest)"""
+    user = request.user
+    room = get_object_or_404(SupportRoom, room_id=room_id)
+
+    if room.customer_id != user.id and room.support_agent_id != user.id:
+        return Response(
+            {'error': 'Unauthorized'},
+            status=status.HTTP_403_FORBIDDEN
+        )
+
+    try:
+        upto = history.message_id(request.data.get('upto'))
+    except (TypeError, ValueError):
+        return Response(
+            {'error': 'upto must be a message id'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+
+    if room.mark_read(user, upto):
+        room.refresh_from_db(fields=['customer_read_upto', 'agent_read_upto', 'customer_unread', 'agent_unread'])
+    return Response({
+        'read_upto': history.read_upto(room),
+        'unread_count': room.unread_for(user)
+    })
+
+
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def get_user_rooms(request):
@@ -205,8 +243,9 @@ def get_user_rooms(request):
     else:
         # Customers see their own rooms
         rooms = SupportRoom.objects.filter(customer=user)
+    rooms = rooms.select_related('customer', 'support_agent', 'last_message')
     
-    serializer = SupportRoomSerializer(rooms, many=True)
+    serializer = SupportRoomSerializer(rooms, many=True, context={'request': request})
     return Response(serializer.data)
 
 
@@ -220,8 +259,10 @@ def get_pending_rooms(request):
             status=status.HTTP_403_FORBIDDEN
         )
     
-    rooms = SupportRoom.objects.filter(status='pending')
-    serializer = SupportRoomSerializer(rooms, many=True)
+    rooms = SupportRoom.objects.filter(status='pending').select_related(
+        'customer', 'support_agent', 'last_message'
+    )
+    serializer = SupportRoomSerializer(rooms, many=True, context={'request': request})
     return Response(serializer.data)
 
 
@@ -255,9 +296,7 @@ def accept_support_room(request, room_id):
         message=f'Support agent {request.user.username} has joined the chat.'
     )
     
-    # Notify customer (you can implement push notifications here)
-    
-    serializer = SupportRoomSerializer(room)
+    serializer = SupportRoomSerializer(reloaded(room), context={'request': request})
     return Response(serializer.data)
 
 
@@ -286,7 +325,7 @@ def close_support_room(request, room_id):
         message='This support conversation has been closed. Thank you!'
     )
     
-    serializer = SupportRoomSerializer(room)
+    serializer = SupportRoomSerializer(reloaded(room), context={'request': request})
     return Response(serializer.data)
 
 
@@ -303,9 +342,9 @@ def get_notifications(request):
     notifications = SupportNotification.objects.filter(
         support_agent=request.user,
         is_read=False
-    )
+    ).select_related('room__customer', 'room__support_agent', 'room__last_message')
     
-    serializer = SupportNotificationSerializer(notifications, many=True)
+    serializer = SupportNotificationSerializer(notifications, many=True, context={'request': request})
     return Response(serializer.data)
 
 
@@ -328,4 +367,44 @@ def mark_notification_read(request, notification_id):
     notification.is_read = True
     notification.save()
     
-    return Response({'message': 'Notification marked as read'})
\ No newline at end of file
+    return Response({'message': 'Notification marked as read'})
+
+
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def get_bot_stats(request):
+    """Get websocket bot reply metrics (time to first token, thread use) for this process"""
+    return Response(bot.metrics.as_dict())
+
+
+@api_view(['POST', 'DELETE'])
+@permission_classes([IsAuthenticated])
+def register_device(request):
+    """Register (POST) or forget (DELETE) the push token of one of the user's devices"""
+    token = str(request.data.get('token') or '').strip()
+    if not token or len(token) > 255:
+        return Response(
+            {'error': 'A device token of at most 255 characters is required'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+
+    if request.method == 'DELETE':
+        DeviceToken.objects.filter(user=request.user, token=token).delete()
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+    platform = request.data.get('platform', 'web')
+    if platform not in dict(DeviceToken.PLATFORMS):
+        return Response(
+            {'error': f'Unknown platform: {platform}'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+
+    # A token moves with the device, e.g. when another user signs in on it
+    device, created = DeviceToken.objects.update_or_create(
+        token=token,
+        defaults={'user': request.user, 'platform': platform}
+    )
+    return Response(
+        {'token': device.token, 'platform': device.platform},
+        status=status.HTTP_201_CREATED if created else status.HTTP_200_OK
+    )
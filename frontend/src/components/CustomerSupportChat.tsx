@@ -9,6 +9,7 @@ const CustomerSupportChat = () => {
   const [roomId, setRoomId] = useState(null);
   const [roomStatus, setRoomStatus] = useState('pending');
   const messagesEndRef = useRef(null);
+  const lastMessageIdRef = useRef(null);
 
   const scrollToBottom = () => {
     messagesEndRef.current?.scrollIntoView({ behavior: "smooth" });
@@ -56,10 +57,12 @@ const CustomerSupportChat = () => {
 
   const fetchMessages = async () => {
     if (!roomId) return;
-    
+
+    // The latest page first, then only what arrived after the newest message we have
+    const query = lastMessageIdRef.current ? `after=${lastMessageIdRef.current}` : 'limit=50';
     try {
       const response = await fetch(
-        `http://127.0.0.1:8008/support/rooms/${roomId}/messages/`,
+        `http://127.0.0.1:8008/support/rooms/${roomId}/messages/?${query}`,
         {
           headers: {
             'Authorization': `Bearer ${localStorage.getItem('access_token')}`
@@ -69,13 +72,35 @@ const CustomerSupportChat = () => {
       
       if (response.ok) {
         const data = await response.json();
-        setMessages(data);
+        if (data.messages.length) {
+          lastMessageIdRef.current = data.messages[data.messages.length - 1].id;
+          setMessages((previous) => {
+            const seen = new Set(previous.map((msg) => msg.id));
+            return [...previous, ...data.messages.filter((msg) => !seen.has(msg.id))];
+          });
+          markRead(lastMessageIdRef.current);
+        }
       }
     } catch (error) {
       console.error('Error fetching messages:', error);
     }
   };
 
+  const markRead = async (upto) => {
+    try {
+      await fetch(`http://127.0.0.1:8008/support/rooms/${roomId}/read/`, {
+        method: 'POST',
+        headers: {
+          'Content-Type': 'application/json',
+          'Authorization': `Bearer ${localStorage.getItem('access_token')}`
+        },
+        body: JSON.stringify({ upto })
+      });
+    } catch (error) {
+      console.error('Error marking messages read:', error);
+    }
+  };
+
   const handleSendMessage = async () => {
     if (!newMessage.trim() || !roomId) return;
 
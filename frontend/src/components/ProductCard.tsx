@@ -5,7 +5,7 @@ import { Card, CardContent } from "@/components/ui/card";
 import { Badge } from "@/components/ui/badge";
 import { useCart } from "@/contexts/CartContext";
 import { IProduct } from "@/types/types";
-import { baseURL } from "@/lib/api";
+import { baseURL, withBaseURL } from "@/lib/api";
 import { useProductCart } from "@/hooks/useProductCart";
 import { useEffect } from "react";
 
@@ -39,11 +39,22 @@ export const ProductCard = ({ product }: Props) => {
     <Card className="group overflow-hidden border-0 shadow-md hover:shadow-xl transition-all duration-300 hover:-translate-y-1 bg-card">
       <Link to={`/product/${product.slug}`}>
         <div className="relative overflow-hidden">
-          <img
-            src={`${baseURL}${product.image}`}
-            alt={product.name}
-            className="w-full h-48 object-cover group-hover:scale-105 transition-transform duration-300"
-          />
+          <picture>
+            {Object.entries(product.image_srcset ?? {}).map(([format, srcset]) => (
+              <source
+                key={format}
+                type={`image/${format}`}
+                srcSet={withBaseURL(srcset)}
+                sizes="(min-width: 1024px) 25vw, (min-width: 640px) 50vw, 100vw"
+              />
+            ))}
+            <img
+              src={`${baseURL}${product.image}`}
+              alt={product.name}
+              loading="lazy"
+              className="w-full h-48 object-cover group-hover:scale-105 transition-transform duration-300"
+            />
+          </picture>
 
           {product.featured && (
             <Badge className="absolute top-3 left-3 bg-primary/90 text-primary-foreground">
@@ -4,6 +4,13 @@ import axios from "axios";
 
 export const baseURL = "http://127.0.0.1:8008";
 
+// Prefix every URL of a srcset ("url 320w, url 640w") with the API host
+export const withBaseURL = (srcset: string) =>
+  srcset
+    .split(", ")
+    .map((entry) => (entry.startsWith("/") ? `${baseURL}${entry}` : entry))
+    .join(", ");
+
 export const api = axios.create({
   baseURL: baseURL
 });
@@ -9,6 +9,7 @@ export interface IProduct{
     minimumStock: number;
     quantity: number;
     image: string;
+    image_srcset?: Record<string, string> | null;
     created_at: string;
     featured: boolean
 }